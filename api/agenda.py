@@ -0,0 +1,132 @@
+"""
+Agenda del médico (o de un box) para un rango de fechas locales.
+
+Una sola consulta sobre el índice (medico, fecha_local, slot) trae las citas
+con paciente y especialidad por JOIN, como tuplas (sin instanciar modelos);
+el box se deriva del Horario en memoria con ResolvedorBox.
+
+Refresco incremental: con `updated_since` solo vuelven las citas modificadas
+después de ese instante (las canceladas siguen viniendo, con su estado); la
+respuesta trae el `cursor` para la próxima llamada. El ETag se calcula sobre
+(id, updated_at) de las filas, así el cliente recibe 304 si nada cambió.
+
+updated_at se fija en save(), antes del commit, así que una fila puede hacerse
+visible con un updated_at ya pasado. Por eso el cursor queda
+MARGEN_CAMBIOS_SEGUNDOS antes de lo último visto y la vista lee del primario:
+el cliente puede recibir de nuevo citas que ya tenía (las reemplaza por id).
+
+Una cita reprogramada fuera del rango ya no coincide con el filtro por
+fecha_local: en modo incremental su id viene en `fuera_de_rango` para que el
+cliente la quite de la grilla (puede incluir ids que el cliente nunca tuvo).
+Lo mismo con las citas borradas o archivadas, que ya no están en la tabla: sus
+ids salen de los tombstones de la sincronización (RegistroEliminado) y vienen
+en `eliminados`; ambas listas entran en el ETag y evitan el 304.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils.http import parse_etags
+
+from .exportacion import ResolvedorBox
+from .models import Cita, RegistroEliminado
+from .tiempo import JORNADA_INICIO, UTC, hhmm
+
+MAX_DIAS = 31
+
+CAMPOS = (
+    'id', 'fechaHora', 'fecha_local', 'slot', 'estado', 'prioridad', 'descripcion',
+    'medico_especialidad_id', 'medico_especialidad__especialidad__nombre',
+    'usuario_id', 'usuario__nombre', 'usuario__rut', 'updated_at',
+)
+
+
+def filas_agenda(medico_id, desde, hasta, updated_since=None):
+    qs = Cita.objects.filter(
+        medico_id=medico_id,
+        fecha_local__gte=desde,
+        fecha_local__lte=hasta,
+    )
+    if updated_since:
+        qs = qs.filter(updated_at__gt=updated_since)
+    return list(qs.order_by('fecha_local', 'slot', 'id').values_list(*CAMPOS))
+
+
+def fuera_de_rango(medico_id, desde, hasta, updated_since):
+    """Ids de citas del médico modificadas desde updated_since que hoy caen fuera de [desde, hasta]"""
+    return list(
+        Cita.objects.filter(medico_id=medico_id, updated_at__gt=updated_since)
+        .exclude(fecha_local__gte=desde, fecha_local__lte=hasta)
+        .order_by('id').values_list('id', flat=True)
+    )
+
+
+def eliminados(medico_id, updated_since):
+    """Ids de citas del médico borradas o archivadas desde updated_since"""
+    return list(
+        RegistroEliminado.objects.filter(modelo='citas', medico_id=medico_id, eliminado_en__gt=updated_since)
+        .order_by('objeto_id').values_list('objeto_id', flat=True).distinct()
+    )
+
+
+def siguiente_cursor(filas, ahora, updated_since=None):
+    """
+    Cursor para la próxima llamada: el updated_at más reciente entregado (no el
+    reloj de este request) menos el margen de commit. Nunca retrocede de
+    updated_since: lo ya cubierto por el cursor anterior no se vuelve a pedir.
+    """
+    margen = timedelta(seconds=settings.MARGEN_CAMBIOS_SEGUNDOS)
+    cursor = min(max(fila[-1] for fila in filas), ahora) - margen if filas else ahora - margen
+    if updated_since and cursor < updated_since:
+        return updated_since
+    return cursor
+
+
+def etag(filas, *partes):
+    h = hashlib.blake2b(digest_size=12)
+    for parte in partes:
+        h.update(str(parte).encode())
+        h.update(b'|')
+    for fila in filas:
+        h.update(f"{fila[0]}:{fila[-1].timestamp()};".encode())
+    return f'"{h.hexdigest()}"'
+
+
+def coincide(if_none_match, etiqueta):
+    """Comparación débil: con la respuesta comprimida el cliente recibe W/"..." """
+    return etiqueta in [e.removeprefix('W/') for e in parse_etags(if_none_match or '')]
+
+
+def agenda(medico_id, desde, hasta, box_id=None, updated_since=None, filas=None):
+    """Lista de citas serializadas; con box_id solo las que caen en ese box"""
+    if filas is None:
+        filas = filas_agenda(medico_id, desde, hasta, updated_since)
+    boxes = ResolvedorBox(medico_id)
+    salida = []
+    for (pk, fechaHora, fecha, slot, estado, prioridad, descripcion,
+         me_id, especialidad, usuario_id, paciente, rut, updated_at) in filas:
+        cita_box_id, box_nombre = boxes.buscar_slot(me_id, fecha, slot)
+        if box_id and cita_box_id != box_id:
+            continue
+        salida.append({
+            'id': pk,
+            'fechaHora': fechaHora.astimezone(UTC).isoformat(),
+            'fecha': fecha.isoformat(),
+            'hora': hhmm(slot + JORNADA_INICIO) if slot is not None else None,
+            'estado': estado,
+            'prioridad': prioridad,
+            'descripcion': descripcion,
+            'paciente_id': usuario_id,
+            'paciente_nombre': paciente,
+            'paciente_rut': rut,
+            'medico_especialidad': me_id,
+            'especialidad_nombre': especialidad,
+            'box_id': cita_box_id,
+            'box_nombre': box_nombre,
+            'updated_at': updated_at.astimezone(UTC).isoformat(),
+        })
+    return salida
+
+
+def rango_valido(desde, hasta):
+    return desde <= hasta and hasta - desde <= timedelta(days=MAX_DIAS - 1)
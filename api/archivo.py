@@ -0,0 +1,94 @@
+"""
+Archivado de citas antiguas: se copian a CitaHistorica y se borran de Cita
+por lotes, para que las consultas de conflictos, listados y admin_todas
+trabajen sobre una tabla pequeña cuyos índices caben en memoria.
+
+Se usa una tabla de archivo y no particiones de MySQL porque las tablas
+particionadas no admiten claves foráneas. Los rollups de estadísticas no se
+tocan: las citas archivadas siguen contando (recalcular_rango las incluye).
+Las notificaciones y recordatorios de las citas archivadas no se pierden: pasan
+a apuntar a la CitaHistorica (cita_historica) antes de borrar la cita.
+"""
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .estadisticas import suspender_actualizacion
+from .models import Cita, CitaHistorica, Notificacion, Recordatorio
+from .sincronizacion import registrar_eliminaciones
+from .tiempo import limites_dia
+
+ESTADOS_ARCHIVABLES = ['Confirmada', 'Cancelada']
+
+CAMPOS = [
+    'id', 'usuario_id', 'medico_id', 'medico_especialidad_id', 'fechaHora',
+    'estado', 'prioridad', 'descripcion', 'fecha_local', 'slot',
+]
+
+
+def fecha_corte(hoy, meses):
+    """Primer día local que NO se archiva: hoy menos `meses` meses (día ajustado a fin de mes)"""
+    total = hoy.year * 12 + (hoy.month - 1) - meses
+    anio, mes = divmod(total, 12)
+    mes += 1
+    for dia in (hoy.day, 30, 29, 28):
+        try:
+            return date(anio, mes, dia)
+        except ValueError:
+            continue
+
+
+def archivables(corte, estados=None):
+    return Cita.objects.filter(
+        fechaHora__lt=limites_dia(corte).inicio_utc,
+        estado__in=estados or ESTADOS_ARCHIVABLES,
+    )
+
+
+def archivar_lote(ids):
+    """Copia y borra un lote de citas en una transacción. Devuelve cuántas movió."""
+    with transaction.atomic():
+        filas = list(Cita.objects.filter(pk__in=ids).values(*CAMPOS))
+        # Una copia previa con el mismo id no se pisa ni se da por buena: esa cita queda
+        # viva para revisarla. El resto se inserta sin ignore_conflicts, así cualquier
+        # conflicto revierte el lote completo antes de borrar nada.
+        copiadas = set(CitaHistorica.objects.filter(pk__in=[f['id'] for f in filas]).values_list('id', flat=True))
+        if copiadas:
+            print(f"⚠️ [archivar] {len(copiadas)} citas ya tenían copia en el archivo y no se borran: {sorted(copiadas)[:20]}")
+            filas = [f for f in filas if f['id'] not in copiadas]
+        CitaHistorica.objects.bulk_create([CitaHistorica(**f) for f in filas])
+        # Sin señales de estadísticas/eventos: el rollup conserva estas citas
+        ids = [f['id'] for f in filas]
+        # Dos UPDATE (no uno con F('cita_id')): el orden de asignación en un mismo SET depende del motor
+        Notificacion.objects.filter(cita_id__in=ids).update(cita_historica_id=F('cita_id'))
+        Notificacion.objects.filter(cita_id__in=ids).update(cita=None)
+        recordatorios = list(Recordatorio.objects.filter(cita_id__in=ids).values_list('id', 'cita_id'))
+        Recordatorio.objects.filter(cita_id__in=ids).update(cita_historica_id=F('cita_id'))
+        Recordatorio.objects.filter(pk__in=[pk for pk, _ in recordatorios]).update(cita=None, updated_at=timezone.now())
+        with suspender_actualizacion():
+            Cita.objects.filter(pk__in=ids).delete()
+        # Para los clientes de /api/sync/ la cita archivada (y su recordatorio) salen de la tabla viva
+        duenos = {f['id']: (f['usuario_id'], f['medico_id']) for f in filas}
+        registrar_eliminaciones('citas', duenos)
+        registrar_eliminaciones('recordatorios', {pk: duenos[cita_id] for pk, cita_id in recordatorios})
+    return len(filas)
+
+
+def archivar(corte, estados=None, lote=1000, on_progreso=None):
+    """
+    Mueve todas las citas archivables anteriores a `corte` (fecha local).
+    Recorre por id con lotes de tamaño fijo para no bloquear la tabla.
+    """
+    total = 0
+    ultimo_id = 0
+    qs = archivables(corte, estados).order_by('id')
+    while True:
+        ids = list(qs.filter(id__gt=ultimo_id).values_list('id', flat=True)[:lote])
+        if not ids:
+            return total
+        total += archivar_lote(ids)
+        ultimo_id = ids[-1]
+        if on_progreso:
+            on_progreso(total)
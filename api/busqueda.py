@@ -0,0 +1,70 @@
+"""
+Búsqueda de usuarios por RUT parcial, nombre/apellido o correo.
+
+Todas las consultas son predicados de prefijo sobre columnas indexadas
+(rut_normalizado, nombre_busqueda, usuarios_terminos.termino, correo) y cada
+una se corta en `limite` filas, de modo que el costo no depende del tamaño
+de la tabla de usuarios. El ranking se arma en Python sobre esos pocos ids.
+"""
+from .models import Usuario, TerminoBusqueda
+from .normalizacion import normalizar_rut, normalizar_texto
+
+# Puntaje por tipo de coincidencia (mayor = más relevante)
+PUNTAJE_RUT_EXACTO = 100
+PUNTAJE_RUT_PREFIJO = 80
+PUNTAJE_NOMBRE_PREFIJO = 60
+PUNTAJE_TERMINO_PREFIJO = 50
+PUNTAJE_CORREO_PREFIJO = 40
+
+
+def buscar_usuarios(q, limite=20, rol=None):
+    """
+    Devuelve una lista de (usuario, puntaje) ordenada por relevancia.
+    """
+    q = (q or '').strip()
+    if not q:
+        return []
+
+    base = Usuario.objects.all()
+    if rol:
+        base = base.filter(rol=rol)
+
+    puntajes = {}
+
+    def sumar(ids, puntaje):
+        for uid in ids:
+            if puntajes.get(uid, 0) < puntaje:
+                puntajes[uid] = puntaje
+
+    rut = normalizar_rut(q)
+    # Solo tratar como RUT si el texto es mayoritariamente numérico
+    if rut and q[0].isdigit():
+        sumar(base.filter(rut_normalizado=rut).values_list('id', flat=True)[:limite], PUNTAJE_RUT_EXACTO)
+        sumar(base.filter(rut_normalizado__startswith=rut).values_list('id', flat=True)[:limite], PUNTAJE_RUT_PREFIJO)
+
+    texto = normalizar_texto(q)
+    if texto and not q[0].isdigit():
+        sumar(base.filter(nombre_busqueda__startswith=texto).values_list('id', flat=True)[:limite], PUNTAJE_NOMBRE_PREFIJO)
+
+        # Palabra más larga contra la tabla de términos (apellidos, segundos nombres)
+        palabra = max(texto.split(' '), key=len)
+        if len(palabra) >= 2:
+            terminos_qs = TerminoBusqueda.objects.filter(termino__startswith=palabra[:50])
+            if rol:
+                terminos_qs = terminos_qs.filter(usuario__rol=rol)
+            sumar(terminos_qs.values_list('usuario_id', flat=True)[:limite], PUNTAJE_TERMINO_PREFIJO)
+
+
+    # El correo se prueba siempre que el texto lo parezca, también si empieza con
+    # un dígito (p. ej. "12ana@..."); un RUT con puntos solo suma si algún correo
+    # comienza literalmente igual.
+    if '@' in q or '.' in q:
+        sumar(base.filter(correo__istartswith=q).values_list('id', flat=True)[:limite], PUNTAJE_CORREO_PREFIJO)
+
+    if not puntajes:
+        return []
+
+    usuarios = Usuario.objects.in_bulk(list(puntajes.keys()))
+    resultado = [(usuarios[uid], p) for uid, p in puntajes.items() if uid in usuarios]
+    resultado.sort(key=lambda par: (-par[1], par[0].nombre_busqueda, par[0].pk))
+    return resultado[:limite]
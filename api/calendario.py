@@ -0,0 +1,154 @@
+"""
+Vista mensual de disponibilidad: cuántos slots libres tiene cada día del mes
+para un médico, un médico-especialidad o una especialidad completa, en vez de
+~30 llamadas a horarios_disponibles.
+
+Por médico y mes se calcula, con tres consultas (horarios, excepciones y un
+GROUP BY de citas por fecha local y slot), la lista de inicios libres de cada
+día. Eso se guarda en la cache por (médico, mes); al responder se cuentan los
+inicios posteriores a "ahora", así el valor cacheado no envejece con el
+paso de las horas. Las retenciones temporales (api/reservas.py) no se
+descuentan: duran minutos y la vista del día las considera.
+
+Invalidación (api/signals.py): un cambio de cita borra el mes del médico;
+cambios de Horario o ExcepcionHorario suben la versión del médico (o la
+global, para feriados de la clínica) y dejan obsoletos todos sus meses.
+"""
+import calendar
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from . import disponibilidad
+from .excepciones import CalendarioExcepciones
+from .models import Cita, Horario, MedicoEspecialidad
+from .tiempo import DIAS
+
+PREFIJO = 'mes'
+VERSION_GLOBAL = 'mes_ver:*'
+
+
+def _clave_version(medico_id):
+    return f"mes_ver:{medico_id}"
+
+
+def _clave(medico_id, anio, mes, versiones):
+    return f"{PREFIJO}:{medico_id}:{anio}-{mes:02d}:{versiones}"
+
+
+def _versiones(medico_id):
+    valores = cache.get_many([_clave_version(medico_id), VERSION_GLOBAL])
+    return f"{valores.get(_clave_version(medico_id), 0)}.{valores.get(VERSION_GLOBAL, 0)}"
+
+
+def limites_mes(anio, mes):
+    return date(anio, mes, 1), date(anio, mes, calendar.monthrange(anio, mes)[1])
+
+
+def invalidar_mes(medico_id, fecha):
+    """Borra el mes de `fecha` del médico (cambio de una cita)"""
+    cache.delete(_clave(medico_id, fecha.year, fecha.month, _versiones(medico_id)))
+
+
+def invalidar_medico(medico_id=None):
+    """Deja obsoletos todos los meses del médico, o de todos si medico_id es None"""
+    clave = _clave_version(medico_id) if medico_id else VERSION_GLOBAL
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 1, None)
+
+
+def calcular_mes(medico_id, anio, mes):
+    """{medico_especialidad_id: {dia_del_mes: [ts_inicio_utc libres]}} sin mirar la hora actual"""
+    primero, ultimo = limites_mes(anio, mes)
+
+    horarios = {}
+    for me_id, dia, slot_inicio, slot_fin, box_id, box_nombre in (
+        Horario.objects.filter(medico_especialidad__medico_id=medico_id)
+        .order_by('slot_inicio')
+        .values_list('medico_especialidad_id', 'dia', 'slot_inicio', 'slot_fin', 'box_id', 'box__nombre')
+    ):
+        horarios.setdefault(me_id, {}).setdefault(dia, []).append(
+            (slot_inicio, slot_fin, box_id, box_nombre or "Sin box")
+        )
+    if not horarios:
+        return {}
+
+    excepciones = CalendarioExcepciones(medico_id, primero, ultimo)
+
+    # Agregado por (fecha local, slot): una fila por slot ocupado
+    ocupados = {}
+    for fila in (
+        Cita.objects.filter(
+            medico_id=medico_id,
+            fecha_local__gte=primero,
+            fecha_local__lte=ultimo,
+            estado__in=disponibilidad.ESTADOS_OCUPADOS,
+        )
+        .values('fecha_local', 'slot')
+        .annotate(n=Count('id'))
+        .order_by()
+    ):
+        ocupados.setdefault(fila['fecha_local'], []).append(fila['slot'])
+
+    resultado = {}
+    for me_id, por_dia in horarios.items():
+        dias = resultado[me_id] = {}
+        fecha = primero
+        while fecha <= ultimo:
+            del_dia = por_dia.get(DIAS[fecha.weekday()])
+            if del_dia and not excepciones.cerrado(fecha):
+                cands = disponibilidad.candidatos(
+                    fecha,
+                    [(si, sf, nombre) for si, sf, box_id, nombre in del_dia if not excepciones.cerrado(fecha, box_id)],
+                    ocupados.get(fecha, ()),
+                )
+                if cands:
+                    dias[fecha.day] = [ts for _, _, ts, _ in cands]
+            fecha += timedelta(days=1)
+    return resultado
+
+
+def mes_medico(medico_id, anio, mes):
+    clave = _clave(medico_id, anio, mes, _versiones(medico_id))
+    datos = cache.get(clave)
+    if datos is None:
+        datos = calcular_mes(medico_id, anio, mes)
+        cache.set(clave, datos, settings.CALENDARIO_MES_TTL)
+    return datos
+
+
+def disponibilidad_mes(anio, mes, medico_id=None, medico_especialidad_id=None, especialidad_id=None, ahora=None):
+    """
+    [{'fecha', 'libres'}] para cada día del mes. Filtra por médico (todas sus
+    especialidades), por médico-especialidad o suma los médicos activos de una especialidad.
+    """
+    if especialidad_id:
+        pares = list(
+            MedicoEspecialidad.objects.filter(especialidad_id=especialidad_id, activo=True)
+            .values_list('medico_id', 'id')
+        )
+    elif medico_especialidad_id:
+        pares = [(medico_id, medico_especialidad_id)]
+    else:
+        pares = [(medico_id, None)]
+
+    ahora_ts = int(ahora if ahora is not None else time.time())
+    primero, ultimo = limites_mes(anio, mes)
+    libres = [0] * ultimo.day
+    for m_id, me_id in pares:
+        datos = mes_medico(m_id, anio, mes)
+        for clave_me, dias in datos.items():
+            if me_id is not None and clave_me != me_id:
+                continue
+            for dia, inicios in dias.items():
+                libres[dia - 1] += sum(1 for ts in inicios if ts > ahora_ts)
+
+    return [
+        {'fecha': (primero + timedelta(days=i)).isoformat(), 'libres': n}
+        for i, n in enumerate(libres)
+    ]
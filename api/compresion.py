@@ -0,0 +1,60 @@
+"""
+Compresión de las respuestas JSON de la API (whitenoise solo comprime los
+estáticos). Se usa brotli si el paquete está instalado y el cliente lo
+acepta, si no gzip. Respuestas bajo COMPRESION_MINIMO no se tocan: el
+encabezado y el CPU no compensan.
+
+Las respuestas con tokens (login, token/) nunca se comprimen, para no exponer
+el token a ataques tipo BREACH junto con datos que el cliente controla.
+"""
+import gzip
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CONTENT_TYPES = ('application/json',)
+SIN_COMPRIMIR = ('/api/login', '/api/token/', '/api/async/login/')
+
+
+def _aceptadas(accept_encoding):
+    """{codificación: q} del header Accept-Encoding"""
+    aceptadas = {}
+    for parte in accept_encoding.split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        q = 1.0
+        if parametros.strip().startswith('q='):
+            try:
+                q = float(parametros.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if nombre:
+            aceptadas[nombre.strip().lower()] = q
+    return aceptadas
+
+
+def elegir_codificacion(accept_encoding):
+    """'br', 'gzip' o None según lo que acepta el cliente y lo disponible"""
+    aceptadas = _aceptadas(accept_encoding or '')
+    comodin = aceptadas.get('*', 0)
+    candidatas = (['br'] if brotli else []) + ['gzip']
+    mejor = max(candidatas, key=lambda c: aceptadas.get(c, comodin))
+    return mejor if aceptadas.get(mejor, comodin) > 0 else None
+
+
+def comprimir(contenido, codificacion):
+    if codificacion == 'br':
+        return brotli.compress(contenido, quality=settings.COMPRESION_NIVEL_BROTLI)
+    return gzip.compress(contenido, compresslevel=settings.COMPRESION_NIVEL_GZIP, mtime=0)
+
+
+def comprimible(request, response):
+    if response.streaming or response.has_header('Content-Encoding') or response.status_code in (204, 304):
+        return False
+    if not request.path.startswith('/api/') or request.path.startswith(SIN_COMPRIMIR):
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip()
+    return content_type in CONTENT_TYPES and len(response.content) >= settings.COMPRESION_MINIMO
@@ -0,0 +1,365 @@
+"""
+Transporte de correo saliente.
+
+Antes cada EmailMessage.send() abría y cerraba una sesión TLS con el servidor
+SMTP (connect + STARTTLS + AUTH + QUIT por correo). Aquí:
+
+- PooledSMTPBackend: backend SMTP que mantiene UNA conexión viva por proceso
+  (worker) y la reutiliza entre envíos. Antes de usar una conexión ociosa se
+  verifica con NOOP; si el servidor la cortó se reconecta.
+- Reintentos con backoff exponencial para errores transitorios (desconexión,
+  timeouts, respuestas 4xx). Los rechazos permanentes (5xx, destinatario
+  inválido) no se reintentan.
+- Interruptor (circuit breaker): tras CORREO_UMBRAL_FALLOS envíos fallidos
+  seguidos se deja de intentar durante CORREO_PAUSA_CIRCUITO segundos, para
+  que una caída del SMTP no sume timeouts a cada request.
+- ColaCorreo: las vistas encolan y un hilo del worker envía por lotes con
+  send_messages sobre la conexión compartida, sin bloquear la respuesta.
+
+Para verificar contra un servidor local:
+    python -m aiosmtpd -n -l 127.0.0.1:1025
+    EMAIL_HOST=127.0.0.1 EMAIL_PORT=1025 EMAIL_USE_TLS=False python manage.py bench_correo
+"""
+import atexit
+import os
+import queue
+import random
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.smtp import EmailBackend
+
+
+class CircuitoAbierto(Exception):
+    """El interruptor está abierto: no se intenta hablar con el servidor SMTP"""
+
+
+class LoteInterrumpido(Exception):
+    """
+    El mensaje en la posición `indice` del lote falló tras agotar los reintentos.
+    Los anteriores ya se procesaron (`enviados` aceptados; el resto rechazados
+    de forma permanente), así que solo lote[indice:] debe volver a intentarse.
+    """
+
+    def __init__(self, indice, enviados, causa):
+        super().__init__(f"falló el mensaje {indice} ({enviados} enviados antes): {causa}")
+        self.indice = indice
+        self.enviados = enviados
+        self.causa = causa
+
+
+class Interruptor:
+    """Circuit breaker simple: cerrado -> abierto tras `umbral` fallos -> medio abierto al vencer la pausa"""
+
+    def __init__(self, umbral, pausa):
+        self.umbral = umbral
+        self.pausa = pausa
+        self.fallos = 0
+        self.abierto_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        with self._lock:
+            return time.monotonic() >= self.abierto_hasta
+
+    def restante(self):
+        with self._lock:
+            return max(0.0, self.abierto_hasta - time.monotonic())
+
+    def exito(self):
+        with self._lock:
+            self.fallos = 0
+            self.abierto_hasta = 0.0
+
+    def fallo(self):
+        with self._lock:
+            self.fallos += 1
+            if self.fallos >= self.umbral:
+                # Medio abierto: al vencer la pausa se deja pasar un intento;
+                # si vuelve a fallar el circuito se abre de nuevo
+                self.abierto_hasta = time.monotonic() + self.pausa
+                print(f"⚠️ [correo] circuito abierto por {self.pausa}s tras {self.fallos} fallos seguidos")
+
+
+interruptor = Interruptor(settings.CORREO_UMBRAL_FALLOS, settings.CORREO_PAUSA_CIRCUITO)
+
+# Conexión compartida del proceso. smtplib no es thread-safe: todo uso pasa por _lock_smtp
+_lock_smtp = threading.RLock()
+_pool = {'conexion': None, 'pid': None, 'ultimo_uso': 0.0, 'mensajes': 0}
+
+
+def _transitorio(error):
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        # Todos los destinatarios rechazados: transitorio solo si todos fueron 4xx
+        return bool(error.recipients) and all(400 <= codigo < 500 for codigo, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # SMTPException hereda de OSError: solo los errores de red puros son transitorios
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def _descartar_conexion(quit=True):
+    conexion = _pool['conexion']
+    _pool.update(conexion=None, pid=None, mensajes=0)
+    if conexion is None:
+        return
+    try:
+        if quit:
+            conexion.quit()
+        else:
+            conexion.close()
+    except Exception:
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+
+def cerrar_pool():
+    """Cierra (QUIT) la conexión compartida; se llama al terminar el proceso"""
+    with _lock_smtp:
+        _descartar_conexion()
+
+
+atexit.register(cerrar_pool)
+
+
+class PooledSMTPBackend(EmailBackend):
+    """
+    EmailBackend SMTP que reutiliza una conexión por proceso.
+
+    open() toma la conexión compartida (o la crea) y close() la devuelve al
+    pool sin enviar QUIT, así EmailMessage.send() y send_mail() siguen
+    funcionando igual pero sin handshake por correo.
+    """
+
+    def _conexion_viva(self):
+        conexion = _pool['conexion']
+        if conexion is None:
+            return None
+        if _pool['pid'] != os.getpid():
+            # Heredada por fork: la sesión SMTP es del proceso padre, no se toca
+            _pool.update(conexion=None, pid=None, mensajes=0)
+            return None
+        if _pool['mensajes'] >= settings.CORREO_MAX_POR_CONEXION:
+            _descartar_conexion()
+            return None
+        if time.monotonic() - _pool['ultimo_uso'] > settings.CORREO_NOOP_SEGUNDOS:
+            try:
+                if conexion.noop()[0] != 250:
+                    raise smtplib.SMTPServerDisconnected('NOOP rechazado')
+            except (smtplib.SMTPException, OSError):
+                _descartar_conexion(quit=False)
+                return None
+        return conexion
+
+    def open(self):
+        with _lock_smtp:
+            conexion = self._conexion_viva()
+            if conexion is not None:
+                self.connection = conexion
+                return False
+            self.connection = None
+            creada = super().open()
+            if self.connection is not None:
+                _pool.update(conexion=self.connection, pid=os.getpid(), ultimo_uso=time.monotonic(), mensajes=0)
+            return creada
+
+    def close(self):
+        # La conexión queda en el pool; cerrar_pool() la cierra de verdad
+        self.connection = None
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        if not interruptor.permitir():
+            if self.fail_silently:
+                return 0
+            raise CircuitoAbierto(f"SMTP en pausa por {interruptor.restante():.0f}s")
+
+        silencioso, self.fail_silently = self.fail_silently, False
+        enviados = 0
+        indice = 0
+        try:
+            for indice, mensaje in enumerate(email_messages):
+                if self._enviar_con_reintentos(mensaje):
+                    enviados += 1
+        except Exception as e:
+            if silencioso:
+                return enviados
+            raise LoteInterrumpido(indice, enviados, e) from e
+        finally:
+            self.fail_silently = silencioso
+            self.connection = None
+        return enviados
+
+    def _enviar_con_reintentos(self, mensaje):
+        reintentos = settings.CORREO_REINTENTOS
+        for intento in range(reintentos + 1):
+            # El lock cubre solo el intento: durante el backoff otros hilos pueden enviar
+            with _lock_smtp:
+                try:
+                    self.open()
+                    enviado = self._send(mensaje)
+                    _pool['ultimo_uso'] = time.monotonic()
+                    _pool['mensajes'] += 1
+                    interruptor.exito()
+                    return enviado
+                except smtplib.SMTPAuthenticationError:
+                    # Credenciales: ningún mensaje va a salir, falla el lote completo
+                    _descartar_conexion(quit=False)
+                    interruptor.fallo()
+                    raise
+                except smtplib.SMTPException as e:
+                    if not _transitorio(e):
+                        # Destinatario/contenido rechazado: reintentar no sirve y no es
+                        # culpa del servidor, así que no cuenta para el interruptor
+                        print(f"❌ [correo] rechazado {mensaje.to}: {e}")
+                        return False
+                    error = e
+                except OSError as e:
+                    error = e
+                _descartar_conexion(quit=False)
+                self.connection = None
+            if intento == reintentos:
+                interruptor.fallo()
+                raise error
+            espera = settings.CORREO_BACKOFF * (2 ** intento)
+            time.sleep(espera + random.uniform(0, espera / 2))
+
+
+class ColaCorreo:
+    """
+    Cola en memoria del worker. Un hilo daemon junta hasta CORREO_LOTE
+    mensajes (o los que lleguen en CORREO_ESPERA_LOTE segundos) y los envía
+    con un solo send_messages. Lo no enviado por un fallo transitorio vuelve a
+    la cola hasta CORREO_INTENTOS_COLA veces.
+    """
+
+    def __init__(self):
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.enviados = 0
+        self.descartados = 0
+
+    def encolar(self, mensaje):
+        self._cola.put((mensaje, 0))
+        self._arrancar()
+
+    def _arrancar(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name='cola-correo', daemon=True)
+                self._hilo.start()
+
+    def _tomar_lote(self):
+        lote = [self._cola.get()]
+        limite = time.monotonic() + settings.CORREO_ESPERA_LOTE
+        while len(lote) < settings.CORREO_LOTE:
+            restante = limite - time.monotonic()
+            try:
+                lote.append(self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _bucle(self):
+        while True:
+            lote = self._tomar_lote()
+            try:
+                self._enviar(lote)
+            finally:
+                for _ in lote:
+                    self._cola.task_done()
+
+    def _enviar(self, lote):
+        mensajes = [m for m, _ in lote]
+        try:
+            enviados = get_connection().send_messages(mensajes)
+        except CircuitoAbierto:
+            self._devolver(lote, contar=False)
+            time.sleep(min(interruptor.restante(), 5) or 0.1)
+            return
+        except LoteInterrumpido as e:
+            self.enviados += e.enviados
+            print(f"⚠️ [correo] lote interrumpido en el mensaje {e.indice + 1}/{len(lote)}: {e.causa}")
+            self._devolver(lote[e.indice:])
+            return
+        except Exception as e:
+            print(f"❌ [correo] error enviando lote de {len(lote)}: {e}")
+            self._devolver(lote)
+            return
+        self.enviados += enviados or 0
+        print(f"📧 [correo] lote de {len(lote)} enviado ({enviados} aceptados)")
+
+    def _devolver(self, lote, contar=True):
+        for mensaje, intentos in lote:
+            intentos += 1 if contar else 0
+            if intentos >= settings.CORREO_INTENTOS_COLA:
+                self.descartados += 1
+                print(f"❌ [correo] descartado tras {intentos} intentos: {mensaje.subject!r} a {mensaje.to}")
+                continue
+            self._cola.put((mensaje, intentos))
+
+    def pendientes(self):
+        # Incluye el lote que se está enviando: task_done se marca al terminarlo
+        return self._cola.unfinished_tasks
+
+    def vaciar(self, timeout=30):
+        """Espera a que la cola quede vacía. Devuelve True si lo logró dentro del plazo."""
+        limite = time.monotonic() + timeout
+        while self.pendientes():
+            if time.monotonic() >= limite:
+                return False
+            time.sleep(0.02)
+        return True
+
+
+cola = ColaCorreo()
+
+
+@atexit.register
+def _vaciar_al_salir():
+    # Se registra después de cerrar_pool, así que corre antes (atexit es LIFO)
+    if cola.pendientes():
+        cola.vaciar(timeout=settings.CORREO_ESPERA_SALIDA)
+
+
+def encolar(mensaje):
+    """
+    Punto de entrada para los envíos de la app. Con CORREO_ASINCRONO=False se
+    envía en el momento (mismo backend y reintentos, pero bloqueando).
+    """
+    if settings.CORREO_ASINCRONO:
+        cola.encolar(mensaje)
+    else:
+        mensaje.send(fail_silently=False)
+
+
+def vaciar(timeout=30):
+    return cola.vaciar(timeout)
+
+
+def enviar_ahora(mensajes):
+    """
+    Envío bloqueante sobre la conexión compartida, mensaje a mensaje, para
+    saber cuáles aceptó el servidor (send_messages solo devuelve un total).
+    Devuelve una lista alineada con `mensajes`: True aceptado, False
+    rechazado de forma permanente, None sin enviar porque el SMTP falló tras
+    los reintentos o el circuito está abierto (se deja de intentar ahí).
+    """
+    conexion = get_connection()
+    resultado = [None] * len(mensajes)
+    for i, mensaje in enumerate(mensajes):
+        try:
+            resultado[i] = bool(conexion.send_messages([mensaje]))
+        except Exception as e:
+            print(f"❌ [correo] envío interrumpido en el mensaje {i + 1}/{len(mensajes)}: {e}")
+            break
+    return resultado
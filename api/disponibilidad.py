@@ -0,0 +1,47 @@
+"""
+Cálculo de los slots libres de un día, separado de la lectura de datos para
+compartirlo entre la vista sync (CitaViewSet.horarios_disponibles) y la async.
+"""
+from datetime import datetime
+
+from . import reservas
+from .tiempo import DURACION_CITA, JORNADA_INICIO, UTC, grilla_slots, hhmm
+
+# Estados que ocupan el slot en la disponibilidad publicada
+ESTADOS_OCUPADOS = ['Pendiente', 'Confirmada']
+
+
+def candidatos(fecha, horarios, ocupados):
+    """
+    horarios: [(slot_inicio, slot_fin, box_nombre)]; ocupados: slots de citas.
+    Grilla cada 15 min; una cita en o ocupa [o, o+30).
+    Devuelve [(slot, minuto_local, ts_inicio_utc, box_nombre)].
+    """
+    salida = []
+    for slot_inicio, slot_fin, box_nombre in horarios:
+        for minuto, ts_ini, _ in grilla_slots(
+            fecha, slot_inicio + JORNADA_INICIO, slot_fin + JORNADA_INICIO, duracion=DURACION_CITA
+        ):
+            s_ini = minuto - JORNADA_INICIO
+            if any(s_ini < o + DURACION_CITA and o < s_ini + DURACION_CITA for o in ocupados):
+                continue
+            salida.append((s_ini, minuto, ts_ini, box_nombre))
+    return salida
+
+
+def celdas(cands):
+    return {c for s_ini, _, _, _ in cands for c in (s_ini, s_ini + reservas.CELDA)}
+
+
+def disponibles(cands, retenidas):
+    """Descuenta los slots retenidos por otros pacientes y arma la respuesta"""
+    return [
+        {
+            'horaInicio': hhmm(minuto),
+            'horaFin': hhmm(minuto + DURACION_CITA),
+            'box': box_nombre,
+            'fechaHora': datetime.fromtimestamp(ts_ini, UTC).isoformat(),
+        }
+        for s_ini, minuto, ts_ini, box_nombre in cands
+        if s_ini not in retenidas and s_ini + reservas.CELDA not in retenidas
+    ]
@@ -0,0 +1,159 @@
+"""
+Rollups diarios de citas para el dashboard de administración.
+
+Cada cita aporta 1 a la fila (fecha local, médico, especialidad, box, estado,
+prioridad). Las señales de Cita mueven ese 1 de una clave a otra cuando la
+cita cambia; `recalcular_rango` reconstruye un rango completo desde cero.
+"""
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncWeek
+
+from .models import CitaHistorica, EstadisticaCitaDiaria, Horario, MedicoEspecialidad
+from .tiempo import DIAS, a_local, fecha_y_slot
+DIMENSIONES = {
+    'estado': 'estado',
+    'prioridad': 'prioridad',
+    'medico': 'medico_id',
+    'especialidad': 'especialidad_id',
+    'box': 'box_id',
+}
+
+_local = threading.local()
+
+
+@contextmanager
+def suspender_actualizacion():
+    """
+    Desactiva la actualización incremental en el hilo actual (operaciones
+    masivas que luego llaman a recalcular_rango, o el archivado de citas).
+    """
+    previo = getattr(_local, 'suspendido', False)
+    _local.suspendido = True
+    try:
+        yield
+    finally:
+        _local.suspendido = previo
+
+
+def actualizacion_suspendida():
+    return getattr(_local, 'suspendido', False)
+
+
+def clave_cita(fechaHora, medico_id, medico_especialidad_id, estado, prioridad):
+    """Clave del rollup para una cita (una consulta para derivar el box)"""
+    fecha, slot = fecha_y_slot(fechaHora)
+    especialidad_id = box_id = None
+    if medico_especialidad_id:
+        especialidad_id = (
+            MedicoEspecialidad.objects.filter(pk=medico_especialidad_id)
+            .values_list('especialidad_id', flat=True).first()
+        )
+        box_id = Horario.objects.filter(
+            medico_especialidad_id=medico_especialidad_id,
+            dia=DIAS[fecha.weekday()],
+            slot_inicio__lte=slot,
+            slot_fin__gt=slot,
+        ).values_list('box_id', flat=True).first()
+    return (fecha, medico_id, especialidad_id, box_id, estado, prioridad)
+
+
+def _filtro(clave):
+    fecha, medico_id, especialidad_id, box_id, estado, prioridad = clave
+    return dict(
+        fecha=fecha, medico_id=medico_id, especialidad_id=especialidad_id,
+        box_id=box_id, estado=estado, prioridad=prioridad,
+    )
+
+
+def sumar(clave, delta):
+    filtro = _filtro(clave)
+    with transaction.atomic():
+        fila = EstadisticaCitaDiaria.objects.select_for_update().filter(**filtro).first()
+        if fila:
+            EstadisticaCitaDiaria.objects.filter(pk=fila.pk).update(total=F('total') + delta)
+        else:
+            EstadisticaCitaDiaria.objects.create(total=delta, **filtro)
+
+
+def recalcular_rango(desde, hasta, medico_id=None):
+    """
+    Reconstruye los rollups de las fechas locales [desde, hasta] leyendo las
+    citas por bloques. Pensado para un job periódico o después de una
+    operación masiva con suspender_actualizacion().
+    """
+    # Import local: exportacion importa models y reutilizamos su lectura por bloques
+    from .exportacion import ResolvedorBox, iterar_citas
+
+    boxes = ResolvedorBox(medico_id)
+    especialidades = dict(MedicoEspecialidad.objects.values_list('id', 'especialidad_id'))
+
+    conteo = Counter()
+    for c in iterar_citas(desde, hasta, medico_id):
+        local = a_local(c.fechaHora)
+        conteo[(
+            local.date(),
+            c.medico_id,
+            especialidades.get(c.medico_especialidad_id),
+            boxes.buscar(c.medico_especialidad_id, local)[0],
+            c.estado,
+            c.prioridad,
+        )] += 1
+
+    # Las citas archivadas (api/archivo.py) siguen contando en el dashboard
+    historicas = CitaHistorica.objects.filter(fecha_local__gte=desde, fecha_local__lte=hasta)
+    if medico_id:
+        historicas = historicas.filter(medico_id=medico_id)
+    for fecha, slot, m_id, me_id, estado, prioridad in historicas.values_list(
+        'fecha_local', 'slot', 'medico_id', 'medico_especialidad_id', 'estado', 'prioridad'
+    ).iterator(chunk_size=2000):
+        conteo[(
+            fecha, m_id, especialidades.get(me_id),
+            boxes.buscar_slot(me_id, fecha, slot)[0], estado, prioridad,
+        )] += 1
+
+    with transaction.atomic():
+        borrar = EstadisticaCitaDiaria.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+        if medico_id:
+            borrar = borrar.filter(medico_id=medico_id)
+        borrar.delete()
+        EstadisticaCitaDiaria.objects.bulk_create(
+            [EstadisticaCitaDiaria(total=n, **_filtro(clave)) for clave, n in conteo.items()],
+            batch_size=1000,
+        )
+    return sum(conteo.values())
+
+
+def consultar(desde, hasta, agrupar='dia', por=('estado',), medico_id=None, especialidad_id=None):
+    """Conteos por período ('dia' o 'semana') y las dimensiones pedidas"""
+    qs = EstadisticaCitaDiaria.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+    if medico_id:
+        qs = qs.filter(medico_id=medico_id)
+    if especialidad_id:
+        qs = qs.filter(especialidad_id=especialidad_id)
+
+    if agrupar == 'semana':
+        qs = qs.annotate(periodo=TruncWeek('fecha'))
+    else:
+        qs = qs.annotate(periodo=F('fecha'))
+
+    campos = [DIMENSIONES[d] for d in por]
+    filas = (
+        qs.values('periodo', *campos)
+        .annotate(cantidad=Sum('total'))
+        .filter(cantidad__gt=0)
+        .order_by('periodo', *campos)
+    )
+    resultado = []
+    for f in filas:
+        periodo = f.pop('periodo')
+        fila = {'periodo': periodo.isoformat() if periodo else None}
+        for d in por:
+            fila[d] = f[DIMENSIONES[d]]
+        fila['total'] = f['cantidad']
+        resultado.append(fila)
+    return resultado
@@ -0,0 +1,159 @@
+"""
+Canal push (Server-Sent Events) para que los clientes dejen de hacer polling
+de horarios_disponibles y del listado de citas.
+
+Canales:
+  medico:<id>:<YYYY-MM-DD>  slots tomados/liberados y cambios de estado del día
+  usuario:<id>              cambios de las citas del paciente
+
+Las señales de Cita publican en un broker en memoria que reparte a las colas
+asyncio de cada conexión abierta. El broker es por proceso: con varios workers
+cada uno entrega solo los eventos generados en él, por lo que los clientes
+deben tratar el stream como aviso para refrescar y no como fuente de verdad.
+Los streams requieren servir la app por ASGI (gestioncitas/asgi.py).
+"""
+import asyncio
+import json
+import threading
+
+from django.db import transaction
+
+from .lista_espera import ESTADOS_OCUPAN
+from .tiempo import fecha_y_slot, slot_a_hhmm
+
+KEEPALIVE_SEGUNDOS = 20
+MAX_PENDIENTES = 100
+
+
+def canal_medico(medico_id, fecha):
+    return f"medico:{medico_id}:{fecha.isoformat()}"
+
+
+def canal_usuario(usuario_id):
+    return f"usuario:{usuario_id}"
+
+
+def _encolar(cola, evento):
+    try:
+        cola.put_nowait(evento)
+    except asyncio.QueueFull:
+        # Cliente lento: se descarta el evento en vez de crecer sin límite
+        pass
+
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscriptores = {}
+
+    def suscribir(self, canales):
+        """Debe llamarse desde el event loop de la conexión"""
+        sub = (asyncio.get_running_loop(), asyncio.Queue(MAX_PENDIENTES))
+        with self._lock:
+            for canal in canales:
+                self._suscriptores.setdefault(canal, set()).add(sub)
+        return sub
+
+    def desuscribir(self, sub, canales):
+        with self._lock:
+            for canal in canales:
+                subs = self._suscriptores.get(canal)
+                if subs:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._suscriptores[canal]
+
+    def publicar(self, canal, evento):
+        """Seguro desde cualquier hilo (vistas sync, señales)"""
+        with self._lock:
+            subs = list(self._suscriptores.get(canal, ()))
+        for loop, cola in subs:
+            try:
+                loop.call_soon_threadsafe(_encolar, cola, evento)
+            except RuntimeError:
+                # Loop cerrado: la conexión se está cerrando
+                pass
+
+    def suscritos(self):
+        with self._lock:
+            return sum(len(s) for s in self._suscriptores.values())
+
+
+broker = Broker()
+
+
+def _posicion(medico_id, fechaHora, estado):
+    if not fechaHora or estado not in ESTADOS_OCUPAN:
+        return None
+    fecha, slot = fecha_y_slot(fechaHora)
+    return medico_id, fecha, slot
+
+
+def _evento(tipo, cita_id, medico_id, fecha, slot, estado):
+    return {
+        'tipo': tipo,
+        'cita_id': cita_id,
+        'medico_id': medico_id,
+        'fecha': fecha.isoformat(),
+        'slot': slot,
+        'horaInicio': slot_a_hhmm(slot),
+        'estado': estado,
+    }
+
+
+def eventos_cambio(cita_id, usuario_id, previo, actual):
+    """
+    previo/actual: (medico_id, fechaHora, estado) o None (creada/eliminada).
+    Devuelve [(canal, evento)] sin publicar.
+    """
+    salida = []
+    pos_previa = _posicion(*previo) if previo else None
+    pos_actual = _posicion(*actual) if actual else None
+    estado_previo = previo[2] if previo else None
+    estado_actual = actual[2] if actual else None
+
+    if pos_previa != pos_actual:
+        if pos_previa:
+            m, f, s = pos_previa
+            ev = _evento('slot_liberado', cita_id, m, f, s, estado_actual)
+            salida += [(canal_medico(m, f), ev), (canal_usuario(usuario_id), ev)]
+        if pos_actual:
+            m, f, s = pos_actual
+            ev = _evento('slot_tomado', cita_id, m, f, s, estado_actual)
+            salida += [(canal_medico(m, f), ev), (canal_usuario(usuario_id), ev)]
+
+    if previo and actual and estado_previo != estado_actual:
+        m, fechaHora = actual[0], actual[1]
+        f, s = fecha_y_slot(fechaHora)
+        ev = _evento('estado_cambiado', cita_id, m, f, s, estado_actual)
+        ev['estado_anterior'] = estado_previo
+        salida += [(canal_medico(m, f), ev), (canal_usuario(usuario_id), ev)]
+    return salida
+
+
+def publicar_cambio(cita_id, usuario_id, previo, actual):
+    """Publica después del commit para no anunciar cambios que terminan en rollback"""
+    salida = eventos_cambio(cita_id, usuario_id, previo, actual)
+    if salida:
+        transaction.on_commit(lambda: [broker.publicar(c, e) for c, e in salida])
+
+
+def formato_sse(evento):
+    return f"event: {evento['tipo']}\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+
+
+async def stream(canales):
+    """Iterador async de texto SSE con keepalive; se desuscribe al cerrar la conexión"""
+    sub = broker.suscribir(canales)
+    cola = sub[1]
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                evento = await asyncio.wait_for(cola.get(), timeout=KEEPALIVE_SEGUNDOS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield formato_sse(evento)
+    finally:
+        broker.desuscribir(sub, canales)
@@ -0,0 +1,159 @@
+"""
+Excepciones de horario (feriados, vacaciones, boxes cerrados) como índice de intervalos.
+
+Los rangos de fechas se fusionan y ordenan una vez; luego cada consulta
+"¿está cerrado este día?" es un bisect O(log n) sobre los ordinales de inicio.
+"""
+from bisect import bisect_right
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import calendario, correo, notificaciones
+from .estadisticas import recalcular_rango, suspender_actualizacion
+from .eventos import publicar_cambio
+from .exportacion import ResolvedorBox
+from .models import Cita, ExcepcionHorario
+from .tiempo import fecha_y_slot
+
+
+class IndiceIntervalos:
+    """Intervalos cerrados [inicio, fin] de fechas, fusionados y ordenados"""
+
+    def __init__(self, intervalos=()):
+        fusionados = []
+        for inicio, fin, motivo in sorted(
+            ((i.toordinal(), f.toordinal(), m) for i, f, m in intervalos), key=lambda x: x[0]
+        ):
+            if fusionados and inicio <= fusionados[-1][1] + 1:
+                ultimo = fusionados[-1]
+                ultimo[1] = max(ultimo[1], fin)
+                if motivo and motivo not in ultimo[2]:
+                    ultimo[2].append(motivo)
+            else:
+                fusionados.append([inicio, fin, [motivo] if motivo else []])
+        self._inicios = [i for i, _, _ in fusionados]
+        self._fines = [f for _, f, _ in fusionados]
+        self._motivos = [', '.join(m) for _, _, m in fusionados]
+
+    def __len__(self):
+        return len(self._inicios)
+
+    def _buscar(self, fecha):
+        o = fecha.toordinal()
+        i = bisect_right(self._inicios, o) - 1
+        if i >= 0 and self._fines[i] >= o:
+            return i
+        return None
+
+    def contiene(self, fecha):
+        return self._buscar(fecha) is not None
+
+    def motivo(self, fecha):
+        i = self._buscar(fecha)
+        return self._motivos[i] if i is not None else None
+
+
+class CalendarioExcepciones:
+    """
+    Excepciones que afectan a un médico en [desde, hasta], cargadas con una
+    sola consulta: índice general (médico + clínica) y un índice por box.
+    """
+
+    def __init__(self, medico_id, desde, hasta, filas=None):
+        # filas: resultado ya leído de consulta() (p.ej. con el ORM async)
+        general, por_box = [], {}
+        if filas is None:
+            filas = self.consulta(medico_id, desde, hasta)
+        for box_id, inicio, fin, motivo in filas:
+            if box_id:
+                por_box.setdefault(box_id, []).append((inicio, fin, motivo))
+            else:
+                general.append((inicio, fin, motivo))
+        self.general = IndiceIntervalos(general)
+        self.por_box = {b: IndiceIntervalos(v) for b, v in por_box.items()}
+
+    @staticmethod
+    def consulta(medico_id, desde, hasta):
+        return ExcepcionHorario.objects.filter(
+            Q(medico_id=medico_id) | Q(box__medico_id=medico_id) | Q(medico__isnull=True, box__isnull=True),
+            fecha_fin__gte=desde,
+            fecha_inicio__lte=hasta,
+        ).values_list('box_id', 'fecha_inicio', 'fecha_fin', 'motivo')
+
+    def cerrado(self, fecha, box_id=None):
+        if self.general.contiene(fecha):
+            return True
+        indice = self.por_box.get(box_id) if box_id else None
+        return bool(indice and indice.contiene(fecha))
+
+    def motivo(self, fecha, box_id=None):
+        motivo = self.general.motivo(fecha)
+        if motivo is None and box_id and box_id in self.por_box:
+            motivo = self.por_box[box_id].motivo(fecha)
+        return motivo
+
+
+def dia_cerrado(medico_id, fecha, box_id=None):
+    """Atajo para validar una sola fecha: (cerrado, motivo)"""
+    cal = CalendarioExcepciones(medico_id, fecha, fecha)
+    return cal.cerrado(fecha, box_id), cal.motivo(fecha, box_id)
+
+
+ESTADOS_ACTIVOS = ['Pendiente', 'Confirmada', 'Reprogramada']
+
+
+def cancelar_citas_afectadas(excepcion):
+    """
+    Cancela en una sola sentencia UPDATE las citas activas que caen dentro de
+    la excepción y reconstruye los rollups del rango afectado. Devuelve los ids.
+    """
+    qs = Cita.objects.filter(
+        fecha_local__gte=excepcion.fecha_inicio,
+        fecha_local__lte=excepcion.fecha_fin,
+        estado__in=ESTADOS_ACTIVOS,
+    )
+    medico_id = None
+    if excepcion.box_id:
+        medico_id = excepcion.box.medico_id
+        boxes = ResolvedorBox(medico_id)
+        ids = [
+            pk for pk, me_id, fecha, slot in qs.filter(medico_id=medico_id)
+            .values_list('id', 'medico_especialidad_id', 'fecha_local', 'slot')
+            if boxes.buscar_slot(me_id, fecha, slot)[0] == excepcion.box_id
+        ]
+    else:
+        if excepcion.medico_id:
+            medico_id = excepcion.medico_id
+            qs = qs.filter(medico_id=medico_id)
+        ids = list(qs.values_list('id', flat=True))
+
+    if ids:
+        afectadas = list(
+            Cita.objects.filter(pk__in=ids).values_list('id', 'usuario_id', 'medico_id', 'fechaHora', 'estado')
+        )
+        with suspender_actualizacion():
+            Cita.objects.filter(pk__in=ids).update(estado='Cancelada', updated_at=timezone.now())
+        recalcular_rango(excepcion.fecha_inicio, excepcion.fecha_fin, medico_id)
+        # El UPDATE masivo no dispara señales: avisar al feed de eventos a mano
+        for pk, usuario_id, m_id, fechaHora, estado in afectadas:
+            publicar_cambio(pk, usuario_id, (m_id, fechaHora, estado), (m_id, fechaHora, 'Cancelada'))
+        meses = {(m_id, fecha_y_slot(fechaHora)[0]) for _, _, m_id, fechaHora, _ in afectadas}
+        transaction.on_commit(lambda: [calendario.invalidar_mes(m_id, fecha) for m_id, fecha in meses])
+        transaction.on_commit(lambda: notificar_canceladas(ids))
+    return ids
+
+
+def notificar_canceladas(ids):
+    """
+    Lo que una cancelación individual hace en la vista y el UPDATE masivo se
+    salta: correo 'cancelada' al paciente. Los slots siguen cerrados por la
+    excepción, así que no se ofrecen a la lista de espera.
+    """
+    citas = Cita.objects.filter(pk__in=ids).select_related(*notificaciones.RELACIONADOS).order_by('id')
+    for cita in citas:
+        try:
+            correo.encolar(notificaciones.mensaje_cita('cancelada', cita))
+        except Exception as e:
+            print(f"❌ Error notificando cancelación de cita {cita.pk}: {e}")
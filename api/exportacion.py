@@ -0,0 +1,132 @@
+"""
+Exportación de citas en streaming (CSV o NDJSON) para reportes.
+
+Las citas se recorren por keyset (fechaHora, id) en bloques de tamaño fijo,
+así la memoria se mantiene plana aunque el rango abarque años: MySQL no
+soporta cursores del lado del servidor y un .iterator() simple cargaría el
+resultado completo en el driver.
+"""
+import csv
+import json
+from django.db.models import Q
+
+from .models import Cita, Horario
+from .tiempo import DIAS, JORNADA_INICIO, UTC, a_local, limites_dia
+
+COLUMNAS = [
+    'id', 'fecha', 'hora', 'fechaHora_utc', 'estado', 'prioridad',
+    'paciente', 'paciente_rut', 'medico', 'especialidad', 'box', 'descripcion',
+]
+
+
+class ResolvedorBox:
+    """
+    Deriva el box de cada cita desde el Horario que la contiene, con los
+    horarios precargados en memoria (la tabla es pequeña) en vez de una
+    consulta por fila como CitaSerializer.get_box_nombre.
+    """
+
+    def __init__(self, medico_id=None):
+        qs = Horario.objects.select_related('box').filter(box__isnull=False)
+        if medico_id:
+            qs = qs.filter(medico_especialidad__medico_id=medico_id)
+        self._horarios = {}
+        for h in qs:
+            self._horarios.setdefault((h.medico_especialidad_id, h.dia), []).append(
+                (h.slot_inicio, h.slot_fin, h.box_id, h.box.nombre)
+            )
+
+    def buscar(self, medico_especialidad_id, fecha_local):
+        """(box_id, nombre) del horario que contiene la hora local, o (None, None)"""
+        slot = fecha_local.hour * 60 + fecha_local.minute - JORNADA_INICIO
+        return self.buscar_slot(medico_especialidad_id, fecha_local, slot)
+
+    def buscar_slot(self, medico_especialidad_id, fecha, slot):
+        if not medico_especialidad_id:
+            return None, None
+        for inicio, fin, box_id, nombre in self._horarios.get((medico_especialidad_id, DIAS[fecha.weekday()]), ()):
+            if inicio <= slot < fin:
+                return box_id, nombre
+        return None, None
+
+    def box_nombre(self, medico_especialidad_id, fecha_local):
+        return self.buscar(medico_especialidad_id, fecha_local)[1]
+
+
+def rango_utc(desde=None, hasta=None):
+    """Fechas locales (date) inclusivas -> límites aware para filtrar fechaHora"""
+    inicio = limites_dia(desde).inicio_utc if desde else None
+    fin = limites_dia(hasta).fin_utc if hasta else None
+    return inicio, fin
+
+
+def iterar_citas(desde=None, hasta=None, medico_id=None, bloque=2000):
+    """Genera citas ordenadas por (fechaHora, id) leyendo de a `bloque` filas"""
+    inicio, fin = rango_utc(desde, hasta)
+    qs = Cita.objects.select_related(
+        'usuario', 'medico__usuario', 'medico_especialidad__especialidad'
+    ).order_by('fechaHora', 'id')
+    if inicio:
+        qs = qs.filter(fechaHora__gte=inicio)
+    if fin:
+        qs = qs.filter(fechaHora__lt=fin)
+    if medico_id:
+        qs = qs.filter(medico_id=medico_id)
+
+    ultimo = None
+    while True:
+        pagina = qs
+        if ultimo:
+            pagina = qs.filter(Q(fechaHora__gt=ultimo[0]) | Q(fechaHora=ultimo[0], id__gt=ultimo[1]))
+        filas = list(pagina[:bloque])
+        if not filas:
+            return
+        yield from filas
+        ultimo = (filas[-1].fechaHora, filas[-1].id)
+        if len(filas) < bloque:
+            return
+
+
+def filas_exportacion(desde=None, hasta=None, medico_id=None):
+    boxes = ResolvedorBox(medico_id)
+    for c in iterar_citas(desde, hasta, medico_id):
+        local = a_local(c.fechaHora)
+        me = c.medico_especialidad
+        yield {
+            'id': c.id,
+            'fecha': local.strftime('%Y-%m-%d'),
+            'hora': local.strftime('%H:%M'),
+            'fechaHora_utc': c.fechaHora.astimezone(UTC).isoformat(),
+            'estado': c.estado,
+            'prioridad': c.prioridad,
+            'paciente': c.usuario.nombre,
+            'paciente_rut': c.usuario.rut,
+            'medico': c.medico.usuario.nombre,
+            'especialidad': me.especialidad.nombre if me else None,
+            'box': boxes.box_nombre(c.medico_especialidad_id, local),
+            'descripcion': c.descripcion or '',
+        }
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: devuelve la línea en vez de escribirla"""
+    def write(self, value):
+        return value
+
+
+def generar_csv(filas):
+    writer = csv.writer(_Eco())
+    yield writer.writerow(COLUMNAS)
+    for fila in filas:
+        yield writer.writerow([fila[c] for c in COLUMNAS])
+
+
+def generar_ndjson(filas):
+    for fila in filas:
+        yield json.dumps(fila, ensure_ascii=False) + '\n'
+
+
+FORMATOS = {
+    'csv': (generar_csv, 'text/csv; charset=utf-8', 'csv'),
+    'ndjson': (generar_ndjson, 'application/x-ndjson', 'ndjson'),
+}
@@ -0,0 +1,84 @@
+"""
+Idempotency-Key para los POST que los clientes móviles reintentan
+(crear cita, registrar, verificar-o-crear-rut).
+
+La primera petición con una clave se ejecuta normal y su respuesta queda en
+la cache por IDEMPOTENCIA_TTL segundos; las repeticiones reciben esa misma
+respuesta sin pasar por validación, hashing de contraseña ni envío de correo.
+
+Cada entrada guarda solo lo necesario para reproducir la respuesta: huella
+del cuerpo (16 bytes), status, content-type y el contenido, comprimido con
+zlib si es grande. La cache se encarga del vencimiento.
+
+La clave se asocia al cliente (hash del header Authorization) y a la ruta,
+para que dos usuarios con la misma clave no compartan respuestas, y a la
+huella del cuerpo: la misma clave con otro cuerpo es un error del cliente.
+"""
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+PREFIJO = 'idem'
+LARGO_MAX_CLAVE = 255
+COMPRIMIR_DESDE = 1024
+# Mientras la primera petición se procesa, las repeticiones reciben 409
+SEGUNDOS_EN_CURSO = 30
+# Respuestas que no se guardan: errores del servidor y conflictos transitorios
+NO_GUARDAR = {409, 429}
+
+
+def ttl():
+    return settings.IDEMPOTENCIA_TTL
+
+
+def _hash(*partes, largo=16):
+    h = hashlib.blake2b(digest_size=largo)
+    for parte in partes:
+        h.update(parte if isinstance(parte, bytes) else parte.encode())
+        h.update(b'\0')
+    return h.digest()
+
+
+def clave_valida(clave):
+    return bool(clave) and len(clave) <= LARGO_MAX_CLAVE and clave.isprintable()
+
+
+def clave_cache(clave, ruta, autorizacion):
+    return f"{PREFIJO}:{_hash(clave, ruta, autorizacion or '').hex()}"
+
+
+def huella(cuerpo):
+    return _hash(cuerpo)
+
+
+def tomar(clave_c):
+    """Marca la clave como en curso. False si otra petición ya la tiene."""
+    return cache.add(f"{clave_c}:curso", 1, SEGUNDOS_EN_CURSO)
+
+
+def soltar(clave_c):
+    cache.delete(f"{clave_c}:curso")
+
+
+def guardable(status):
+    return status < 500 and status not in NO_GUARDAR
+
+
+def guardar(clave_c, huella_cuerpo, status, content_type, contenido):
+    comprimido = len(contenido) >= COMPRIMIR_DESDE
+    if comprimido:
+        contenido = zlib.compress(contenido, 6)
+    cache.set(clave_c, (huella_cuerpo, status, content_type, comprimido, contenido), ttl())
+
+
+def obtener(clave_c):
+    """(huella, status, content_type, contenido) o None"""
+    entrada = cache.get(clave_c)
+    if entrada is None:
+        return None
+    huella_cuerpo, status, content_type, comprimido, contenido = entrada
+    if comprimido:
+        contenido = zlib.decompress(contenido)
+    return huella_cuerpo, status, content_type, contenido
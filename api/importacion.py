@@ -0,0 +1,234 @@
+"""
+Importación masiva de pacientes (CSV o JSONL) para el onboarding de clínicas.
+
+El archivo se lee en streaming y se procesa por lotes:
+  1. validar RUT (dígito verificador) y deduplicar dentro del lote
+  2. descartar RUTs/correos que ya existen con una consulta por lote
+  3. hashear contraseñas en un pool de procesos (make_password es CPU-bound)
+  4. insertar Usuario + Paciente + términos de búsqueda con bulk_create
+"""
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+
+from .models import Usuario, Paciente, TerminoBusqueda
+from .normalizacion import normalizar_rut, normalizar_texto, terminos, validar_rut
+
+MAX_ERRORES_REPORTADOS = 100
+# Tope de procesos cuando la importación corre dentro de un worker web
+# (el comando importar_pacientes no tiene este límite)
+MAX_PROCESOS_HTTP = 2
+
+
+def _inicializar_worker():
+    # Con start method 'spawn' el proceso hijo no hereda Django configurado
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def leer_registros(archivo, formato='csv'):
+    """
+    Generador de dicts a partir de un archivo de texto o binario.
+    CSV: encabezados rut,nombre,correo,telefono,direccion,password
+    JSONL: un objeto JSON por línea con las mismas claves.
+    """
+    if hasattr(archivo, 'chunks'):
+        # UploadedFile de Django: envolver el archivo binario subyacente
+        archivo = io.TextIOWrapper(archivo.file, encoding='utf-8-sig', newline='')
+    elif isinstance(archivo, (io.BufferedIOBase, io.RawIOBase)):
+        archivo = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+
+    if formato == 'jsonl':
+        for numero, linea in enumerate(archivo, 1):
+            linea = linea.strip()
+            if linea:
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f'Línea {numero}: JSON inválido ({e.msg})')
+                if not isinstance(registro, dict):
+                    raise ValueError(f'Línea {numero}: se esperaba un objeto JSON')
+                yield registro
+    else:
+        lector = csv.DictReader(archivo)
+        try:
+            yield from lector
+        except csv.Error as e:
+            raise ValueError(f'Línea {lector.line_num}: CSV inválido ({e})')
+
+
+def _correos_registrados(correos):
+    """Subconjunto de `correos` (en minúsculas) que ya existe, sin distinguir mayúsculas."""
+    if connection.vendor == 'mysql':
+        # La colación por defecto de MySQL ya compara sin distinguir mayúsculas y usa el índice único
+        qs = Usuario.objects.filter(correo__in=correos)
+    else:
+        qs = Usuario.objects.annotate(correo_min=Lower('correo')).filter(correo_min__in=correos)
+    return {c.lower() for c in qs.values_list('correo', flat=True)}
+
+
+def _lotes(iterable, tamano):
+    lote = []
+    for item in iterable:
+        lote.append(item)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+class ImportadorPacientes:
+    """
+    Uso:
+        with ImportadorPacientes(procesos=4) as imp:
+            resumen = imp.importar(leer_registros(f, 'csv'), on_progreso=print)
+    """
+
+    def __init__(self, tamano_lote=1000, procesos=None):
+        self.tamano_lote = tamano_lote
+        self.procesos = procesos if procesos is not None else (os.cpu_count() or 1)
+        self._pool = None
+        self.resumen = {
+            'leidos': 0,
+            'creados': 0,
+            'duplicados': 0,
+            'invalidos': 0,
+            'errores': [],
+            'segundos': 0.0,
+            'por_segundo': 0.0,
+        }
+
+    def __enter__(self):
+        if self.procesos > 1:
+            self._pool = ProcessPoolExecutor(max_workers=self.procesos, initializer=_inicializar_worker)
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _error(self, linea, mensaje):
+        self.resumen['invalidos'] += 1
+        if len(self.resumen['errores']) < MAX_ERRORES_REPORTADOS:
+            self.resumen['errores'].append({'linea': linea, 'error': mensaje})
+
+    def _hashear(self, passwords):
+        if self._pool:
+            chunk = max(1, len(passwords) // (self.procesos * 4))
+            return list(self._pool.map(make_password, passwords, chunksize=chunk))
+        return [make_password(p) for p in passwords]
+
+    def importar(self, registros, on_progreso=None):
+        inicio = time.monotonic()
+        linea = 0
+        for lote in _lotes(registros, self.tamano_lote):
+            filas = []
+            for registro in lote:
+                linea += 1
+                self.resumen['leidos'] += 1
+                filas.append((linea, registro))
+            self._procesar_lote(filas)
+
+            self.resumen['segundos'] = round(time.monotonic() - inicio, 3)
+            if self.resumen['segundos']:
+                self.resumen['por_segundo'] = round(self.resumen['leidos'] / self.resumen['segundos'], 1)
+            if on_progreso:
+                on_progreso(self.resumen)
+        self.resumen['segundos'] = round(time.monotonic() - inicio, 3)
+        return self.resumen
+
+    def _procesar_lote(self, filas):
+        # 1. Validación y deduplicación dentro del lote
+        candidatos = {}
+        for linea, r in filas:
+            rut = (r.get('rut') or '').strip()
+            if not validar_rut(rut):
+                self._error(linea, f'RUT inválido: {rut!r}')
+                continue
+            rut_norm = normalizar_rut(rut)
+            if rut_norm in candidatos:
+                self.resumen['duplicados'] += 1
+                continue
+            candidatos[rut_norm] = (linea, rut, r)
+
+        if not candidatos:
+            return
+
+        # 2. Deduplicación contra la base (una consulta por RUT y otra por correo)
+        existentes = set(
+            Usuario.objects.filter(rut_normalizado__in=list(candidatos.keys()))
+            .values_list('rut_normalizado', flat=True)
+        )
+        for rut_norm in existentes:
+            candidatos.pop(rut_norm)
+            self.resumen['duplicados'] += 1
+
+        correos = {}
+        vistos = set()
+        for rut_norm, (linea, rut, r) in list(candidatos.items()):
+            correo = (r.get('correo') or '').strip() or f"{rut}@temporal.com"
+            if correo.lower() in vistos:
+                self._error(linea, f'Correo repetido en el archivo: {correo}')
+                candidatos.pop(rut_norm)
+                continue
+            vistos.add(correo.lower())
+            correos[rut_norm] = correo
+        correos_tomados = _correos_registrados(list(vistos))
+        for rut_norm, correo in list(correos.items()):
+            if correo.lower() in correos_tomados:
+                linea = candidatos.pop(rut_norm)[0]
+                correos.pop(rut_norm)
+                self._error(linea, f'Correo ya registrado: {correo}')
+
+        if not candidatos:
+            return
+
+        # 3. Hash de contraseñas en paralelo (por defecto, el RUT como en verificar_o_crear_rut)
+        orden = list(candidatos.keys())
+        hashes = self._hashear([
+            (candidatos[k][2].get('password') or candidatos[k][1]) for k in orden
+        ])
+
+        # 4. Inserción masiva
+        usuarios = []
+        for rut_norm, password in zip(orden, hashes):
+            linea, rut, r = candidatos[rut_norm]
+            nombre = (r.get('nombre') or '').strip() or f"Usuario {rut}"
+            usuarios.append(Usuario(
+                rut=rut,
+                nombre=nombre,
+                correo=correos[rut_norm],
+                telefono=(r.get('telefono') or '').strip() or None,
+                password=password,
+                rol='Paciente',
+                rut_normalizado=rut_norm,
+                nombre_busqueda=normalizar_texto(nombre)[:255],
+            ))
+
+        with transaction.atomic():
+            Usuario.objects.bulk_create(usuarios, batch_size=self.tamano_lote)
+            # MySQL no devuelve los PKs de bulk_create: se releen por rut_normalizado
+            ids = dict(
+                Usuario.objects.filter(rut_normalizado__in=orden).values_list('rut_normalizado', 'id')
+            )
+            Paciente.objects.bulk_create([
+                Paciente(usuario_id=ids[k], direccion=(candidatos[k][2].get('direccion') or '').strip() or None)
+                for k in orden
+            ], batch_size=self.tamano_lote)
+            TerminoBusqueda.objects.bulk_create([
+                TerminoBusqueda(usuario_id=ids[u.rut_normalizado], termino=t)
+                for u in usuarios for t in terminos(u.nombre)
+            ], batch_size=self.tamano_lote)
+
+        self.resumen['creados'] += len(usuarios)
@@ -0,0 +1,159 @@
+"""
+Motor de lista de espera: cuando una cita se cancela o se reprograma, el slot
+liberado se ofrece a la entrada activa más antigua compatible.
+
+El candidato sale de una sola consulta con LIMIT 1 sobre el índice
+(especialidad, estado, fecha_creacion, id): se recorre en el orden de llegada y
+el rango de fechas se evalúa fila a fila hasta la primera compatible, sin
+ordenar la lista. La oferta es
+una reserva temporal del slot (api/reservas.py); el paciente la acepta con
+/api/citas/confirmar-reserva/ y si la deja vencer `expirar_ofertas` pasa el
+slot al siguiente candidato.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import correo, excepciones, notificaciones, reservas
+from .exportacion import ResolvedorBox
+from .models import Cita, ListaEspera, MedicoEspecialidad
+from .tiempo import DURACION_CITA, fecha_y_slot, formato_chile, slot_a_utc
+
+ESTADOS_OCUPAN = ['Pendiente', 'Confirmada', 'Reprogramada']
+
+
+def buscar_candidato(medico_id, especialidad_id, fecha, excluir_usuarios=()):
+    qs = ListaEspera.objects.filter(
+        Q(medico_id=medico_id) | Q(medico__isnull=True),
+        especialidad_id=especialidad_id,
+        estado='Activa',
+        fecha_desde__lte=fecha,
+        fecha_hasta__gte=fecha,
+    )
+    if excluir_usuarios:
+        qs = qs.exclude(usuario_id__in=excluir_usuarios)
+    # skip_locked: dos cancelaciones simultáneas no eligen la misma entrada
+    return qs.order_by('fecha_creacion', 'id').select_for_update(skip_locked=True).first()
+
+
+def slot_libre(medico_id, fecha, slot):
+    return not Cita.objects.filter(
+        medico_id=medico_id,
+        fecha_local=fecha,
+        slot__gt=slot - DURACION_CITA,
+        slot__lt=slot + DURACION_CITA,
+        estado__in=ESTADOS_OCUPAN,
+    ).exists()
+
+
+def slot_cerrado(medico_id, medico_especialidad_id, fecha, slot):
+    """Feriado, vacaciones del médico o box cerrado (ExcepcionHorario) en ese slot"""
+    box_id = ResolvedorBox(medico_id).buscar_slot(medico_especialidad_id, fecha, slot)[0]
+    return excepciones.dia_cerrado(medico_id, fecha, box_id)[0]
+
+
+def rellenar_slot(medico_id, medico_especialidad_id, fecha, slot, excluir_usuarios=()):
+    """
+    Ofrece el slot (fecha local, slot) al mejor candidato de la lista de espera.
+    Devuelve la entrada ofrecida o None si no hay candidato, el slot ya no está
+    libre o cae dentro de una excepción de horario.
+    """
+    if not medico_especialidad_id or fecha is None or slot is None:
+        return None
+    fechaHora = slot_a_utc(fecha, slot)
+    if fechaHora <= timezone.now() or not slot_libre(medico_id, fecha, slot):
+        return None
+    if slot_cerrado(medico_id, medico_especialidad_id, fecha, slot):
+        return None
+    especialidad_id = (
+        MedicoEspecialidad.objects.filter(pk=medico_especialidad_id)
+        .values_list('especialidad_id', flat=True).first()
+    )
+
+    with transaction.atomic():
+        entrada = buscar_candidato(medico_id, especialidad_id, fecha, excluir_usuarios)
+        if not entrada:
+            return None
+        token = reservas.reservar(entrada.usuario_id, medico_id, medico_especialidad_id, fecha, slot)
+        if not token:
+            # Otro paciente ya retuvo el slot desde la disponibilidad
+            return None
+        entrada.estado = 'Ofrecida'
+        entrada.oferta_token = token
+        entrada.oferta_fechaHora = fechaHora
+        entrada.oferta_medico_especialidad_id = medico_especialidad_id
+        entrada.oferta_expira = timezone.now() + timedelta(seconds=reservas.ttl())
+        entrada.save(update_fields=[
+            'estado', 'oferta_token', 'oferta_fechaHora', 'oferta_medico_especialidad', 'oferta_expira'
+        ])
+
+    print(f"📨 [lista_espera] slot {fechaHora.isoformat()} ofrecido a usuario {entrada.usuario_id} (entrada {entrada.pk})")
+    notificar_oferta(entrada)
+    return entrada
+
+
+def notificar_oferta(entrada):
+    try:
+        correo.encolar(notificaciones.mensaje('oferta_lista_espera', entrada.usuario.correo, {
+            'paciente': entrada.usuario.nombre,
+            'fecha_hora': formato_chile(entrada.oferta_fechaHora),
+            'minutos': max(1, reservas.ttl() // 60),
+        }))
+    except Exception as e:
+        print(f"❌ Error notificando oferta de lista de espera {entrada.pk}: {e}")
+
+
+def _limpiar_oferta(entrada, estado):
+    entrada.estado = estado
+    entrada.oferta_token = ''
+    entrada.oferta_fechaHora = None
+    entrada.oferta_medico_especialidad = None
+    entrada.oferta_expira = None
+    entrada.save(update_fields=[
+        'estado', 'oferta_token', 'oferta_fechaHora', 'oferta_medico_especialidad', 'oferta_expira'
+    ])
+
+
+def rechazar_oferta(entrada):
+    """El paciente no quiere el slot: vuelve a la espera y el slot pasa al siguiente"""
+    oferta = (entrada.oferta_medico_especialidad, entrada.oferta_fechaHora)
+    reservas.liberar(entrada.oferta_token)
+    _limpiar_oferta(entrada, 'Activa')
+    return _reofrecer(*oferta, excluir_usuarios=[entrada.usuario_id])
+
+
+def _reofrecer(me, fechaHora, excluir_usuarios=()):
+    if not me or not fechaHora:
+        return None
+    fecha, slot = fecha_y_slot(fechaHora)
+    return rellenar_slot(me.medico_id, me.pk, fecha, slot, excluir_usuarios)
+
+
+def marcar_asignada(token):
+    """Llamado al confirmar una reserva: si venía de una oferta, la entrada queda Asignada"""
+    if token:
+        ListaEspera.objects.filter(oferta_token=token, estado='Ofrecida').update(
+            estado='Asignada', oferta_expira=None
+        )
+
+
+def expirar_ofertas(ahora=None):
+    """
+    Ofertas vencidas sin confirmar: la entrada vuelve a Activa y el slot se
+    ofrece al siguiente candidato. Devuelve (vencidas, reofrecidas).
+    """
+    ahora = ahora or timezone.now()
+    vencidas = list(
+        ListaEspera.objects.filter(estado='Ofrecida', oferta_expira__lt=ahora)
+        .select_related('oferta_medico_especialidad')
+    )
+    reofrecidas = 0
+    for entrada in vencidas:
+        oferta = (entrada.oferta_medico_especialidad, entrada.oferta_fechaHora)
+        reservas.liberar(entrada.oferta_token)
+        _limpiar_oferta(entrada, 'Activa')
+        if _reofrecer(*oferta, excluir_usuarios=[entrada.usuario_id]):
+            reofrecidas += 1
+    return len(vencidas), reofrecidas
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.archivo import ESTADOS_ARCHIVABLES, archivables, archivar, fecha_corte
+
+
+class Command(BaseCommand):
+    help = 'Mueve a la tabla de archivo las citas confirmadas/canceladas más antiguas que N meses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=12)
+        parser.add_argument('--lote', type=int, default=1000)
+        parser.add_argument('--estados', default=','.join(ESTADOS_ARCHIVABLES))
+        parser.add_argument('--dry-run', action='store_true', help='Solo contar, sin mover')
+
+    def handle(self, *args, **o):
+        if o['meses'] < 1:
+            raise CommandError('--meses debe ser al menos 1')
+        estados = [e.strip() for e in o['estados'].split(',') if e.strip()]
+        corte = fecha_corte(timezone.localdate(), o['meses'])
+
+        if o['dry_run']:
+            total = archivables(corte, estados).count()
+            self.stdout.write(f'{total} citas anteriores a {corte} serían archivadas')
+            return
+
+        total = archivar(
+            corte, estados, lote=o['lote'],
+            on_progreso=lambda n: self.stdout.write(f'  {n} archivadas...'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archivadas {total} citas anteriores a {corte}'))
@@ -0,0 +1,68 @@
+"""
+Mide el costo de abrir conexiones por request: simula el ciclo de vida de N
+requests (request_started -> consulta -> request_finished) con CONN_MAX_AGE=0
+y con el valor configurado, contando conexiones abiertas y latencia.
+
+    python manage.py bench_conexiones --requests 500 --database default
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+class Command(BaseCommand):
+    help = 'Benchmark de churn de conexiones: sin persistencia vs CONN_MAX_AGE configurado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--consultas', type=int, default=3, help='Consultas por request simulado')
+        parser.add_argument('--max-age', type=int, default=None, help='CONN_MAX_AGE a comparar (por defecto el configurado)')
+
+    def handle(self, *args, **o):
+        conexion = connections[o['database']]
+        configurado = conexion.settings_dict.get('CONN_MAX_AGE', 0)
+        persistente = configurado if o['max_age'] is None else o['max_age']
+        self.stdout.write(
+            f"Base {o['database']} ({conexion.vendor}), CONN_MAX_AGE={configurado}, "
+            f"CONN_HEALTH_CHECKS={conexion.settings_dict.get('CONN_HEALTH_CHECKS')}"
+        )
+
+        modos = [('sin persistencia', 0)]
+        if persistente != 0:
+            modos.append((f'persistente ({persistente}s)', persistente))
+
+        self.stdout.write(f"{'modo':<24} {'conexiones':>10} {'total s':>9} {'ms/request':>11}")
+        for nombre, max_age in modos:
+            abiertas, segundos = self._medir(conexion, max_age, o['requests'], o['consultas'])
+            self.stdout.write(f"{nombre:<24} {abiertas:>10} {segundos:>9.3f} {segundos * 1000 / o['requests']:>11.2f}")
+
+        conexion.settings_dict['CONN_MAX_AGE'] = configurado
+
+    def _medir(self, conexion, max_age, n, consultas):
+        conexion.close()
+        conexion.settings_dict['CONN_MAX_AGE'] = max_age
+        abiertas = []
+
+        def contar(sender, connection, **kwargs):
+            if connection.alias == conexion.alias:
+                abiertas.append(1)
+
+        connection_created.connect(contar)
+        try:
+            inicio = time.perf_counter()
+            for _ in range(n):
+                request_started.send(sender=self.__class__)
+                with conexion.cursor() as cursor:
+                    for _ in range(consultas):
+                        cursor.execute('SELECT 1')
+                        cursor.fetchone()
+                request_finished.send(sender=self.__class__)
+            segundos = time.perf_counter() - inicio
+        finally:
+            connection_created.disconnect(contar)
+            conexion.close()
+        return len(abiertas), segundos
@@ -0,0 +1,122 @@
+"""
+Correos por segundo con el transporte anterior (una sesión SMTP por correo)
+contra la conexión compartida de api/correo.py y la cola por lotes.
+
+Con --servidor-local levanta un servidor aiosmtpd en un puerto libre que solo
+cuenta sesiones y mensajes (no entrega nada):
+
+    python manage.py bench_correo --servidor-local --n 200
+
+Sin esa opción usa EMAIL_HOST/EMAIL_PORT, que deben apuntar a un servidor de
+pruebas (p.ej. python -m aiosmtpd -n -l 127.0.0.1:1025).
+"""
+import socket
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from api import correo
+
+LOCALES = {'127.0.0.1', 'localhost', '::1'}
+
+
+class _Contador:
+    """Handler de aiosmtpd que acepta todo y cuenta sesiones (EHLO) y mensajes"""
+
+    def __init__(self):
+        self.sesiones = 0
+        self.mensajes = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sesiones += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.mensajes += 1
+        return '250 OK'
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _mensaje(i, destino):
+    return EmailMessage(f'Bench correo #{i}', 'Mensaje de prueba del benchmark de correo.', None, [destino])
+
+
+class Command(BaseCommand):
+    help = 'Benchmark de envío de correo: sesión por correo vs conexión reutilizada vs cola por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=200)
+        parser.add_argument('--destino', default='bench@example.com')
+        parser.add_argument('--servidor-local', action='store_true', help='Levanta un aiosmtpd propio')
+        parser.add_argument('--forzar', action='store_true', help='Permite un EMAIL_HOST no local')
+
+    def handle(self, *args, **o):
+        contador = controlador = None
+        ajustes = {}
+        if o['servidor_local']:
+            try:
+                from aiosmtpd.controller import Controller
+            except ImportError:
+                raise CommandError('Instale aiosmtpd para usar --servidor-local')
+            contador = _Contador()
+            controlador = Controller(contador, hostname='127.0.0.1', port=_puerto_libre())
+            controlador.start()
+            ajustes = {
+                'EMAIL_HOST': '127.0.0.1', 'EMAIL_PORT': controlador.port,
+                'EMAIL_USE_TLS': False, 'EMAIL_USE_SSL': False,
+                'EMAIL_HOST_USER': '', 'EMAIL_HOST_PASSWORD': '',
+            }
+        elif settings.EMAIL_HOST not in LOCALES and not o['forzar']:
+            raise CommandError(f'EMAIL_HOST={settings.EMAIL_HOST} no es local; use --servidor-local o --forzar')
+
+        try:
+            with override_settings(EMAIL_BACKEND='api.correo.PooledSMTPBackend', **ajustes):
+                self._medir_todo(o['n'], o['destino'], contador)
+        finally:
+            correo.cerrar_pool()
+            if controlador:
+                controlador.stop()
+
+    def _medir_todo(self, n, destino, contador):
+        self.stdout.write(f"servidor {settings.EMAIL_HOST}:{settings.EMAIL_PORT}, {n} correos por modo")
+        self.stdout.write(f"{'modo':<34} {'correos/s':>10} {'ms/correo':>10} {'sesiones':>9}")
+
+        def una_sesion_por_correo():
+            for i in range(n):
+                backend = get_connection('django.core.mail.backends.smtp.EmailBackend', fail_silently=False)
+                backend.send_messages([_mensaje(i, destino)])
+
+        def conexion_compartida():
+            for i in range(n):
+                _mensaje(i, destino).send(fail_silently=False)
+
+        def cola_por_lotes():
+            for i in range(n):
+                correo.cola.encolar(_mensaje(i, destino))
+            if not correo.vaciar(timeout=120):
+                raise CommandError('La cola no se vació a tiempo')
+
+        for nombre, envio in [
+            ('sesión por correo (anterior)', una_sesion_por_correo),
+            ('conexión compartida, send()', conexion_compartida),
+            ('cola por lotes (send_messages)', cola_por_lotes),
+        ]:
+            correo.cerrar_pool()
+            sesiones_previas = contador.sesiones if contador else 0
+            inicio = time.perf_counter()
+            envio()
+            segundos = time.perf_counter() - inicio
+            sesiones = f"{contador.sesiones - sesiones_previas}" if contador else '-'
+            self.stdout.write(f"{nombre:<34} {n / segundos:>10.1f} {segundos * 1000 / n:>10.2f} {sesiones:>9}")
+
+        if contador:
+            self.stdout.write(f"mensajes recibidos por el servidor: {contador.mensajes}")
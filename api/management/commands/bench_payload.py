@@ -0,0 +1,103 @@
+"""
+Tamaño y tiempo de render del listado de citas: JSON de DRF (anterior),
+orjson y formato compacto en columnas, cada uno sin comprimir, con gzip y con
+brotli (si está instalado).
+
+Por defecto arma filas ficticias con las claves de CitaSerializer (no toca la
+BD); con --desde-bd serializa las primeras --n citas reales.
+
+    python manage.py bench_payload --n 2000
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api import compresion, renderers
+from api.models import Cita
+from api.serializers import CitaSerializer
+
+NOMBRES = ['María José González Pérez', 'Juan Pablo Rodríguez Soto', 'Camila Andrea Muñoz Rojas', 'Diego Ignacio Díaz Fuentes']
+MEDICOS = ['Dr Juan Pérez', 'Dra Carolina Silva', 'Dr Andrés Morales']
+ESPECIALIDADES = ['Medicina General', 'Pediatría', 'Traumatología', 'Dermatología']
+ESTADOS = ['Pendiente', 'Confirmada', 'Cancelada']
+
+
+def _filas_ficticias(n):
+    rnd = random.Random(7)
+    base = datetime(2026, 3, 2, 12, 0)
+    filas = []
+    for i in range(n):
+        paciente = rnd.choice(NOMBRES)
+        fecha = base + timedelta(minutes=15 * i)
+        filas.append({
+            'id': 100_000 + i,
+            'usuario_nombre': paciente,
+            'paciente_nombre': paciente,
+            'medico_nombre': rnd.choice(MEDICOS),
+            'especialidad_nombre': rnd.choice(ESPECIALIDADES),
+            'box_nombre': f'Box {rnd.randint(1, 8)}',
+            'fechaHora': fecha.isoformat() + 'Z',
+            'estado': rnd.choice(ESTADOS),
+            'prioridad': rnd.choice(['Normal', 'Urgencia']),
+            'descripcion': 'Control' if i % 3 else '',
+            'fecha_local': fecha.date().isoformat(),
+            'slot': (i % 44),
+            'created_at': fecha.isoformat() + 'Z',
+            'updated_at': fecha.isoformat() + 'Z',
+            'usuario': rnd.randint(1, 5000),
+            'medico': rnd.randint(1, 40),
+            'medico_especialidad': rnd.randint(1, 80),
+        })
+    return filas
+
+
+class Command(BaseCommand):
+    help = 'Benchmark de tamaño/tiempo del listado de citas: JSON, orjson, compacto y compresión'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=2000)
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--desde-bd', action='store_true', help='Serializa citas reales en vez de ficticias')
+
+    def handle(self, *args, **o):
+        if o['desde_bd']:
+            qs = Cita.objects.select_related(
+                'usuario', 'medico__usuario', 'medico_especialidad__especialidad'
+            ).order_by('-fechaHora')[:o['n']]
+            filas = list(CitaSerializer(qs, many=True).data)
+        else:
+            filas = _filas_ficticias(o['n'])
+        if not filas:
+            self.stdout.write('No hay citas para medir')
+            return
+
+        if renderers.orjson is None:
+            self.stdout.write('orjson no instalado: JSONRapidoRenderer usa el encoder de DRF')
+        if compresion.brotli is None:
+            self.stdout.write('brotli no instalado: se omite esa columna')
+
+        modos = [
+            ('DRF JSONRenderer (anterior)', JSONRenderer(), filas),
+            ('orjson', renderers.JSONRapidoRenderer(), filas),
+            ('compacto (columnas)', renderers.CompactoRenderer(), filas),
+        ]
+        self.stdout.write(f"{len(filas)} citas")
+        self.stdout.write(f"{'modo':<28} {'ms':>7} {'bytes':>9} {'gzip':>8} {'ms gz':>6} {'br':>8} {'ms br':>6}")
+        for nombre, renderer, datos in modos:
+            inicio = time.perf_counter()
+            for _ in range(o['repeticiones']):
+                contenido = renderer.render(datos)
+            ms = (time.perf_counter() - inicio) * 1000 / o['repeticiones']
+            gz, ms_gz = self._comprimir(contenido, 'gzip')
+            br, ms_br = self._comprimir(contenido, 'br') if compresion.brotli else ('-', '-')
+            self.stdout.write(
+                f"{nombre:<28} {ms:>7.2f} {len(contenido):>9} {gz:>8} {ms_gz:>6} {br:>8} {ms_br:>6}"
+            )
+
+    def _comprimir(self, contenido, codificacion):
+        inicio = time.perf_counter()
+        tamano = len(compresion.comprimir(contenido, codificacion))
+        return tamano, f'{(time.perf_counter() - inicio) * 1000:.2f}'
@@ -0,0 +1,71 @@
+"""
+Confirmaciones por segundo según cómo se genera el QR adjunto: el render
+anterior (qrcode.make con PIL), PNG puro y SVG sin cache, y el hit de cache
+que deja el pre-renderizado. Cada confirmación arma el EmailMessage con el
+adjunto (sin enviarlo) para medir el costo completo del request.
+
+    python manage.py bench_qr --n 300
+"""
+import io
+import time
+
+import qrcode
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.management.base import BaseCommand
+
+from api import qr
+
+
+def _confirmar(cita_id, datos, content_type, extension):
+    email = EmailMessage('¡Tu Cita ha sido Confirmada!', 'cuerpo', None, ['paciente@example.com'])
+    email.attach(f'cita_qr_{cita_id}.{extension}', datos, content_type)
+    email.message().as_bytes()
+
+
+def _pil(cita_id):
+    buffer = io.BytesIO()
+    qrcode.make(qr.url_cita(cita_id)).save(buffer, format='PNG')
+    return buffer.getvalue(), 'image/png', 'png'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark de confirmaciones/segundo con los distintos caminos de render del QR'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=300)
+        parser.add_argument('--base-id', type=int, default=10_000_000, help='Ids ficticios (no se consulta la BD)')
+
+    def handle(self, *args, **o):
+        n, base = o['n'], o['base_id']
+        ids = range(base, base + n)
+
+        modos = [
+            ('png puro, sin cache', lambda i: (qr.renderizar(qr.url_cita(i), 'png'), 'image/png', 'png')),
+            ('svg, sin cache', lambda i: (qr.renderizar(qr.url_cita(i), 'svg'), 'image/svg+xml', 'svg')),
+        ]
+        try:
+            import PIL  # noqa: F401
+            modos.insert(0, ('PIL qrcode.make (anterior)', _pil))
+        except ImportError:
+            self.stdout.write('PIL no instalado: se omite el camino anterior (qrcode.make)')
+
+        self.stdout.write(f"{'modo':<28} {'conf/s':>9} {'ms/conf':>8} {'bytes':>7}")
+        for nombre, render in modos:
+            self._medir(nombre, ids, render)
+
+        for i in ids:
+            qr.qr_cita(i, 'png')
+        self._medir('png, hit de cache', ids, lambda i: qr.qr_cita(i, 'png'))
+        cache.delete_many([qr._clave(i, qr.url_cita(i), 'png') for i in ids])
+
+    def _medir(self, nombre, ids, render):
+        inicio = time.perf_counter()
+        tamano = 0
+        for i in ids:
+            datos, content_type, extension = render(i)
+            tamano = len(datos)
+            _confirmar(i, datos, content_type, extension)
+        segundos = time.perf_counter() - inicio
+        n = len(ids)
+        self.stdout.write(f"{nombre:<28} {n / segundos:>9.1f} {segundos * 1000 / n:>8.2f} {tamano:>7}")
@@ -0,0 +1,154 @@
+"""
+Compara el throughput del despliegue actual (gunicorn WSGI, workers sync)
+contra gunicorn + uvicorn workers (ASGI) con las vistas async.
+
+Levanta cada servidor en un puerto local, lanza N peticiones con C hilos
+concurrentes y reporta req/s y latencias p50/p95 por escenario:
+
+    python manage.py bench_servidor --rut 11.111.111-1 --password secreto \
+        --workers 2 --peticiones 2000 --concurrencia 32
+"""
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.models import Horario
+from api.tiempo import DIAS
+
+SERVIDORES = {
+    'wsgi': ['gestioncitas.wsgi:application'],
+    'asgi': ['gestioncitas.asgi:application', '-k', 'uvicorn_worker.UvicornWorker'],
+}
+
+# escenario -> (método, ruta WSGI/DRF, ruta ASGI/async)
+ESCENARIOS = {
+    'especialidades': ('GET', '/api/especialidades/', '/api/async/especialidades/'),
+    'login': ('POST', '/api/login/', '/api/async/login/'),
+    'disponibilidad': ('POST', '/api/citas/horarios_disponibles/', '/api/async/citas/horarios-disponibles/'),
+}
+
+
+def _pedir(url, metodo, cuerpo=None, token=None):
+    datos = json.dumps(cuerpo).encode() if cuerpo is not None else None
+    req = urllib.request.Request(url, data=datos, method=metodo)
+    req.add_header('Content-Type', 'application/json')
+    if token:
+        req.add_header('Authorization', f'Bearer {token}')
+    inicio = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            contenido = resp.read()
+            estado = resp.status
+    except urllib.error.HTTPError as e:
+        contenido, estado = e.read(), e.code
+    return estado, time.perf_counter() - inicio, contenido
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark de throughput WSGI (sync) vs ASGI (uvicorn + vistas async)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servidores', default='wsgi,asgi')
+        parser.add_argument('--escenarios', default=','.join(ESCENARIOS))
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--peticiones', type=int, default=1000)
+        parser.add_argument('--concurrencia', type=int, default=32)
+        parser.add_argument('--puerto', type=int, default=8765)
+        parser.add_argument('--rut', help='Usuario para login y disponibilidad')
+        parser.add_argument('--password')
+
+    def handle(self, *args, **o):
+        escenarios = [e for e in o['escenarios'].split(',') if e]
+        if ('login' in escenarios or 'disponibilidad' in escenarios) and not (o['rut'] and o['password']):
+            raise CommandError('login/disponibilidad requieren --rut y --password')
+
+        cuerpo_disp = None
+        if 'disponibilidad' in escenarios:
+            h = Horario.objects.select_related('medico_especialidad').first()
+            if not h:
+                raise CommandError('No hay horarios configurados para medir disponibilidad')
+            fecha = timezone.localdate() + timedelta(days=1)
+            while DIAS[fecha.weekday()] != h.dia:
+                fecha += timedelta(days=1)
+            cuerpo_disp = {
+                'medico_id': h.medico_especialidad.medico_id,
+                'medico_especialidad_id': h.medico_especialidad_id,
+                'fecha': fecha.isoformat(),
+            }
+
+        resultados = []
+        for servidor in o['servidores'].split(','):
+            if servidor not in SERVIDORES:
+                raise CommandError(f'Servidor desconocido: {servidor}')
+            base = f"http://127.0.0.1:{o['puerto']}"
+            proceso = self._levantar(servidor, o['puerto'], o['workers'])
+            try:
+                self._esperar(base)
+                token = None
+                if o['rut']:
+                    estado, _, contenido = _pedir(base + '/api/login/', 'POST', {'rut': o['rut'], 'password': o['password']})
+                    if estado != 200:
+                        raise CommandError(f'Login falló ({estado}): {contenido[:200]!r}')
+                    token = json.loads(contenido)['token']
+                for escenario in escenarios:
+                    metodo, ruta_sync, ruta_async = ESCENARIOS[escenario]
+                    ruta = ruta_async if servidor == 'asgi' else ruta_sync
+                    cuerpo = {
+                        'login': {'rut': o['rut'], 'password': o['password']},
+                        'disponibilidad': cuerpo_disp,
+                    }.get(escenario)
+                    resultados.append((servidor, escenario) + self._carga(
+                        base + ruta, metodo, cuerpo, token, o['peticiones'], o['concurrencia']
+                    ))
+            finally:
+                proceso.send_signal(signal.SIGTERM)
+                proceso.wait(timeout=30)
+
+        self.stdout.write(f"{'servidor':<8} {'escenario':<16} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errores':>8}")
+        for servidor, escenario, rps, p50, p95, errores in resultados:
+            self.stdout.write(f"{servidor:<8} {escenario:<16} {rps:>9.1f} {p50:>8.1f} {p95:>8.1f} {errores:>8}")
+
+    def _levantar(self, servidor, puerto, workers):
+        cmd = [sys.executable, '-m', 'gunicorn', *SERVIDORES[servidor],
+               '--workers', str(workers), '--bind', f'127.0.0.1:{puerto}', '--log-level', 'warning']
+        self.stdout.write(f"▶ {' '.join(cmd)}")
+        return subprocess.Popen(cmd, env=os.environ.copy(), stdout=subprocess.DEVNULL)
+
+    def _esperar(self, base, segundos=30):
+        limite = time.monotonic() + segundos
+        while time.monotonic() < limite:
+            try:
+                _pedir(base + '/api/especialidades/', 'GET')
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError('El servidor no respondió a tiempo')
+
+    def _carga(self, url, metodo, cuerpo, token, peticiones, concurrencia):
+        # Calentamiento para no medir la importación perezosa de cada worker
+        for _ in range(concurrencia):
+            _pedir(url, metodo, cuerpo, token)
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            respuestas = list(pool.map(lambda _: _pedir(url, metodo, cuerpo, token), range(peticiones)))
+        total = time.perf_counter() - inicio
+        latencias = [lat * 1000 for _, lat, _ in respuestas]
+        errores = sum(1 for estado, _, _ in respuestas if estado >= 400)
+        return peticiones / total, _percentil(latencias, 0.5), _percentil(latencias, 0.95), errores
@@ -0,0 +1,71 @@
+import time as reloj
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand
+
+from api.tiempo import CHILE_TZ, UTC, grilla_slots, limites_dia
+
+
+def _grilla_pytz(fecha, inicio, fin):
+    """Implementación anterior de horarios_disponibles (localize/astimezone por slot)"""
+    import pytz
+    chile_tz = pytz.timezone('America/Santiago')
+    slots = []
+    actual = datetime.combine(fecha, inicio)
+    fin_dt = datetime.combine(fecha, fin)
+    while actual < fin_dt:
+        if actual + timedelta(minutes=30) <= fin_dt:
+            ini = chile_tz.localize(actual).astimezone(pytz.UTC)
+            fin_slot = chile_tz.localize(actual + timedelta(minutes=30)).astimezone(pytz.UTC)
+            slots.append((ini, fin_slot))
+        actual += timedelta(minutes=15)
+    return slots
+
+
+def _grilla_zoneinfo(fecha, inicio, fin):
+    """zoneinfo directo, sin precálculo por día"""
+    slots = []
+    actual = datetime.combine(fecha, inicio, tzinfo=CHILE_TZ)
+    fin_dt = datetime.combine(fecha, fin, tzinfo=CHILE_TZ)
+    while actual + timedelta(minutes=30) <= fin_dt:
+        slots.append((actual.astimezone(UTC), (actual + timedelta(minutes=30)).astimezone(UTC)))
+        actual += timedelta(minutes=15)
+    return slots
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark de la generación de la grilla de slots 08:00-20:00 (pytz vs api.tiempo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=365, help='Días distintos a convertir')
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def handle(self, *args, **options):
+        inicio = date(2026, 1, 1)
+        fechas = [inicio + timedelta(days=i) for i in range(options['dias'])]
+        rep = options['repeticiones']
+
+        def medir(nombre, fn):
+            t0 = reloj.perf_counter()
+            slots = 0
+            for _ in range(rep):
+                for f in fechas:
+                    slots += len(fn(f))
+            seg = reloj.perf_counter() - t0
+            self.stdout.write(f"{nombre:<28} {slots / seg:>14,.0f} slots/s  ({seg * 1000:.1f} ms)")
+            return seg
+
+        casos = []
+        try:
+            import pytz  # noqa: F401
+            casos.append(('pytz localize/astimezone', lambda f: _grilla_pytz(f, time(8), time(20))))
+        except ImportError:
+            self.stdout.write('pytz no instalado: se omite la implementación anterior')
+        casos.append(('zoneinfo astimezone', lambda f: _grilla_zoneinfo(f, time(8), time(20))))
+        casos.append(('api.tiempo.grilla_slots', lambda f: grilla_slots(f, 8 * 60, 20 * 60)))
+
+        limites_dia.cache_clear()
+        tiempos = {nombre: medir(nombre, fn) for nombre, fn in casos}
+        base = max(tiempos.values())
+        for nombre, seg in tiempos.items():
+            self.stdout.write(f"  {nombre:<26} x{base / seg:.1f}")
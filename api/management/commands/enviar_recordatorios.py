@@ -0,0 +1,53 @@
+"""
+Recordatorio por correo de las citas confirmadas de las próximas horas
+(cron cada hora). Los correos se envían en el momento, no por la cola del
+worker: un recordatorio queda marcado como enviado solo si el servidor SMTP
+lo aceptó, y si el SMTP falla el comando termina con error. Con --simular
+solo renderiza y cuenta las consultas:
+
+    python manage.py enviar_recordatorios --anticipacion 24 --simular
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.notificaciones import enviar_recordatorios
+
+
+class _Simulado(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Envía los recordatorios de citas confirmadas que empiezan dentro de --anticipacion horas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anticipacion', type=int, default=24, help='Horas antes de la cita')
+        parser.add_argument('--lote', type=int, default=1000)
+        parser.add_argument('--simular', action='store_true', help='Renderiza sin enviar ni marcar (rollback)')
+
+    def handle(self, *args, **o):
+        anticipacion = timedelta(hours=o['anticipacion'])
+        inicio = time.perf_counter()
+        with CaptureQueriesContext(connection) as consultas:
+            if o['simular']:
+                try:
+                    with transaction.atomic():
+                        total, _ = enviar_recordatorios(anticipacion=anticipacion, lote=o['lote'], enviar=lambda mensajes: [bool(m.message()) for m in mensajes])
+                        raise _Simulado
+                except _Simulado:
+                    pass
+            else:
+                total, sin_enviar = enviar_recordatorios(anticipacion=anticipacion, lote=o['lote'])
+        segundos = time.perf_counter() - inicio
+
+        accion = 'renderizados (simulación)' if o['simular'] else 'enviados'
+        self.stdout.write(self.style.SUCCESS(
+            f'Recordatorios {accion}: {total} en {segundos:.2f}s con {len(consultas)} consultas'
+        ))
+        if not o['simular'] and sin_enviar:
+            # Siguen pendientes: la próxima ejecución los reintenta
+            raise CommandError(f'{sin_enviar} recordatorios sin enviar por fallas del SMTP')
@@ -0,0 +1,36 @@
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exportacion import FORMATOS, filas_exportacion
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida {valor!r}, use YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Exporta citas (con médico, especialidad, box y hora local de Chile) a CSV o NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=list(FORMATOS), default='csv')
+        parser.add_argument('--desde', type=_fecha, default=None, help='Fecha local inicial (inclusive)')
+        parser.add_argument('--hasta', type=_fecha, default=None, help='Fecha local final (inclusive)')
+        parser.add_argument('--medico', type=int, default=None, help='ID del médico')
+        parser.add_argument('--salida', default='-', help='Archivo de salida (por defecto stdout)')
+
+    def handle(self, *args, **options):
+        generador = FORMATOS[options['formato']][0]
+        filas = filas_exportacion(options['desde'], options['hasta'], options['medico'])
+
+        salida = sys.stdout if options['salida'] == '-' else open(options['salida'], 'w', encoding='utf-8', newline='')
+        try:
+            for linea in generador(filas):
+                salida.write(linea)
+        finally:
+            if salida is not sys.stdout:
+                salida.close()
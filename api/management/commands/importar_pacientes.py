@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importacion import ImportadorPacientes, leer_registros
+
+
+class Command(BaseCommand):
+    help = 'Importa pacientes desde un archivo CSV o JSONL (rut,nombre,correo,telefono,direccion,password)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo a importar')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], default=None,
+                            help='Por defecto se deduce de la extensión')
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por lote (default 1000)')
+        parser.add_argument('--procesos', type=int, default=None,
+                            help='Procesos para hashear contraseñas (default: núcleos disponibles)')
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        formato = options['formato'] or ('jsonl' if ruta.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        def progreso(r):
+            self.stdout.write(
+                f"  leídos={r['leidos']} creados={r['creados']} duplicados={r['duplicados']} "
+                f"inválidos={r['invalidos']} ({r['por_segundo']} filas/s)"
+            )
+
+        try:
+            with open(ruta, encoding='utf-8-sig', newline='') as f:
+                with ImportadorPacientes(tamano_lote=options['lote'], procesos=options['procesos']) as imp:
+                    resumen = imp.importar(leer_registros(f, formato), on_progreso=progreso)
+        except FileNotFoundError:
+            raise CommandError(f'No existe el archivo {ruta}')
+
+        for err in resumen['errores']:
+            self.stderr.write(f"  línea {err['linea']}: {err['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Importación terminada: {resumen['creados']} creados, {resumen['duplicados']} duplicados, "
+            f"{resumen['invalidos']} inválidos en {resumen['segundos']}s"
+        ))
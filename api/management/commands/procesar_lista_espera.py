@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.lista_espera import expirar_ofertas
+
+
+class Command(BaseCommand):
+    help = 'Vence las ofertas de lista de espera no confirmadas y ofrece esos slots al siguiente candidato (cron cada minuto)'
+
+    def handle(self, *args, **options):
+        vencidas, reofrecidas = expirar_ofertas()
+        self.stdout.write(self.style.SUCCESS(f'Ofertas vencidas: {vencidas}, reofrecidas: {reofrecidas}'))
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.sincronizacion import purgar_eliminados
+
+
+class Command(BaseCommand):
+    help = 'Borra los tombstones de /api/sync/ más antiguos que SYNC_RETENCION_DIAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=settings.SYNC_RETENCION_DIAS)
+
+    def handle(self, *args, **o):
+        if o['dias'] < 1:
+            raise CommandError('--dias debe ser al menos 1')
+        total = purgar_eliminados(o['dias'])
+        self.stdout.write(self.style.SUCCESS(f'Purgados {total} registros eliminados de más de {o["dias"]} días'))
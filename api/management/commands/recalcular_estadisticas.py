@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.estadisticas import recalcular_rango
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida {valor!r}, use YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los rollups de estadísticas de citas (por defecto los últimos 30 y próximos 90 días)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_fecha, default=None)
+        parser.add_argument('--hasta', type=_fecha, default=None)
+        parser.add_argument('--medico', type=int, default=None)
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        desde = options['desde'] or hoy - timedelta(days=30)
+        hasta = options['hasta'] or hoy + timedelta(days=90)
+        if desde > hasta:
+            raise CommandError('--desde debe ser anterior a --hasta')
+
+        total = recalcular_rango(desde, hasta, options['medico'])
+        self.stdout.write(self.style.SUCCESS(f'Rollups recalculados {desde} → {hasta}: {total} citas'))
@@ -0,0 +1,172 @@
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from . import compresion, idempotencia
+from .routers import hubo_escritura, lecturas_en_replica
+
+METODOS_LECTURA = ('GET', 'HEAD', 'OPTIONS')
+COOKIE_PRIMARIO = 'leer_primario'
+# Alternativa a la cookie para el frontend en otro dominio (vercel), donde el
+# navegador puede bloquear cookies de terceros: la respuesta a una escritura
+# trae el instante (epoch) hasta el que leer del primario y el cliente lo
+# devuelve tal cual en sus requests siguientes.
+HEADER_PRIMARIO = 'X-Leer-Primario'
+
+# POST que solo leen (disponibilidad) y pueden ir a réplica. Las rutas de reserva
+# (crear cita, reservar-slot, confirmar-reserva, validar_horario) no están aquí:
+# siempre validan contra el primario.
+POST_SOLO_LECTURA = {
+    '/api/citas/horarios_disponibles/',
+    '/api/async/citas/horarios-disponibles/',
+}
+
+# GET incrementales (cursor por updated_at): en una réplica atrasada el cliente
+# avanzaría el cursor sin haber visto filas ya confirmadas en el primario
+GET_PRIMARIO = {
+    '/api/citas/agenda/',
+    '/api/sync/',
+}
+
+
+class ReplicaMiddleware:
+    """
+    Permite leer de réplicas en requests de solo lectura y fija el primario
+    durante REPLICA_LAG_SEGUNDOS para el cliente que acaba de escribir, con la
+    cookie COOKIE_PRIMARIO o con el header HEADER_PRIMARIO que el cliente reenvía.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        lectura = request.method in METODOS_LECTURA or (
+            request.method == 'POST' and request.path in POST_SOLO_LECTURA
+        )
+        permitir = (
+            lectura and request.path not in GET_PRIMARIO
+            and not request.COOKIES.get(COOKIE_PRIMARIO) and not self._fijado(request)
+        )
+
+        with lecturas_en_replica(permitir):
+            response = self.get_response(request)
+            escribio = hubo_escritura() or not lectura
+
+        if escribio and settings.DB_REPLICAS:
+            response[HEADER_PRIMARIO] = str(int(time.time()) + settings.REPLICA_LAG_SEGUNDOS)
+            response.set_cookie(
+                COOKIE_PRIMARIO, '1',
+                max_age=settings.REPLICA_LAG_SEGUNDOS,
+                httponly=True,
+                secure=not settings.DEBUG,
+                samesite='None' if not settings.DEBUG else 'Lax',
+            )
+        return response
+
+    @staticmethod
+    def _fijado(request):
+        try:
+            hasta = int(request.headers.get(HEADER_PRIMARIO, 0))
+        except ValueError:
+            return False
+        ahora = time.time()
+        # Acotado a REPLICA_LAG_SEGUNDOS: un valor inventado no fija el primario para siempre
+        return ahora < hasta <= ahora + settings.REPLICA_LAG_SEGUNDOS
+
+
+# POST que aceptan Idempotency-Key
+RUTAS_IDEMPOTENTES = {
+    '/api/citas/',
+    '/api/registrar/',
+    '/api/verificar-o-crear-rut/',
+}
+
+
+class IdempotenciaMiddleware:
+    """
+    Responde las repeticiones de un POST con la misma Idempotency-Key desde la
+    cache, sin ejecutar la vista. Sin header el request sigue igual que antes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        clave = request.headers.get('Idempotency-Key')
+        if request.method != 'POST' or request.path not in RUTAS_IDEMPOTENTES or clave is None:
+            return self.get_response(request)
+        if not idempotencia.clave_valida(clave):
+            return JsonResponse({'detail': 'Idempotency-Key inválida'}, status=400)
+
+        clave_c = idempotencia.clave_cache(clave, request.path, request.headers.get('Authorization'))
+        huella = idempotencia.huella(request.body)
+
+        guardada = idempotencia.obtener(clave_c)
+        if guardada:
+            return self._repetir(guardada, huella)
+
+        if not idempotencia.tomar(clave_c):
+            respuesta = JsonResponse(
+                {'detail': 'Hay una petición en curso con esta Idempotency-Key'}, status=409
+            )
+            respuesta['Retry-After'] = '1'
+            return respuesta
+        try:
+            # Pudo terminar otra petición entre obtener() y tomar()
+            guardada = idempotencia.obtener(clave_c)
+            if guardada:
+                return self._repetir(guardada, huella)
+            response = self.get_response(request)
+            if idempotencia.guardable(response.status_code) and not response.streaming:
+                idempotencia.guardar(
+                    clave_c, huella, response.status_code,
+                    response.get('Content-Type', 'application/json'), response.content,
+                )
+            return response
+        finally:
+            idempotencia.soltar(clave_c)
+
+    def _repetir(self, guardada, huella):
+        huella_guardada, status, content_type, contenido = guardada
+        if huella_guardada != huella:
+            return JsonResponse(
+                {'detail': 'Idempotency-Key ya usada con otro cuerpo de petición'}, status=422
+            )
+        respuesta = HttpResponse(contenido, status=status, content_type=content_type)
+        respuesta['Idempotent-Replayed'] = 'true'
+        return respuesta
+
+
+class CompresionMiddleware:
+    """
+    Comprime con brotli/gzip las respuestas JSON de /api/ sobre
+    COMPRESION_MINIMO bytes (ver api/compresion.py). Los streams (SSE,
+    exportaciones) pasan sin cambios.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not compresion.comprimible(request, response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        codificacion = compresion.elegir_codificacion(request.headers.get('Accept-Encoding'))
+        if codificacion is None:
+            return response
+        comprimido = compresion.comprimir(response.content, codificacion)
+        if len(comprimido) >= len(response.content):
+            return response
+
+        response.content = comprimido
+        response['Content-Length'] = str(len(comprimido))
+        response['Content-Encoding'] = codificacion
+        # El cuerpo ya no es idéntico byte a byte: ETag débil (como GZipMiddleware)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
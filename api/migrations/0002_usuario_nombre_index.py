@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 08:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usuario',
+            name='nombre',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2 on 2026-10-19 08:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from api.normalizacion import normalizar_rut, normalizar_texto, terminos
+
+
+def poblar_indices_busqueda(apps, schema_editor):
+    Usuario = apps.get_model('api', 'Usuario')
+    TerminoBusqueda = apps.get_model('api', 'TerminoBusqueda')
+    lote = []
+    for u in Usuario.objects.only('id', 'rut', 'nombre').iterator(chunk_size=2000):
+        u.rut_normalizado = normalizar_rut(u.rut)
+        u.nombre_busqueda = normalizar_texto(u.nombre)[:255]
+        lote.append(u)
+        if len(lote) >= 2000:
+            _guardar_lote(Usuario, TerminoBusqueda, lote)
+            lote = []
+    if lote:
+        _guardar_lote(Usuario, TerminoBusqueda, lote)
+
+
+def _guardar_lote(Usuario, TerminoBusqueda, lote):
+    Usuario.objects.bulk_update(lote, ['rut_normalizado', 'nombre_busqueda'])
+    TerminoBusqueda.objects.bulk_create(
+        [TerminoBusqueda(usuario_id=u.id, termino=t) for u in lote for t in terminos(u.nombre)]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_usuario_nombre_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='nombre_busqueda',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='rut_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.CreateModel(
+            name='TerminoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=50)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'usuarios_terminos',
+                'indexes': [models.Index(fields=['termino', 'usuario'], name='usuarios_te_termino_bef9c3_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_indices_busqueda, migrations.RunPython.noop),
+    ]
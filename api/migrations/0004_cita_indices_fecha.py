@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-19 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_busqueda_usuarios'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['fechaHora', 'id'], name='api_cita_fechaHo_418831_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['medico', 'fechaHora'], name='api_cita_medico__23ff3a_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-19 08:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_cita_indices_fecha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaCitaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('Confirmada', 'Confirmada'), ('Cancelada', 'Cancelada'), ('Reprogramada', 'Reprogramada')], max_length=20)),
+                ('prioridad', models.CharField(choices=[('Normal', 'Normal'), ('Urgencia', 'Urgencia')], max_length=10)),
+                ('total', models.IntegerField(default=0)),
+                ('box', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.box')),
+                ('especialidad', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.especialidad')),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estadisticas', to='api.medico')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha', 'medico'], name='api_estadis_fecha_9de0d7_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2 on 2026-10-19 08:28
+
+from django.db import migrations, models
+
+from api.tiempo import fecha_y_slot, slot_de_hora
+
+
+def poblar_slots(apps, schema_editor):
+    Horario = apps.get_model('api', 'Horario')
+    Cita = apps.get_model('api', 'Cita')
+
+    horarios = list(Horario.objects.all())
+    for h in horarios:
+        h.slot_inicio = slot_de_hora(h.horaInicio)
+        h.slot_fin = slot_de_hora(h.horaFin)
+    Horario.objects.bulk_update(horarios, ['slot_inicio', 'slot_fin'], batch_size=1000)
+
+    lote = []
+    for c in Cita.objects.only('id', 'fechaHora').iterator(chunk_size=2000):
+        c.fecha_local, c.slot = fecha_y_slot(c.fechaHora)
+        lote.append(c)
+        if len(lote) >= 2000:
+            Cita.objects.bulk_update(lote, ['fecha_local', 'slot'])
+            lote = []
+    if lote:
+        Cita.objects.bulk_update(lote, ['fecha_local', 'slot'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_estadistica_cita_diaria'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita',
+            name='fecha_local',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='cita',
+            name='slot',
+            field=models.SmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='horario',
+            name='slot_fin',
+            field=models.SmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='horario',
+            name='slot_inicio',
+            field=models.SmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['medico', 'fecha_local', 'slot'], name='api_cita_medico__ce89d2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='horario',
+            index=models.Index(fields=['medico_especialidad', 'dia', 'slot_inicio', 'slot_fin'], name='api_horario_medico__7c7ae8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='horario',
+            index=models.Index(fields=['box', 'dia', 'slot_inicio', 'slot_fin'], name='api_horario_box_id_2d1ca1_idx'),
+        ),
+        migrations.RunPython(poblar_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-19 08:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_slots_enteros'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExcepcionHorario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_inicio', models.DateField()),
+                ('fecha_fin', models.DateField()),
+                ('motivo', models.CharField(blank=True, default='', max_length=200)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('box', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='excepciones', to='api.box')),
+                ('medico', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='excepciones', to='api.medico')),
+            ],
+            options={
+                'ordering': ['fecha_inicio'],
+                'indexes': [models.Index(fields=['fecha_fin', 'fecha_inicio'], name='api_excepci_fecha_f_a5b1e3_idx'), models.Index(fields=['medico', 'fecha_fin'], name='api_excepci_medico__1e2476_idx'), models.Index(fields=['box', 'fecha_fin'], name='api_excepci_box_id_13fff3_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-19 08:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_excepcion_horario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListaEspera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_desde', models.DateField()),
+                ('fecha_hasta', models.DateField()),
+                ('estado', models.CharField(choices=[('Activa', 'Activa'), ('Ofrecida', 'Ofrecida'), ('Asignada', 'Asignada'), ('Cancelada', 'Cancelada')], default='Activa', max_length=10)),
+                ('oferta_token', models.CharField(blank=True, default='', max_length=32)),
+                ('oferta_fechaHora', models.DateTimeField(blank=True, null=True)),
+                ('oferta_expira', models.DateTimeField(blank=True, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('especialidad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lista_espera', to='api.especialidad')),
+                ('medico', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lista_espera', to='api.medico')),
+                ('oferta_medico_especialidad', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.medicoespecialidad')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lista_espera', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['fecha_creacion'],
+                'indexes': [models.Index(fields=['especialidad', 'estado', 'fecha_desde', 'fecha_creacion'], name='api_listaes_especia_701640_idx'), models.Index(fields=['estado', 'oferta_expira'], name='api_listaes_estado_aaf9ff_idx'), models.Index(fields=['oferta_token'], name='api_listaes_oferta__acb0aa_idx'), models.Index(fields=['usuario', 'estado'], name='api_listaes_usuario_0f2062_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 08:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_lista_espera'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CitaHistorica',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fechaHora', models.DateTimeField()),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('Confirmada', 'Confirmada'), ('Cancelada', 'Cancelada'), ('Reprogramada', 'Reprogramada')], max_length=20)),
+                ('prioridad', models.CharField(choices=[('Normal', 'Normal'), ('Urgencia', 'Urgencia')], max_length=10)),
+                ('descripcion', models.TextField(blank=True, null=True)),
+                ('fecha_local', models.DateField(blank=True, null=True)),
+                ('slot', models.SmallIntegerField(blank=True, null=True)),
+                ('archivada_en', models.DateTimeField(auto_now_add=True)),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='citas_historicas', to='api.medico')),
+                ('medico_especialidad', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='citas_historicas', to='api.medicoespecialidad')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='citas_historicas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['fechaHora'],
+                'indexes': [models.Index(fields=['usuario', 'fechaHora'], name='api_citahis_usuario_32f8ee_idx'), models.Index(fields=['medico', 'fechaHora'], name='api_citahis_medico__a62d5a_idx'), models.Index(fields=['fecha_local'], name='api_citahis_fecha_l_5c6a40_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_cita_historica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-19 09:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_sincronizacion_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='cita_historica',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notificaciones', to='api.citahistorica'),
+        ),
+        migrations.AddField(
+            model_name='recordatorio',
+            name='cita_historica',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recordatorios', to='api.citahistorica'),
+        ),
+        migrations.AlterField(
+            model_name='notificacion',
+            name='cita',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.cita'),
+        ),
+        migrations.AlterField(
+            model_name='recordatorio',
+            name='cita',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recordatorio', to='api.cita'),
+        ),
+    ]
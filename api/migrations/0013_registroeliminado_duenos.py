@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_notificacion_cita_historica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroeliminado',
+            name='medico_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='registroeliminado',
+            name='usuario_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-19 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_registroeliminado_duenos'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='listaespera',
+            name='api_listaes_especia_701640_idx',
+        ),
+        migrations.AddIndex(
+            model_name='listaespera',
+            index=models.Index(fields=['especialidad', 'estado', 'fecha_creacion', 'id'], name='api_listaes_especia_0b8f26_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-19 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_listaespera_indice_candidato'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='registroeliminado',
+            index=models.Index(fields=['modelo', 'eliminado_en', 'id'], name='api_registr_modelo_4d73de_idx'),
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.core.exceptions import ValidationError
 from django.db import models
 from datetime import timedelta
 from django.contrib.auth.hashers import make_password, check_password
+from .normalizacion import normalizar_rut, normalizar_texto, terminos
+from .tiempo import DIAS as DIAS_SEMANA, fecha_y_slot, slot_de_hora
 
 class Usuario(models.Model):
     ROLES = [
@@ -10,13 +12,17 @@ class Usuario(models.Model):
         ('Paciente', 'Paciente'),
     ]
     
-    nombre = models.CharField(max_length=255)
+    nombre = models.CharField(max_length=255, db_index=True)  # búsqueda por prefijo de nombre
     correo = models.EmailField(unique=True)
     password = models.CharField(max_length=255)
     rut = models.CharField(max_length=12, unique=True)
     telefono = models.CharField(max_length=15, blank=True, null=True)
     rol = models.CharField(max_length=20, choices=ROLES)
-    fecha_registro = models.DateTimeField(auto_now_add=True)
+    fecha_registro = models.DateTimeField(auto_now_add=True)  # hace de created_at
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Columnas de búsqueda (se recalculan en save)
+    rut_normalizado = models.CharField(max_length=12, db_index=True, default='', editable=False)
+    nombre_busqueda = models.CharField(max_length=255, db_index=True, default='', editable=False)
 
     # Campos requeridos para JWT
     USERNAME_FIELD = 'correo'
@@ -48,12 +54,41 @@ class Usuario(models.Model):
         """Verifica la contraseña"""
         return check_password(raw_password, self.password)
 
+    def save(self, *args, **kwargs):
+        self.rut_normalizado = normalizar_rut(self.rut)
+        self.nombre_busqueda = normalizar_texto(self.nombre)[:255]
+        update_fields = kwargs.get('update_fields')
+        super().save(*args, **kwargs)
+        if update_fields is None or 'nombre' in update_fields:
+            self.sincronizar_terminos()
+
+    def sincronizar_terminos(self):
+        """Mantiene la tabla de prefijos (una fila por palabra del nombre)"""
+        nuevos = terminos(self.nombre)
+        actuales = set(self.terminos.values_list('termino', flat=True))
+        if nuevos == actuales:
+            return
+        if actuales - nuevos:
+            self.terminos.filter(termino__in=actuales - nuevos).delete()
+        TerminoBusqueda.objects.bulk_create(
+            [TerminoBusqueda(usuario=self, termino=t) for t in nuevos - actuales]
+        )
+
     def __str__(self):
         return f"{self.nombre} ({self.rol})"
 
     class Meta:
         db_table = 'usuarios'
 
+class TerminoBusqueda(models.Model):
+    """Índice de prefijos por palabra del nombre (permite buscar por apellido)"""
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='terminos')
+    termino = models.CharField(max_length=50)
+
+    class Meta:
+        db_table = 'usuarios_terminos'
+        indexes = [models.Index(fields=['termino', 'usuario'])]
+
 class Paciente(models.Model):
     usuario = models.OneToOneField(Usuario, on_delete=models.CASCADE, primary_key=True)
     direccion = models.CharField(max_length=200, blank=True, null=True)
@@ -75,6 +110,8 @@ class Especialidad(models.Model):
 class Medico(models.Model):
     usuario = models.OneToOneField(Usuario, on_delete=models.CASCADE, primary_key=True)
     especialidad_texto = models.CharField(max_length=100, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     def __str__(self):
         return f"Dr(a). {self.usuario.nombre}"
 
@@ -115,9 +152,39 @@ class Horario(models.Model):
     dia = models.CharField(max_length=10, choices=DIAS)
     horaInicio = models.TimeField()
     horaFin = models.TimeField()
+    # Intervalo en minutos desde las 08:00 (se recalcula en save)
+    slot_inicio = models.SmallIntegerField(default=0, editable=False)
+    slot_fin = models.SmallIntegerField(default=0, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['medico_especialidad', 'dia', 'horaInicio']
+        indexes = [
+            models.Index(fields=['medico_especialidad', 'dia', 'slot_inicio', 'slot_fin']),
+            models.Index(fields=['box', 'dia', 'slot_inicio', 'slot_fin']),
+        ]
+
+    def calcular_slots(self):
+        self.slot_inicio = slot_de_hora(self.horaInicio)
+        self.slot_fin = slot_de_hora(self.horaFin)
+
+    @classmethod
+    def existe_superposicion(cls, medico_id, dia, box_id, slot_inicio, slot_fin, excluir_pk=None):
+        """
+        Un único EXISTS con predicados de rango sobre el índice (box, dia, slot_inicio, slot_fin).
+        Usado por clean() y por HorarioSerializer.validate.
+        """
+        qs = cls.objects.filter(
+            box_id=box_id,
+            dia=dia,
+            medico_especialidad__medico_id=medico_id,
+            slot_inicio__lt=slot_fin,
+            slot_fin__gt=slot_inicio,
+        )
+        if excluir_pk:
+            qs = qs.exclude(pk=excluir_pk)
+        return qs.exists()
 
     def clean(self):
         if self.horaInicio >= self.horaFin:
@@ -134,22 +201,21 @@ class Horario(models.Model):
         if self.box and self.medico_especialidad and self.box.medico_id != self.medico_especialidad.medico_id:
             raise ValidationError("El box seleccionado no pertenece al mismo médico del horario")
 
-        # Solapes en el MISMO BOX para el mismo médico y día
+        # Solapes en el MISMO BOX para el mismo médico y día (comparación de enteros)
         if self.box_id:
-            qs = Horario.objects.filter(
-                medico_especialidad__medico_id=self.medico_especialidad.medico_id,
-                dia=self.dia,
-                box_id=self.box_id
-            )
-            if self.pk:
-                qs = qs.exclude(pk=self.pk)
-            for h in qs:
-                if (self.horaInicio < h.horaFin) and (h.horaInicio < self.horaFin):
-                    raise ValidationError("Existe un horario superpuesto en el mismo box para este médico")
+            self.calcular_slots()
+            if Horario.existe_superposicion(
+                self.medico_especialidad.medico_id, self.dia, self.box_id,
+                self.slot_inicio, self.slot_fin, excluir_pk=self.pk
+            ):
+                raise ValidationError("Existe un horario superpuesto en el mismo box para este médico")
 
     def save(self, *args, **kwargs):
-        # Asegura que clean() se ejecute al guardar
-        self.full_clean()
+        # Asegura que clean() se ejecute al guardar, salvo que ya se validó (p.ej. HorarioSerializer)
+        skip_validation = kwargs.pop('skip_validation', False)
+        if not skip_validation:
+            self.full_clean()
+        self.calcular_slots()
         return super().save(*args, **kwargs)
 
     def __str__(self):
@@ -176,9 +242,24 @@ class Cita(models.Model):
     estado = models.CharField(max_length=20, choices=ESTADOS, default='Pendiente')
     prioridad = models.CharField(max_length=10, choices=PRIORIDAD, default='Normal')
     descripcion = models.TextField(blank=True, null=True)
+    # Fecha local y minutos desde las 08:00 de fechaHora (se recalculan en save)
+    fecha_local = models.DateField(null=True, blank=True, editable=False)
+    slot = models.SmallIntegerField(null=True, blank=True, editable=False)
+    # Refresco incremental (agenda ?updated_since=, /api/sync/). Los .update() masivos deben fijarlo a mano
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['fechaHora']
+        indexes = [
+            models.Index(fields=['fechaHora', 'id']),
+            models.Index(fields=['medico', 'fechaHora']),
+            models.Index(fields=['medico', 'fecha_local', 'slot']),
+        ]
+
+    def calcular_slot(self):
+        if self.fechaHora:
+            self.fecha_local, self.slot = fecha_y_slot(self.fechaHora)
 
     def clean(self):
         """
@@ -211,39 +292,35 @@ class Cita(models.Model):
         if conflictos.exists():
             raise ValidationError("Ya existe una cita en este horario para el médico")
 
-        # Validación de conflicto en mismo box
+        # Validación de conflicto en mismo box (slots enteros en hora local)
         try:
             if self.medico_especialidad_id:
-                dias = ['Lunes','Martes','Miercoles','Jueves','Viernes','Sabado','Domingo']
-                dia_nombre = dias[self.fechaHora.weekday()]
-                t = self.fechaHora.time()
+                self.calcular_slot()
                 h = Horario.objects.filter(
                     medico_especialidad=self.medico_especialidad,
-                    dia=dia_nombre,
-                    horaInicio__lte=t,
-                    horaFin__gt=t
-                ).select_related('box').first()
+                    dia=DIAS_SEMANA[self.fecha_local.weekday()],
+                    slot_inicio__lte=self.slot,
+                    slot_fin__gt=self.slot
+                ).first()
                 
                 if h and h.box_id:
                     otras = Cita.objects.filter(
                         medico=self.medico,
-                        fechaHora=self.fechaHora,
+                        fecha_local=self.fecha_local,
+                        slot=self.slot,
                         estado__in=['Pendiente', 'Confirmada']
                     )
                     if self.pk:
                         otras = otras.exclude(pk=self.pk)
                     
-                    for c in otras:
-                        dias2 = ['Lunes','Martes','Miercoles','Jueves','Viernes','Sabado','Domingo']
-                        dia2 = dias2[c.fechaHora.weekday()]
-                        t2 = c.fechaHora.time()
-                        h2 = Horario.objects.filter(
-                            medico_especialidad=c.medico_especialidad,
-                            dia=dia2,
-                            horaInicio__lte=t2,
-                            horaFin__gt=t2
-                        ).first()
-                        if h2 and h2.box_id == h.box_id:
+                    for me_id, slot in otras.values_list('medico_especialidad_id', 'slot'):
+                        if Horario.objects.filter(
+                            medico_especialidad_id=me_id,
+                            dia=h.dia,
+                            box_id=h.box_id,
+                            slot_inicio__lte=slot,
+                            slot_fin__gt=slot
+                        ).exists():
                             raise ValidationError("Ya existe una cita en este horario en el mismo box")
         except ValidationError:
             raise
@@ -257,8 +334,119 @@ class Cita(models.Model):
         if not skip_validation:
             self.full_clean()
         
+        self.calcular_slot()
         super().save(*args, **kwargs)
 
+class CitaHistorica(models.Model):
+    """
+    Citas antiguas ya terminadas (confirmadas o canceladas) movidas fuera de la
+    tabla caliente por `manage.py archivar_citas`. Conserva el id original.
+    Solo se consulta cuando se pide el historial explícitamente.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='citas_historicas')
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='citas_historicas')
+    medico_especialidad = models.ForeignKey(MedicoEspecialidad, on_delete=models.SET_NULL, related_name='citas_historicas', null=True, blank=True)
+    fechaHora = models.DateTimeField()
+    estado = models.CharField(max_length=20, choices=Cita.ESTADOS)
+    prioridad = models.CharField(max_length=10, choices=Cita.PRIORIDAD)
+    descripcion = models.TextField(blank=True, null=True)
+    fecha_local = models.DateField(null=True, blank=True)
+    slot = models.SmallIntegerField(null=True, blank=True)
+    archivada_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['fechaHora']
+        indexes = [
+            models.Index(fields=['usuario', 'fechaHora']),
+            models.Index(fields=['medico', 'fechaHora']),
+            models.Index(fields=['fecha_local']),
+        ]
+
+    def __str__(self):
+        return f"Cita histórica {self.id} {self.fechaHora} ({self.estado})"
+
+class ExcepcionHorario(models.Model):
+    """
+    Cierre por rango de fechas (inclusive) que se descuenta del patrón semanal:
+      - medico definido: el médico no atiende
+      - box definido: ese box no se usa (los horarios de otros boxes siguen)
+      - ambos vacíos: feriado de toda la clínica
+    """
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='excepciones', null=True, blank=True)
+    box = models.ForeignKey(Box, on_delete=models.CASCADE, related_name='excepciones', null=True, blank=True)
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    motivo = models.CharField(max_length=200, blank=True, default='')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['fecha_inicio']
+        indexes = [
+            models.Index(fields=['fecha_fin', 'fecha_inicio']),
+            models.Index(fields=['medico', 'fecha_fin']),
+            models.Index(fields=['box', 'fecha_fin']),
+        ]
+
+    def clean(self):
+        if self.fecha_inicio and self.fecha_fin and self.fecha_inicio > self.fecha_fin:
+            raise ValidationError("fecha_inicio debe ser anterior o igual a fecha_fin")
+
+    @property
+    def alcance(self):
+        if self.box_id:
+            return 'box'
+        if self.medico_id:
+            return 'medico'
+        return 'clinica'
+
+    def __str__(self):
+        return f"{self.alcance} {self.fecha_inicio}→{self.fecha_fin} {self.motivo}"
+
+class ListaEspera(models.Model):
+    """
+    Paciente esperando una hora con una especialidad (y opcionalmente un médico)
+    dentro de un rango de fechas. Cuando se libera un slot compatible el motor
+    (api/lista_espera.py) retiene el slot y se lo ofrece a la entrada activa más antigua.
+    """
+    ESTADOS = (
+        ('Activa', 'Activa'),
+        ('Ofrecida', 'Ofrecida'),
+        ('Asignada', 'Asignada'),
+        ('Cancelada', 'Cancelada'),
+    )
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='lista_espera')
+    especialidad = models.ForeignKey(Especialidad, on_delete=models.CASCADE, related_name='lista_espera')
+    # null = cualquier médico de la especialidad
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='lista_espera', null=True, blank=True)
+    fecha_desde = models.DateField()
+    fecha_hasta = models.DateField()
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='Activa')
+    # Oferta vigente: token de la reserva temporal (api/reservas.py) y su vencimiento
+    oferta_token = models.CharField(max_length=32, blank=True, default='')
+    oferta_fechaHora = models.DateTimeField(null=True, blank=True)
+    oferta_medico_especialidad = models.ForeignKey(MedicoEspecialidad, on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    oferta_expira = models.DateTimeField(null=True, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['fecha_creacion']
+        indexes = [
+            # Búsqueda del candidato: igualdad en especialidad/estado y recorrido en el orden
+            # del ORDER BY (fecha_creacion, id); el rango de fechas se filtra al recorrer
+            models.Index(fields=['especialidad', 'estado', 'fecha_creacion', 'id']),
+            models.Index(fields=['estado', 'oferta_expira']),
+            models.Index(fields=['oferta_token']),
+            models.Index(fields=['usuario', 'estado']),
+        ]
+
+    def clean(self):
+        if self.fecha_desde and self.fecha_hasta and self.fecha_desde > self.fecha_hasta:
+            raise ValidationError("fecha_desde debe ser anterior o igual a fecha_hasta")
+
+    def __str__(self):
+        return f"{self.usuario_id} espera {self.especialidad_id} {self.fecha_desde}→{self.fecha_hasta} ({self.estado})"
+
 class Notificacion(models.Model):
     TIPOS = (
         ('Email', 'Email'),
@@ -270,7 +458,9 @@ class Notificacion(models.Model):
         ('Fallida', 'Fallida'),
         ('Completada', 'Completada'),
     )
-    cita = models.ForeignKey(Cita, on_delete=models.CASCADE)
+    # Al archivar la cita (api/archivo.py) la notificación pasa a cita_historica y cita queda NULL
+    cita = models.ForeignKey(Cita, on_delete=models.CASCADE, null=True, blank=True)
+    cita_historica = models.ForeignKey(CitaHistorica, on_delete=models.SET_NULL, null=True, blank=True, related_name='notificaciones')
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
     tipo = models.CharField(max_length=10, choices=TIPOS)
     mensaje = models.CharField(max_length=255, blank=True, null=True)
@@ -278,13 +468,64 @@ class Notificacion(models.Model):
     estado = models.CharField(max_length=10, choices=ESTADOS, default='Pendiente')
 
 class Recordatorio(models.Model):
-    cita = models.OneToOneField(Cita, on_delete=models.CASCADE, related_name='recordatorio')
+    # Igual que Notificacion: al archivar la cita se conserva apuntando a cita_historica
+    cita = models.OneToOneField(Cita, on_delete=models.CASCADE, related_name='recordatorio', null=True, blank=True)
+    cita_historica = models.ForeignKey(CitaHistorica, on_delete=models.SET_NULL, null=True, blank=True, related_name='recordatorios')
     fecha_programada = models.DateTimeField()   # cuándo debe enviarse
     enviado = models.BooleanField(default=False)
     fecha_envio = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['fecha_programada']
 
     def __str__(self):
-        return f"Recordatorio cita {self.cita.id} -> {self.fecha_programada} (enviado={self.enviado})"
+        return f"Recordatorio cita {self.cita_id or self.cita_historica_id} -> {self.fecha_programada} (enviado={self.enviado})"
+
+class EstadisticaCitaDiaria(models.Model):
+    """
+    Rollup de citas por día local (America/Santiago) y dimensiones del dashboard.
+    Se mantiene incrementalmente desde las señales de Cita (api/signals.py) y se
+    puede reconstruir con `manage.py recalcular_estadisticas`. Las lecturas
+    siempre usan Sum(total), por lo que filas repetidas para la misma clave son válidas.
+    """
+    fecha = models.DateField()
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='estadisticas')
+    especialidad = models.ForeignKey(Especialidad, on_delete=models.SET_NULL, null=True, blank=True)
+    box = models.ForeignKey(Box, on_delete=models.SET_NULL, null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=Cita.ESTADOS)
+    prioridad = models.CharField(max_length=10, choices=Cita.PRIORIDAD)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha', 'medico']),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.medico_id} {self.estado}/{self.prioridad}: {self.total}"
+
+
+class RegistroEliminado(models.Model):
+    """
+    Tombstone de la sincronización incremental (/api/sync/): id de cada fila
+    borrada de un modelo sincronizable, para que los clientes offline la quiten.
+    """
+    modelo = models.CharField(max_length=30)
+    objeto_id = models.BigIntegerField()
+    # Dueños de la fila borrada para filtrar quién recibe el tombstone (sin FK: ya
+    # pueden no existir). Ambos NULL = visible para todos (médicos, horarios).
+    usuario_id = models.BigIntegerField(null=True, blank=True)
+    medico_id = models.BigIntegerField(null=True, blank=True)
+    eliminado_en = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['eliminado_en', 'id']
+        indexes = [
+            # /api/sync/ recorre los tombstones de cada modelo en orden (eliminado_en, id)
+            models.Index(fields=['modelo', 'eliminado_en', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.modelo} {self.objeto_id} eliminado {self.eliminado_en}"
@@ -0,0 +1,42 @@
+import re
+import unicodedata
+
+_RUT_BASURA = re.compile(r'[^0-9kK]')
+_NO_ALFANUM = re.compile(r'[^a-z0-9@._ ]+')
+
+
+def normalizar_rut(rut):
+    """'12.345.678-k' -> '12345678K' (sin puntos, guion ni espacios)"""
+    if not rut:
+        return ''
+    return _RUT_BASURA.sub('', str(rut)).upper()
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sin tildes y con espacios colapsados: 'José  PÉREZ' -> 'jose perez'"""
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(ch for ch in texto if not unicodedata.combining(ch)).lower()
+    texto = _NO_ALFANUM.sub(' ', texto)
+    return ' '.join(texto.split())
+
+
+def terminos(texto, minimo=2, maximo=50):
+    """Palabras normalizadas de un nombre, para la tabla de prefijos de búsqueda"""
+    return {p[:maximo] for p in normalizar_texto(texto).split(' ') if len(p) >= minimo}
+
+
+def validar_rut(rut):
+    """Valida el dígito verificador (módulo 11) de un RUT chileno"""
+    rut = normalizar_rut(rut)
+    if len(rut) < 2 or not rut[:-1].isdigit():
+        return False
+    cuerpo, dv = rut[:-1], rut[-1]
+    suma, factor = 0, 2
+    for d in reversed(cuerpo):
+        suma += int(d) * factor
+        factor = 2 if factor == 7 else factor + 1
+    esperado = 11 - (suma % 11)
+    esperado = {11: '0', 10: 'K'}.get(esperado, str(esperado))
+    return dv == esperado
@@ -0,0 +1,177 @@
+"""
+Plantillas de los correos al paciente, una por evento de la cita.
+
+Antes cada vista armaba su f-string y tocaba cita.usuario y
+cita.medico.usuario, con una consulta perezosa por relación. Ahora:
+
+- Las plantillas se compilan una vez al importar el módulo: se extraen sus
+  campos y se valida que todos existan en el contexto de una cita, así un
+  error de tipeo falla al arrancar y no al enviar.
+- El contexto sale de una cita cargada con select_related(*RELACIONADOS),
+  de modo que un lote de N recordatorios cuesta una consulta por página y
+  no 2N consultas perezosas.
+"""
+from datetime import timedelta
+from string import Formatter
+
+from django.core.mail import EmailMessage
+from django.utils import timezone
+
+from . import correo
+from .models import Cita, Recordatorio
+from .tiempo import formato_chile
+
+# Relaciones que usa contexto_cita; cargarlas siempre con select_related
+RELACIONADOS = ('usuario', 'medico__usuario', 'medico_especialidad__especialidad')
+
+CAMPOS_CITA = {'paciente', 'medico', 'especialidad', 'fecha_hora', 'cita_id'}
+
+DESPEDIDA = "Gracias por preferirnos."
+
+
+class Plantilla:
+    __slots__ = ('evento', 'asunto', 'cuerpo', 'campos')
+
+    def __init__(self, evento, asunto, cuerpo, campos_validos=CAMPOS_CITA):
+        self.evento = evento
+        self.asunto = asunto
+        self.cuerpo = cuerpo
+        self.campos = {
+            campo for texto in (asunto, cuerpo)
+            for _, campo, _, _ in Formatter().parse(texto) if campo
+        }
+        desconocidos = self.campos - set(campos_validos)
+        if desconocidos:
+            raise ValueError(f"Plantilla '{evento}' usa campos desconocidos: {sorted(desconocidos)}")
+
+    def renderizar(self, contexto):
+        return self.asunto.format_map(contexto), self.cuerpo.format_map(contexto)
+
+
+PLANTILLAS = {p.evento: p for p in [
+    Plantilla(
+        'agendada',
+        "Hora Agendada - Pendiente de Aceptación",
+        "Estimado/a {paciente},\n\n"
+        "Su cita ha sido agendada para el {fecha_hora} con el Dr(a). {medico}.\n\n"
+        "Su cita está pendiente de confirmación por parte de nuestro personal. "
+        "Recibirá otro correo una vez que sea aceptada.\n\n"
+        f"{DESPEDIDA}",
+    ),
+    Plantilla(
+        'confirmada',
+        "¡Tu Cita ha sido Confirmada!",
+        "Estimado/a {paciente},\n\n"
+        "Nos complace informarle que su cita para el {fecha_hora} "
+        "con el Dr(a). {medico} ha sido confirmada.\n\n"
+        "Adjuntamos un código QR que puede presentar en recepción. ¡Le esperamos!\n\n"
+        "Gracias por su confianza.",
+    ),
+    Plantilla(
+        'reprogramada',
+        "Su cita ha sido reprogramada",
+        "Estimado/a {paciente},\n\n"
+        "Su cita con el Dr(a). {medico} ({especialidad}) fue reprogramada para el {fecha_hora}.\n\n"
+        "Si el nuevo horario no le acomoda, puede cambiarlo desde la aplicación.\n\n"
+        f"{DESPEDIDA}",
+    ),
+    Plantilla(
+        'recordatorio',
+        "Recordatorio de su cita",
+        "Estimado/a {paciente},\n\n"
+        "Le recordamos su cita del {fecha_hora} con el Dr(a). {medico} ({especialidad}).\n\n"
+        "Si no puede asistir, por favor cancele la hora desde la aplicación para "
+        "que otro paciente pueda usarla.\n\n"
+        f"{DESPEDIDA}",
+    ),
+    Plantilla(
+        'cancelada',
+        "Su cita ha sido cancelada",
+        "Estimado/a {paciente},\n\n"
+        "Su cita del {fecha_hora} con el Dr(a). {medico} ha sido cancelada.\n\n"
+        "Puede agendar una nueva hora desde la aplicación.\n\n"
+        f"{DESPEDIDA}",
+    ),
+    Plantilla(
+        'oferta_lista_espera',
+        "Hora disponible - Lista de espera",
+        "Estimado/a {paciente},\n\n"
+        "Se liberó una hora el {fecha_hora} que coincide con su lista de espera.\n\n"
+        "La hora queda reservada para usted durante {minutos} minutos; "
+        "ingrese a la aplicación para confirmarla.\n\n"
+        f"{DESPEDIDA}",
+        campos_validos={'paciente', 'fecha_hora', 'minutos'},
+    ),
+]}
+
+
+def contexto_cita(cita):
+    """Contexto de plantilla; la cita debe venir con select_related(*RELACIONADOS)"""
+    me = cita.medico_especialidad
+    return {
+        'cita_id': cita.pk,
+        'paciente': cita.usuario.nombre,
+        'medico': cita.medico.usuario.nombre,
+        'especialidad': me.especialidad.nombre if me else '',
+        'fecha_hora': formato_chile(cita.fechaHora),
+    }
+
+
+def renderizar(evento, contexto):
+    """(asunto, cuerpo) del evento"""
+    return PLANTILLAS[evento].renderizar(contexto)
+
+
+def mensaje(evento, destinatario, contexto):
+    asunto, cuerpo = renderizar(evento, contexto)
+    return EmailMessage(asunto, cuerpo, None, [destinatario])
+
+
+def mensaje_cita(evento, cita):
+    return mensaje(evento, cita.usuario.correo, contexto_cita(cita))
+
+
+def recordatorios_pendientes(ahora, anticipacion):
+    """Citas confirmadas que empiezan dentro de `anticipacion` y aún no tienen recordatorio enviado"""
+    return (
+        Cita.objects.filter(estado='Confirmada', fechaHora__gt=ahora, fechaHora__lte=ahora + anticipacion)
+        .exclude(recordatorio__enviado=True)
+        .select_related(*RELACIONADOS)
+        .order_by('id')
+    )
+
+
+def enviar_recordatorios(ahora=None, anticipacion=timedelta(hours=24), lote=1000, enviar=None):
+    """
+    Envía los recordatorios por páginas de `lote` citas: una consulta para las
+    citas con sus relaciones y tres para marcar los Recordatorio. `enviar`
+    recibe los mensajes de la página y devuelve, alineado, True/False/None
+    como correo.enviar_ahora; solo las citas cuyo correo aceptó el servidor
+    quedan con el recordatorio enviado, el resto se reintenta en la próxima
+    pasada. Devuelve (enviados, sin_enviar), donde sin_enviar cuenta los que
+    no salieron por una falla del SMTP (no los rechazos permanentes).
+    """
+    ahora = ahora or timezone.now()
+    enviar = enviar or correo.enviar_ahora
+    qs = recordatorios_pendientes(ahora, anticipacion)
+    enviados = 0
+    sin_enviar = 0
+    ultimo_id = 0
+    while True:
+        citas = list(qs.filter(id__gt=ultimo_id)[:lote])
+        if not citas:
+            return enviados, sin_enviar
+        resultado = enviar([mensaje_cita('recordatorio', cita) for cita in citas])
+        aceptadas = [c for c, ok in zip(citas, resultado) if ok]
+        ids = [c.pk for c in aceptadas]
+        existentes = set(
+            Recordatorio.objects.filter(cita_id__in=ids).values_list('cita_id', flat=True)
+        )
+        Recordatorio.objects.filter(cita_id__in=existentes).update(enviado=True, fecha_envio=ahora, updated_at=ahora)
+        Recordatorio.objects.bulk_create([
+            Recordatorio(cita=c, fecha_programada=c.fechaHora - anticipacion, enviado=True, fecha_envio=ahora)
+            for c in aceptadas if c.pk not in existentes
+        ], ignore_conflicts=True)
+        enviados += len(aceptadas)
+        sin_enviar += sum(1 for ok in resultado if ok is None)
+        ultimo_id = citas[-1].pk
@@ -0,0 +1,19 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PaginacionCursorOpcional(CursorPagination):
+    """
+    Paginación por cursor (costo constante, sin COUNT(*)) que solo se activa
+    cuando el cliente envía ?cursor= o ?page_size=. Sin esos parámetros se
+    mantiene la respuesta original (lista completa) para no romper el frontend.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = 'pk'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,138 @@
+"""
+"Primeras K horas libres de una especialidad a partir de T" sin recorrer
+horarios_disponibles médico por médico y día por día.
+
+Cada médico es un generador que entrega sus slots libres en orden
+cronológico (patrón semanal de Horario, menos excepciones, citas y holds); un
+heap mezcla los generadores y se detiene apenas junta K resultados. La
+ocupación se carga por ventanas de días para todos los médicos a la vez, así
+el número de consultas depende de cuántos días hubo que mirar, y el horizonte
+máximo acota la latencia cuando no hay nada libre.
+"""
+import heapq
+from datetime import datetime, timedelta
+
+from . import disponibilidad, reservas
+from .excepciones import CalendarioExcepciones
+from .models import Cita, Horario, MedicoEspecialidad
+from .tiempo import DIAS, DURACION_CITA, JORNADA_INICIO, UTC, fecha_y_slot, grilla_slots, hhmm
+
+VENTANA_DIAS = 14
+
+
+class Ocupacion:
+    """Slots ocupados por (médico, fecha local), cargados por ventanas de VENTANA_DIAS"""
+
+    def __init__(self, medico_ids, desde):
+        self.medico_ids = list(medico_ids)
+        self.cargado_hasta = desde - timedelta(days=1)
+        self._ocupados = {}
+        self.consultas = 0
+
+    def _cargar(self, hasta):
+        desde = self.cargado_hasta + timedelta(days=1)
+        filas = Cita.objects.filter(
+            medico_id__in=self.medico_ids,
+            fecha_local__gte=desde,
+            fecha_local__lte=hasta,
+            estado__in=disponibilidad.ESTADOS_OCUPADOS,
+        ).values_list('medico_id', 'fecha_local', 'slot')
+        for medico_id, fecha, slot in filas:
+            self._ocupados.setdefault((medico_id, fecha), []).append(slot)
+        self.cargado_hasta = hasta
+        self.consultas += 1
+
+    def slots(self, medico_id, fecha):
+        if fecha > self.cargado_hasta:
+            self._cargar(fecha + timedelta(days=VENTANA_DIAS - 1))
+        return self._ocupados.get((medico_id, fecha), ())
+
+
+def _libres_medico(me, horarios, ocupacion, desde_ts, dias, excepto_usuario_id):
+    """Generador de (ts_utc, fecha, minuto, box_nombre) libres para un médico-especialidad"""
+    inicio = datetime.fromtimestamp(desde_ts, UTC)
+    fecha_inicio, _ = fecha_y_slot(inicio)
+    fecha_fin = fecha_inicio + timedelta(days=dias - 1)
+    calendario = CalendarioExcepciones(me.medico_id, fecha_inicio, fecha_fin)
+
+    fecha = fecha_inicio
+    while fecha <= fecha_fin:
+        del_dia = horarios.get(DIAS[fecha.weekday()])
+        if del_dia and not calendario.cerrado(fecha):
+            ocupados = ocupacion.slots(me.medico_id, fecha)
+            candidatos = []
+            for slot_inicio, slot_fin, box_id, box_nombre in del_dia:
+                if calendario.cerrado(fecha, box_id):
+                    continue
+                for minuto, ts_ini, _ in grilla_slots(
+                    fecha, slot_inicio + JORNADA_INICIO, slot_fin + JORNADA_INICIO, duracion=DURACION_CITA
+                ):
+                    if ts_ini < desde_ts:
+                        continue
+                    s = minuto - JORNADA_INICIO
+                    if any(s < o + DURACION_CITA and o < s + DURACION_CITA for o in ocupados):
+                        continue
+                    candidatos.append((ts_ini, s, minuto, box_nombre))
+            if candidatos:
+                retenidas = reservas.celdas_retenidas(
+                    me.medico_id, fecha,
+                    {c for _, s, _, _ in candidatos for c in (s, s + reservas.CELDA)},
+                    excepto_usuario_id=excepto_usuario_id,
+                )
+                for ts_ini, s, minuto, box_nombre in candidatos:
+                    if s in retenidas or s + reservas.CELDA in retenidas:
+                        continue
+                    yield ts_ini, fecha, minuto, box_nombre
+        fecha += timedelta(days=1)
+
+
+def proximas_horas(especialidad_id, desde, k=5, dias=60, excepto_usuario_id=None):
+    """
+    Primeros `k` slots libres de la especialidad desde el datetime aware `desde`,
+    mirando como máximo `dias` días. Lista ordenada por hora.
+    """
+    mes = list(
+        MedicoEspecialidad.objects.filter(especialidad_id=especialidad_id, activo=True)
+        .select_related('medico__usuario')
+    )
+    if not mes:
+        return []
+
+    horarios = {}
+    for h in (
+        Horario.objects.filter(medico_especialidad__in=mes)
+        .select_related('box').order_by('slot_inicio')
+    ):
+        horarios.setdefault(h.medico_especialidad_id, {}).setdefault(h.dia, []).append(
+            (h.slot_inicio, h.slot_fin, h.box_id, h.box.nombre if h.box else "Sin box")
+        )
+
+    con_horario = [me for me in mes if me.pk in horarios]
+    fecha_desde, _ = fecha_y_slot(desde)
+    ocupacion = Ocupacion({me.medico_id for me in con_horario}, fecha_desde)
+    desde_ts = int(desde.timestamp())
+
+    heap = []
+    for me in con_horario:
+        gen = _libres_medico(me, horarios[me.pk], ocupacion, desde_ts, dias, excepto_usuario_id)
+        primero = next(gen, None)
+        if primero:
+            heapq.heappush(heap, (primero[0], me.pk, primero, me, gen))
+
+    resultado = []
+    while heap and len(resultado) < k:
+        _, _, (ts_ini, fecha, minuto, box_nombre), me, gen = heapq.heappop(heap)
+        resultado.append({
+            'medico_id': me.medico_id,
+            'medico_nombre': me.medico.usuario.nombre,
+            'medico_especialidad_id': me.pk,
+            'fecha': fecha.isoformat(),
+            'horaInicio': hhmm(minuto),
+            'horaFin': hhmm(minuto + DURACION_CITA),
+            'box': box_nombre,
+            'fechaHora': datetime.fromtimestamp(ts_ini, UTC).isoformat(),
+        })
+        siguiente = next(gen, None)
+        if siguiente:
+            heapq.heappush(heap, (siguiente[0], me.pk, siguiente, me, gen))
+    return resultado
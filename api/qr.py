@@ -0,0 +1,81 @@
+"""
+Códigos QR de las citas (adjuntos del correo de confirmación).
+
+El PNG se genera con PIL si está instalado (el camino más rápido sin cache)
+y si no en Python puro (pypng); también hay SVG. Se usa un módulo más chico
+que el default de qrcode.make y el resultado se guarda en el cache por cita
+y URL. Al crear una cita se pre-renderiza en un hilo de fondo
+(api/signals.py), así la confirmación solo lee bytes del cache.
+
+El pre-render solo sirve entre procesos si CACHES apunta a un cache
+compartido (Redis/Memcached): con el locmem por defecto cada worker tiene el
+suyo y una confirmación atendida por otro worker renderiza sin cache.
+"""
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import qrcode
+from qrcode.constants import ERROR_CORRECT_M
+from qrcode.image.pure import PyPNGImage
+from qrcode.image.svg import SvgPathImage
+from django.conf import settings
+from django.core.cache import cache
+
+try:
+    from qrcode.image.pil import PilImage
+except ImportError:
+    PilImage = None
+
+FORMATOS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='qr')
+
+
+def url_cita(cita_id):
+    return f"{settings.QR_URL_BASE}/cita/{cita_id}"
+
+
+def renderizar(url, formato='png'):
+    qr = qrcode.QRCode(error_correction=ERROR_CORRECT_M, box_size=6, border=2)
+    qr.add_data(url)
+    qr.make(fit=True)
+    if formato == 'svg':
+        return qr.make_image(image_factory=SvgPathImage).to_string()
+    buffer = io.BytesIO()
+    if PilImage is not None:
+        qr.make_image(image_factory=PilImage).save(buffer, format='PNG')
+    else:
+        qr.make_image(image_factory=PyPNGImage).save(buffer)
+    return buffer.getvalue()
+
+
+def _clave(cita_id, url, formato):
+    return f"qr:{formato}:{cita_id}:{hashlib.sha1(url.encode()).hexdigest()[:16]}"
+
+
+def qr_cita(cita_id, formato=None):
+    """(bytes, content_type, extensión) del QR de la cita, desde el cache si existe"""
+    formato = formato or settings.QR_FORMATO
+    url = url_cita(cita_id)
+    clave = _clave(cita_id, url, formato)
+    datos = cache.get(clave)
+    if datos is None:
+        datos = renderizar(url, formato)
+        cache.set(clave, datos, settings.QR_CACHE_SEGUNDOS)
+    return datos, FORMATOS[formato], formato
+
+
+def _prerender(cita_id, formato):
+    try:
+        qr_cita(cita_id, formato)
+    except Exception as e:
+        print(f"⚠️ Error pre-renderizando QR de cita {cita_id}: {e}")
+
+
+def prerender(cita_id, formato=None):
+    """Encola el render en segundo plano (no bloquea el request)"""
+    _pool.submit(_prerender, cita_id, formato)
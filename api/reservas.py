@@ -0,0 +1,106 @@
+"""
+Reservas temporales de slots ("holds") mientras el paciente completa el formulario.
+
+Una cita ocupa [slot, slot+30) y la grilla avanza cada 15 minutos, así que un
+hold toma las dos celdas de 15 minutos que cubre con cache.add (atómico en
+locmem, Redis y Memcached): dos pacientes que compiten por slots solapados no
+pueden quedarse ambos con el hold. Las celdas expiran solas con el TTL.
+
+Con LocMemCache los holds solo se ven dentro del mismo proceso; con varios
+workers hay que configurar CACHE_BACKEND compartido (Redis/Memcached).
+"""
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .tiempo import DURACION_CITA
+
+CELDA = 15
+PREFIJO = 'reserva'
+
+
+def ttl():
+    return getattr(settings, 'RESERVA_SLOT_TTL', 300)
+
+
+def _celdas(slot):
+    return range(slot, slot + DURACION_CITA, CELDA)
+
+
+def _clave_celda(medico_id, fecha, celda):
+    return f"{PREFIJO}:celda:{medico_id}:{fecha.isoformat()}:{celda}"
+
+
+def _clave_token(token):
+    return f"{PREFIJO}:token:{token}"
+
+
+def reservar(usuario_id, medico_id, medico_especialidad_id, fecha, slot):
+    """
+    Toma el hold del slot para el usuario. Devuelve el token, o None si otro
+    usuario ya tiene retenida alguna de sus celdas.
+    """
+    token = secrets.token_urlsafe(16)
+    valor = {'token': token, 'usuario_id': usuario_id}
+    tomadas = []
+    for celda in _celdas(slot):
+        clave = _clave_celda(medico_id, fecha, celda)
+        if not cache.add(clave, valor, ttl()):
+            actual = cache.get(clave)
+            # El mismo usuario puede re-reservar sobre su propio hold
+            if not actual or actual['usuario_id'] != usuario_id:
+                cache.delete_many(tomadas)
+                return None
+            cache.set(clave, valor, ttl())
+        tomadas.append(clave)
+
+    cache.set(_clave_token(token), {
+        'usuario_id': usuario_id,
+        'medico_id': medico_id,
+        'medico_especialidad_id': medico_especialidad_id,
+        'fecha': fecha,
+        'slot': slot,
+    }, ttl())
+    return token
+
+
+def obtener(token):
+    return cache.get(_clave_token(token)) if token else None
+
+
+def liberar(token):
+    datos = obtener(token)
+    if not datos:
+        return False
+    claves = [_clave_celda(datos['medico_id'], datos['fecha'], c) for c in _celdas(datos['slot'])]
+    propias = [k for k, v in cache.get_many(claves).items() if v['token'] == token]
+    cache.delete_many(propias + [_clave_token(token)])
+    return True
+
+
+def _retenidas(claves, valores, excepto_usuario_id):
+    return {
+        claves[clave] for clave, valor in valores.items()
+        if excepto_usuario_id is None or valor['usuario_id'] != excepto_usuario_id
+    }
+
+
+def celdas_retenidas(medico_id, fecha, celdas, excepto_usuario_id=None):
+    """
+    Conjunto de celdas con hold vigente de otros usuarios, leídas con un solo
+    get_many (una ida al cache por consulta de disponibilidad).
+    """
+    claves = {_clave_celda(medico_id, fecha, c): c for c in celdas}
+    return _retenidas(claves, cache.get_many(list(claves)), excepto_usuario_id)
+
+
+async def aceldas_retenidas(medico_id, fecha, celdas, excepto_usuario_id=None):
+    claves = {_clave_celda(medico_id, fecha, c): c for c in celdas}
+    return _retenidas(claves, await cache.aget_many(list(claves)), excepto_usuario_id)
+
+
+def slot_retenido(medico_id, fecha, slot, usuario_id=None):
+    """True si alguna celda del slot tiene un hold vigente de otro usuario"""
+    claves = [_clave_celda(medico_id, fecha, c) for c in _celdas(slot)]
+    return any(v['usuario_id'] != usuario_id for v in cache.get_many(claves).values())
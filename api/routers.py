@@ -0,0 +1,62 @@
+"""
+Ruteo de lecturas a réplicas (settings.DB_REPLICAS) con read-your-writes.
+
+Por defecto todo va al primario (comandos, shell, jobs). Solo dentro de un
+request de lectura marcado por ReplicaMiddleware las lecturas pueden ir a una
+réplica; la primera escritura del request vuelve a fijar el primario y el
+middleware deja una cookie para que los requests siguientes del mismo cliente
+lean del primario mientras la réplica se pone al día.
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+
+_usar_replica = contextvars.ContextVar('usar_replica', default=False)
+_hubo_escritura = contextvars.ContextVar('hubo_escritura', default=False)
+
+
+def replicas():
+    return getattr(settings, 'DB_REPLICAS', [])
+
+
+@contextmanager
+def lecturas_en_replica(permitir=True):
+    t1 = _usar_replica.set(permitir)
+    t2 = _hubo_escritura.set(False)
+    try:
+        yield
+    finally:
+        _usar_replica.reset(t1)
+        _hubo_escritura.reset(t2)
+
+
+def en_primario():
+    """Fuerza el primario en el bloque (validaciones de reserva, locks)"""
+    return lecturas_en_replica(False)
+
+
+def hubo_escritura():
+    return _hubo_escritura.get()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        disponibles = replicas()
+        if not disponibles or not _usar_replica.get():
+            return 'default'
+        return random.choice(disponibles)
+
+    def db_for_write(self, model, **hints):
+        # Read-your-writes: el resto del request lee del primario
+        _usar_replica.set(False)
+        _hubo_escritura.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas y primario tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas()
@@ -3,7 +3,10 @@ from rest_framework.exceptions import ValidationError
 from django.contrib.auth.hashers import make_password
 from django.utils import timezone
 from datetime import datetime, timedelta
-from .models import Usuario, Paciente, Administrador, Medico, MedicoEspecialidad, Cita, Notificacion, Horario, Especialidad, Box, Recordatorio
+from .excepciones import dia_cerrado
+from .reservas import slot_retenido
+from .tiempo import DIAS, asegurar_aware, fecha_y_slot, slot_a_hhmm, slot_de_hora
+from .models import Usuario, Paciente, Administrador, Medico, MedicoEspecialidad, Cita, Notificacion, Horario, Especialidad, Box, Recordatorio, ExcepcionHorario, ListaEspera, CitaHistorica
 
 class UsuarioSerializer(serializers.ModelSerializer):
     class Meta:
@@ -46,7 +49,8 @@ class PacienteSerializer(serializers.ModelSerializer):
         u = usuario.save()
         return Paciente.objects.create(usuario=u, **validated_data)
     def to_representation(self, instance):
-        return {'usuario': UsuarioSerializer(instance.usuario).data, 'direccion': getattr(instance, 'direccion', '')}
+        # Reutiliza el serializer anidado ya instanciado (no uno nuevo por fila)
+        return {'usuario': self.fields['usuario'].to_representation(instance.usuario), 'direccion': getattr(instance, 'direccion', '')}
 
 class AdministradorSerializer(serializers.ModelSerializer):
     usuario = UsuarioSerializer()
@@ -60,7 +64,7 @@ class AdministradorSerializer(serializers.ModelSerializer):
         u = usuario.save()
         return Administrador.objects.create(usuario=u)
     def to_representation(self, instance):
-        return {'usuario': UsuarioSerializer(instance.usuario).data}
+        return {'usuario': self.fields['usuario'].to_representation(instance.usuario)}
 
 class EspecialidadSerializer(serializers.ModelSerializer):
     class Meta:
@@ -159,6 +163,8 @@ class HorarioSerializer(serializers.ModelSerializer):
     box = serializers.PrimaryKeyRelatedField(queryset=Box.objects.all(), required=True, allow_null=False)
     box_nombre = serializers.CharField(source='box.nombre', read_only=True)
 
+    validar_superposicion = True
+
     class Meta:
         model = Horario
         fields = ['id', 'medico_especialidad', 'box', 'box_nombre', 'dia', 'horaInicio', 'horaFin']
@@ -184,16 +190,59 @@ class HorarioSerializer(serializers.ModelSerializer):
         if data['horaInicio'] >= data['horaFin']:
             raise serializers.ValidationError({"horaInicio": "Debe ser anterior a horaFin"})
 
-        qs = Horario.objects.filter(
-            medico_especialidad__medico_id=me.medico_id,
-            dia=data['dia'],
-            box_id=box.id
-        )
-        if self.instance:
-            qs = qs.exclude(pk=self.instance.pk)
-        for h in qs:
-            if (data['horaInicio'] < h.horaFin) and (h.horaInicio < data['horaFin']):
-                raise serializers.ValidationError({"box": "Ya existe un horario superpuesto en este box para este médico"})
+        if self.validar_superposicion and Horario.existe_superposicion(
+            me.medico_id, data['dia'], box.id,
+            slot_de_hora(data['horaInicio']), slot_de_hora(data['horaFin']),
+            excluir_pk=self.instance.pk if self.instance else None
+        ):
+            raise serializers.ValidationError({"box": "Ya existe un horario superpuesto en este box para este médico"})
+        return data
+
+    def create(self, validated_data):
+        # validate() ya cubre las reglas de Horario.clean(): no repetir full_clean()
+        horario = Horario(**validated_data)
+        horario.save(skip_validation=True)
+        return horario
+
+    def update(self, instance, validated_data):
+        for k, v in validated_data.items():
+            setattr(instance, k, v)
+        instance.save(skip_validation=True)
+        return instance
+
+class HorarioSemanaItemSerializer(HorarioSerializer):
+    """
+    Un bloque del editor semanal: mismas reglas que HorarioSerializer, pero la
+    superposición se valida en memoria sobre la semana completa (los horarios
+    existentes se reemplazan).
+    """
+    validar_superposicion = False
+
+class HorarioSemanaSerializer(serializers.Serializer):
+    medico_id = serializers.IntegerField()
+    # Vacía no se acepta: borraría la semana completa del médico
+    horarios = HorarioSemanaItemSerializer(many=True, allow_empty=False)
+
+    def validate(self, data):
+        medico_id = data['medico_id']
+        por_box_dia = {}
+        for h in data['horarios']:
+            if h['medico_especialidad'].medico_id != medico_id:
+                raise serializers.ValidationError(
+                    {"horarios": f"La especialidad {h['medico_especialidad'].pk} no pertenece al médico {medico_id}"}
+                )
+            por_box_dia.setdefault((h['box'].pk, h['dia']), []).append(
+                (slot_de_hora(h['horaInicio']), slot_de_hora(h['horaFin']))
+            )
+
+        # Una sola pasada: ordenar cada (box, día) y comparar vecinos
+        for (box_id, dia), intervalos in por_box_dia.items():
+            intervalos.sort()
+            for (_, fin_prev), (inicio, _) in zip(intervalos, intervalos[1:]):
+                if inicio < fin_prev:
+                    raise serializers.ValidationError(
+                        {"horarios": f"Horarios superpuestos el {dia} en el box {box_id}"}
+                    )
         return data
 
 class CitaSerializer(serializers.ModelSerializer):
@@ -240,22 +289,17 @@ class CitaSerializer(serializers.ModelSerializer):
             me = obj.medico_especialidad
             if not me:
                 return None
-            dias = ['Lunes','Martes','Miercoles','Jueves','Viernes','Sabado','Domingo']
-            from django.utils import timezone
-            import pytz
-            chile_tz = pytz.timezone('America/Santiago')
-            fecha_chile = obj.fechaHora.astimezone(chile_tz)
-            dia_nombre = dias[fecha_chile.weekday()]
-            t = fecha_chile.time()
+            if obj.fecha_local is not None and obj.slot is not None:
+                fecha, slot = obj.fecha_local, obj.slot
+            else:
+                fecha, slot = fecha_y_slot(obj.fechaHora)
             
-            h = Horario.objects.filter(
+            return Horario.objects.filter(
                 medico_especialidad=me, 
-                dia=dia_nombre, 
-                horaInicio__lte=t, 
-                horaFin__gt=t
-            ).first()
-            
-            return h.box.nombre if (h and h.box) else None
+                dia=DIAS[fecha.weekday()], 
+                slot_inicio__lte=slot, 
+                slot_fin__gt=slot
+            ).values_list('box__nombre', flat=True).first()
         except Exception as e:
             print(f" Error obteniendo box_nombre: {e}")
             return None
@@ -304,27 +348,28 @@ class CitaSerializer(serializers.ModelSerializer):
         
         # Validar horario usando hora local de Chile
         if me and fechaHora:
-            import pytz
-            chile_tz = pytz.timezone('America/Santiago')
-            
-            if timezone.is_naive(fechaHora):
-                fechaHora = timezone.make_aware(fechaHora, timezone.utc)
-            
-            fecha_chile = fechaHora.astimezone(chile_tz)
-            dias = ['Lunes','Martes','Miercoles','Jueves','Viernes','Sabado','Domingo']
-            dia_nombre = dias[fecha_chile.weekday()]
-            t = fecha_chile.time()
+            fechaHora = asegurar_aware(fechaHora)
+            fecha_local, slot = fecha_y_slot(fechaHora)
+            dia_nombre = DIAS[fecha_local.weekday()]
             
             horarios_disponibles = Horario.objects.filter(
                 medico_especialidad=me, 
                 dia=dia_nombre, 
-                horaInicio__lte=t, 
-                horaFin__gt=t
+                slot_inicio__lte=slot, 
+                slot_fin__gt=slot
             )
             
-            if not horarios_disponibles.exists():
+            box_horario = horarios_disponibles.values_list('box_id', flat=True)[:1]
+            if not box_horario:
+                raise serializers.ValidationError(
+                    {"fechaHora": f"El médico no tiene disponibilidad configurada para {dia_nombre} a las {slot_a_hhmm(slot)}"}
+                )
+            
+            # Feriados, vacaciones o box cerrado ese día
+            cerrado, motivo = dia_cerrado(me.medico_id, fecha_local, box_horario[0])
+            if cerrado:
                 raise serializers.ValidationError(
-                    {"fechaHora": f"El médico no tiene disponibilidad configurada para {dia_nombre} a las {t.strftime('%H:%M')}"}
+                    {"fechaHora": f"El médico no atiende el {fecha_local.strftime('%d-%m-%Y')}" + (f": {motivo}" if motivo else "")}
                 )
         
         if medico and fechaHora:
@@ -342,45 +387,49 @@ class CitaSerializer(serializers.ModelSerializer):
                     {"fechaHora": "Ya existe una cita en este horario"}
                 )
             
+            # Slot retenido temporalmente por otro paciente (ver reservas.py)
+            usuario = data.get('usuario', self.instance.usuario if self.instance else None)
+            if usuario is None:
+                # Sin 'usuario' en el payload perform_create guarda la cita a nombre de request.user
+                request = self.context.get('request')
+                usuario = getattr(request, 'user', None)
+            fecha_local, slot = fecha_y_slot(asegurar_aware(fechaHora))
+            if slot_retenido(medico.pk, fecha_local, slot, getattr(usuario, 'pk', None)):
+                raise serializers.ValidationError(
+                    {"fechaHora": "Este horario está reservado temporalmente por otro paciente"}
+                )
+            
             # Validar conflicto en mismo box
             try:
-                import pytz
-                chile_tz = pytz.timezone('America/Santiago')
-                if timezone.is_naive(fechaHora):
-                    fechaHora = timezone.make_aware(fechaHora, timezone.utc)
-                fecha_chile = fechaHora.astimezone(chile_tz)
-                
-                dias = ['Lunes','Martes','Miercoles','Jueves','Viernes','Sabado','Domingo']
-                dia_nombre = dias[fecha_chile.weekday()]
-                t = fecha_chile.time()
+                fechaHora = asegurar_aware(fechaHora)
+                fecha_local, slot = fecha_y_slot(fechaHora)
+                dia_nombre = DIAS[fecha_local.weekday()]
                 
                 h = Horario.objects.filter(
                     medico_especialidad=me,
                     dia=dia_nombre,
-                    horaInicio__lte=t,
-                    horaFin__gt=t
-                ).select_related('box').first()
+                    slot_inicio__lte=slot,
+                    slot_fin__gt=slot
+                ).first()
                 
                 if h and h.box_id:
                     otras = Cita.objects.filter(
                         medico=medico,
-                        fechaHora=fechaHora,
+                        fecha_local=fecha_local,
+                        slot=slot,
                         estado__in=['Pendiente', 'Confirmada']
                     )
                     if self.instance:
                         otras = otras.exclude(pk=self.instance.pk)
                     
-                    for c in otras:
-                        c_fecha_chile = c.fechaHora.astimezone(chile_tz)
-                        dia2 = dias[c_fecha_chile.weekday()]
-                        t2 = c_fecha_chile.time()
-                        h2 = Horario.objects.filter(
-                            medico_especialidad=c.medico_especialidad,
-                            dia=dia2,
-                            horaInicio__lte=t2,
-                            horaFin__gt=t2
-                        ).first()
-                        if h2 and h2.box_id == h.box_id:
+                    for me_id, slot2 in otras.values_list('medico_especialidad_id', 'slot'):
+                        if Horario.objects.filter(
+                            medico_especialidad_id=me_id,
+                            dia=dia_nombre,
+                            box_id=h.box_id,
+                            slot_inicio__lte=slot2,
+                            slot_fin__gt=slot2
+                        ).exists():
                             raise serializers.ValidationError(
                                 {"fechaHora": "Ya existe una cita en este box a esta hora"}
                             )
@@ -395,12 +444,73 @@ class CitaSerializer(serializers.ModelSerializer):
 class NotificacionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notificacion
-        fields = ['id', 'cita', 'usuario', 'tipo', 'mensaje', 'fechaEnvio', 'estado']
+        fields = ['id', 'cita', 'cita_historica', 'usuario', 'tipo', 'mensaje', 'fechaEnvio', 'estado']
 
 class RecordatorioSerializer(serializers.ModelSerializer):
-    cita_id = serializers.IntegerField(source='cita.id', read_only=True)
-    usuario_correo = serializers.EmailField(source='cita.usuario.correo', read_only=True)
+    cita_id = serializers.IntegerField(source='cita.id', read_only=True, allow_null=True)
+    usuario_correo = serializers.EmailField(source='cita.usuario.correo', read_only=True, allow_null=True)
 
     class Meta:
         model = Recordatorio
-        fields = ['id', 'cita_id', 'fecha_programada', 'enviado', 'fecha_envio', 'usuario_correo']
+        fields = ['id', 'cita_id', 'cita_historica', 'fecha_programada', 'enviado', 'fecha_envio', 'usuario_correo']
+
+class ExcepcionHorarioSerializer(serializers.ModelSerializer):
+    alcance = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = ExcepcionHorario
+        fields = ['id', 'medico', 'box', 'fecha_inicio', 'fecha_fin', 'motivo', 'alcance', 'fecha_creacion']
+        read_only_fields = ['fecha_creacion']
+
+    def validate(self, data):
+        inicio = data.get('fecha_inicio', getattr(self.instance, 'fecha_inicio', None))
+        fin = data.get('fecha_fin', getattr(self.instance, 'fecha_fin', None))
+        if inicio and fin and inicio > fin:
+            raise serializers.ValidationError({"fecha_fin": "Debe ser igual o posterior a fecha_inicio"})
+        medico = data.get('medico', getattr(self.instance, 'medico', None))
+        box = data.get('box', getattr(self.instance, 'box', None))
+        if medico and box and box.medico_id != medico.pk:
+            raise serializers.ValidationError({"box": "El box seleccionado no pertenece al médico"})
+        return data
+
+class ListaEsperaSerializer(serializers.ModelSerializer):
+    especialidad_nombre = serializers.CharField(source='especialidad.nombre', read_only=True)
+
+    class Meta:
+        model = ListaEspera
+        fields = [
+            'id', 'usuario', 'especialidad', 'especialidad_nombre', 'medico', 'fecha_desde', 'fecha_hasta',
+            'estado', 'oferta_token', 'oferta_fechaHora', 'oferta_medico_especialidad', 'oferta_expira',
+            'fecha_creacion',
+        ]
+        read_only_fields = [
+            'estado', 'oferta_token', 'oferta_fechaHora', 'oferta_medico_especialidad', 'oferta_expira',
+            'fecha_creacion',
+        ]
+        extra_kwargs = {'usuario': {'required': False}}
+
+    def validate(self, data):
+        desde = data.get('fecha_desde', getattr(self.instance, 'fecha_desde', None))
+        hasta = data.get('fecha_hasta', getattr(self.instance, 'fecha_hasta', None))
+        if desde and hasta and desde > hasta:
+            raise serializers.ValidationError({"fecha_hasta": "Debe ser igual o posterior a fecha_desde"})
+        medico = data.get('medico', getattr(self.instance, 'medico', None))
+        especialidad = data.get('especialidad', getattr(self.instance, 'especialidad', None))
+        if medico and especialidad and not MedicoEspecialidad.objects.filter(
+            medico=medico, especialidad=especialidad
+        ).exists():
+            raise serializers.ValidationError({"medico": "El médico no atiende esa especialidad"})
+        return data
+
+class CitaHistoricaSerializer(serializers.ModelSerializer):
+    usuario_nombre = serializers.CharField(source='usuario.nombre', read_only=True)
+    medico_nombre = serializers.CharField(source='medico.usuario.nombre', read_only=True)
+    especialidad_nombre = serializers.CharField(source='medico_especialidad.especialidad.nombre', read_only=True)
+    archivada = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CitaHistorica
+        fields = '__all__'
+
+    def get_archivada(self, obj):
+        return True
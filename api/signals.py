@@ -0,0 +1,120 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import Cita, ExcepcionHorario, Horario, Medico, Recordatorio, Usuario
+from . import calendario, estadisticas, eventos, qr, sincronizacion
+from .tiempo import fecha_y_slot
+
+CAMPOS_ESTADISTICA = ('fechaHora', 'medico_id', 'medico_especialidad_id', 'estado', 'prioridad')
+
+
+def _valores(cita):
+    return tuple(getattr(cita, campo) for campo in CAMPOS_ESTADISTICA)
+
+
+def _invalidar_meses(*valores):
+    # Después del commit: si se borra antes, otro request puede volver a
+    # cachear el mes con los datos viejos
+    meses = {(v[1], fecha_y_slot(v[0])[0].replace(day=1)) for v in valores if v and v[0]}
+    if meses:
+        transaction.on_commit(lambda: [calendario.invalidar_mes(m, f) for m, f in meses])
+
+
+def _posicion(valores):
+    # (medico_id, fechaHora, estado) para el feed de eventos
+    if not valores:
+        return None
+    fechaHora, medico_id, _, estado, _ = valores
+    return medico_id, fechaHora, estado
+
+
+@receiver(pre_save, sender=Cita)
+def cita_pre_save(sender, instance, **kwargs):
+    # Guardar el estado anterior para mover el conteo del rollup
+    instance._valores_previos = None
+    if instance.pk and not estadisticas.actualizacion_suspendida():
+        previo = Cita.objects.filter(pk=instance.pk).values_list(*CAMPOS_ESTADISTICA).first()
+        instance._valores_previos = previo
+
+
+@receiver(post_save, sender=Cita)
+def cita_post_save(sender, instance, created, **kwargs):
+    if estadisticas.actualizacion_suspendida():
+        return
+    previos = getattr(instance, '_valores_previos', None)
+    actuales = _valores(instance)
+    if previos == actuales:
+        return
+    try:
+        if previos:
+            estadisticas.sumar(estadisticas.clave_cita(*previos), -1)
+        estadisticas.sumar(estadisticas.clave_cita(*actuales), 1)
+    except Exception as e:
+        print(f"⚠️ Error actualizando estadísticas de cita {instance.pk}: {e}")
+    try:
+        eventos.publicar_cambio(instance.pk, instance.usuario_id, _posicion(previos), _posicion(actuales))
+    except Exception as e:
+        print(f"⚠️ Error publicando eventos de cita {instance.pk}: {e}")
+    _invalidar_meses(previos, actuales)
+    if created:
+        # El QR del correo de confirmación queda listo en el cache
+        transaction.on_commit(lambda: qr.prerender(instance.pk))
+
+
+@receiver(post_delete, sender=Cita)
+def cita_post_delete(sender, instance, **kwargs):
+    if estadisticas.actualizacion_suspendida():
+        return
+    try:
+        estadisticas.sumar(estadisticas.clave_cita(*_valores(instance)), -1)
+    except Exception as e:
+        print(f"⚠️ Error actualizando estadísticas de cita {instance.pk}: {e}")
+    try:
+        eventos.publicar_cambio(instance.pk, instance.usuario_id, _posicion(_valores(instance)), None)
+    except Exception as e:
+        print(f"⚠️ Error publicando eventos de cita {instance.pk}: {e}")
+    _invalidar_meses(_valores(instance))
+    sincronizacion.registrar_eliminacion(instance)
+
+
+def _medico_de_horario(horario):
+    try:
+        return horario.medico_especialidad.medico_id
+    except Exception:
+        # Borrado en cascada de la especialidad: invalidar todo
+        return None
+
+
+@receiver(post_save, sender=Horario)
+@receiver(post_delete, sender=Horario)
+def horario_cambiado(sender, instance, **kwargs):
+    medico_id = _medico_de_horario(instance)
+    transaction.on_commit(lambda: calendario.invalidar_medico(medico_id))
+
+
+@receiver(post_save, sender=ExcepcionHorario)
+@receiver(post_delete, sender=ExcepcionHorario)
+def excepcion_cambiada(sender, instance, **kwargs):
+    if instance.medico_id:
+        medico_id = instance.medico_id
+    elif instance.box_id:
+        medico_id = instance.box.medico_id
+    else:
+        medico_id = None  # feriado de la clínica: afecta a todos
+    transaction.on_commit(lambda: calendario.invalidar_medico(medico_id))
+
+
+@receiver(post_delete, sender=Usuario)
+@receiver(post_delete, sender=Medico)
+@receiver(post_delete, sender=Horario)
+def tombstone(sender, instance, **kwargs):
+    # Las citas lo registran en cita_post_delete (el archivado lo hace por lote)
+    sincronizacion.registrar_eliminacion(instance)
+
+
+@receiver(pre_delete, sender=Recordatorio)
+def recordatorio_tombstone(sender, instance, **kwargs):
+    # pre_delete: en el borrado en cascada la cita (dueña del tombstone) aún existe;
+    # el borrado corre en una transacción, si falla el tombstone se revierte con él
+    sincronizacion.registrar_eliminacion(instance)
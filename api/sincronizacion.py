@@ -0,0 +1,235 @@
+"""
+Sincronización incremental para clientes offline (recepción): en vez de
+volver a bajar los listados completos, GET /api/sync/?cursor=... devuelve
+solo las filas creadas o modificadas desde la última llamada y los ids
+borrados (tombstones de RegistroEliminado).
+
+El cursor es opaco para el cliente: por cada modelo guarda la última
+posición (updated_at, pk) entregada y recorre el índice de updated_at con
+paginación keyset, así los empates de updated_at (UPDATE masivos) no pierden
+filas entre páginas. Solo se entregan cambios con más de
+MARGEN_CAMBIOS_SEGUNDOS de antigüedad: updated_at se fija antes del commit y
+el margen cubre la transacción más larga (importación, archivado, cancelación
+masiva). La vista lee siempre del primario (GET_PRIMARIO en api/middleware.py).
+
+Los tombstones guardan el paciente y el médico de la fila borrada y cada
+usuario recibe solo los de filas que podía ver (mismo alcance que los cambios).
+Su posición también va por modelo ('_eliminados:<modelo>'): un cliente que pide
+?modelos=citas no avanza los tombstones de los modelos que no pidió.
+
+Los tombstones se purgan tras SYNC_RETENCION_DIAS (purgar_eliminados); un
+cursor más viejo que eso recibe 410 y el cliente debe resincronizar desde cero.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import Cita, CitaHistorica, Horario, Medico, Recordatorio, RegistroEliminado, Usuario
+
+LIMITE_MAX = 2000
+# Prefijo de la posición de tombstones por modelo; sin sufijo es la posición
+# compartida de los cursores anteriores, que se usa mientras el modelo no tenga la suya
+ELIMINADOS = '_eliminados'
+
+
+def clave_eliminados(nombre):
+    return f'{ELIMINADOS}:{nombre}'
+
+
+class CursorInvalido(Exception):
+    pass
+
+
+class CursorVencido(Exception):
+    pass
+
+
+# nombre -> (modelo, campos entregados). El pk va siempre primero.
+MODELOS = {
+    'usuarios': (Usuario, ('id', 'rut', 'nombre', 'correo', 'telefono', 'rol', 'fecha_registro', 'updated_at')),
+    'medicos': (Medico, ('usuario_id', 'especialidad_texto', 'created_at', 'updated_at')),
+    'horarios': (Horario, (
+        'id', 'medico_especialidad_id', 'box_id', 'dia', 'horaInicio', 'horaFin', 'created_at', 'updated_at',
+    )),
+    'citas': (Cita, (
+        'id', 'usuario_id', 'medico_id', 'medico_especialidad_id', 'fechaHora', 'estado', 'prioridad',
+        'descripcion', 'fecha_local', 'slot', 'created_at', 'updated_at',
+    )),
+    'recordatorios': (Recordatorio, (
+        'id', 'cita_id', 'fecha_programada', 'enviado', 'fecha_envio', 'created_at', 'updated_at',
+    )),
+}
+NOMBRE_POR_MODELO = {modelo: nombre for nombre, (modelo, _) in MODELOS.items()}
+
+
+PUBLICOS = ('medicos', 'horarios')
+
+
+def _duenos(instancia):
+    """(usuario_id, medico_id) de la fila; (None, None) para los modelos públicos"""
+    if isinstance(instancia, Usuario):
+        return instancia.pk, None
+    if isinstance(instancia, Cita):
+        return instancia.usuario_id, instancia.medico_id
+    if isinstance(instancia, Recordatorio):
+        # Se llama desde pre_delete: en el borrado en cascada la cita todavía existe
+        if instancia.cita_id:
+            fila = Cita.objects.filter(pk=instancia.cita_id).values_list('usuario_id', 'medico_id').first()
+        else:
+            fila = (
+                CitaHistorica.objects.filter(pk=instancia.cita_historica_id)
+                .values_list('usuario_id', 'medico_id').first()
+            )
+        return fila or (None, None)
+    return None, None
+
+
+def registrar_eliminacion(instancia):
+    nombre = NOMBRE_POR_MODELO.get(type(instancia))
+    if nombre:
+        usuario_id, medico_id = _duenos(instancia)
+        RegistroEliminado.objects.create(
+            modelo=nombre, objeto_id=instancia.pk, usuario_id=usuario_id, medico_id=medico_id
+        )
+
+
+def registrar_eliminaciones(nombre, duenos):
+    """Para borrados masivos que no pasan por señales (archivado). duenos: {id: (usuario_id, medico_id)}"""
+    RegistroEliminado.objects.bulk_create([
+        RegistroEliminado(modelo=nombre, objeto_id=pk, usuario_id=usuario_id, medico_id=medico_id)
+        for pk, (usuario_id, medico_id) in duenos.items()
+    ])
+
+
+def alcance(nombre, usuario, es_admin, medico_id):
+    """Filtro de filas visibles para el usuario; None = todas"""
+    if nombre == 'recordatorios' and es_admin:
+        # Los de citas archivadas (cita NULL) se informaron como eliminados
+        return Q(cita__isnull=False)
+    if es_admin or nombre in PUBLICOS:
+        return None
+    if nombre == 'usuarios':
+        return Q(pk=usuario.pk)
+    # citas y recordatorios: las del paciente y, si es médico, las de su agenda
+    prefijo = 'cita__' if nombre == 'recordatorios' else ''
+    filtro = Q(**{f'{prefijo}usuario_id': usuario.pk})
+    if medico_id:
+        filtro |= Q(**{f'{prefijo}medico_id': medico_id})
+    return filtro
+
+
+def alcance_eliminados(usuario, es_admin, medico_id):
+    """Tombstones que puede recibir el usuario: los públicos y los de sus filas"""
+    if es_admin:
+        return None
+    filtro = Q(modelo__in=PUBLICOS) | Q(usuario_id=usuario.pk)
+    if medico_id:
+        filtro |= Q(modelo__in=('citas', 'recordatorios'), medico_id=medico_id)
+    return filtro
+
+
+def codificar(estado):
+    return base64.urlsafe_b64encode(json.dumps(estado, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decodificar(cursor):
+    if not cursor:
+        return {}
+    try:
+        estado = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return {
+            nombre: (datetime.fromisoformat(ts), pk)
+            for nombre, (ts, pk) in estado.items()
+            if nombre in MODELOS or nombre == ELIMINADOS
+            or (nombre.startswith(ELIMINADOS + ':') and nombre.split(':', 1)[1] in MODELOS)
+        }
+    except (ValueError, TypeError, AttributeError):
+        raise CursorInvalido('Cursor inválido')
+
+
+def _despues_de(campo, posicion):
+    ts, pk = posicion
+    return Q(**{f'{campo}__gt': ts}) | Q(**{campo: ts, 'pk__gt': pk})
+
+
+def cambios(usuario, cursor=None, modelos=None, limite=500, es_admin=False, medico_id=None, ahora=None):
+    """
+    Devuelve {'cursor', 'completo', 'cambios': {modelo: [filas]}, 'eliminados': {modelo: [ids]}}.
+    completo=False indica que quedan más páginas: volver a llamar con el cursor nuevo.
+    """
+    ahora = ahora or timezone.now()
+    hasta = ahora - timedelta(seconds=settings.MARGEN_CAMBIOS_SEGUNDOS)
+    limite = max(1, min(limite, LIMITE_MAX))
+    modelos = [m for m in (modelos or MODELOS) if m in MODELOS]
+    estado = decodificar(cursor)
+
+    posiciones = {nombre: estado.get(clave_eliminados(nombre), estado.get(ELIMINADOS)) for nombre in modelos}
+    vencimiento = ahora - timedelta(days=settings.SYNC_RETENCION_DIAS)
+    if any(pos and pos[0] < vencimiento for pos in posiciones.values()):
+        raise CursorVencido('Cursor más antiguo que la retención de eliminados; resincronice desde cero')
+
+    completo = True
+    salida = {}
+    for nombre in modelos:
+        modelo, campos = MODELOS[nombre]
+        qs = modelo.objects.filter(updated_at__lte=hasta)
+        filtro = alcance(nombre, usuario, es_admin, medico_id)
+        if filtro is not None:
+            qs = qs.filter(filtro)
+        if nombre in estado:
+            qs = qs.filter(_despues_de('updated_at', estado[nombre]))
+        filas = list(qs.order_by('updated_at', 'pk').values(*campos)[:limite + 1])
+        if len(filas) > limite:
+            filas = filas[:limite]
+            completo = False
+        if filas:
+            estado[nombre] = (filas[-1]['updated_at'], filas[-1][campos[0]])
+        salida[nombre] = filas
+
+    eliminados = {}
+    filtro = alcance_eliminados(usuario, es_admin, medico_id)
+    for nombre in modelos:
+        clave = clave_eliminados(nombre)
+        pos = posiciones[nombre]
+        base = RegistroEliminado.objects.filter(modelo=nombre, eliminado_en__lte=hasta)
+        if pos is None:
+            # Primera sincronización del modelo: el cliente no tiene nada que borrar
+            estado[clave] = (hasta, base.aggregate(m=Max('id'))['m'] or 0)
+            continue
+        qs = base.filter(filtro) if filtro is not None else base
+        filas = list(
+            qs.filter(_despues_de('eliminado_en', pos))
+            .order_by('eliminado_en', 'id')
+            .values_list('id', 'eliminado_en', 'objeto_id')[:limite + 1]
+        )
+        if filas[:limite]:
+            eliminados[nombre] = [objeto_id for _, _, objeto_id in filas[:limite]]
+        if len(filas) > limite:
+            completo = False
+            estado[clave] = (filas[limite - 1][1], filas[limite - 1][0])
+        else:
+            # Todo lo anterior a `hasta` ya se entregó: avanzar hasta ahí mantiene
+            # vigente el cursor aunque pasen meses sin borrados
+            estado[clave] = (hasta, filas[-1][0] if filas else pos[1])
+
+    if all(clave_eliminados(nombre) in estado for nombre in MODELOS):
+        estado.pop(ELIMINADOS, None)
+
+    return {
+        'cursor': codificar({n: (ts.isoformat(), pk) for n, (ts, pk) in estado.items()}),
+        'completo': completo,
+        'cambios': salida,
+        'eliminados': eliminados,
+    }
+
+
+def purgar_eliminados(dias=None, ahora=None):
+    """Borra los tombstones más viejos que la retención; devuelve cuántos"""
+    dias = settings.SYNC_RETENCION_DIAS if dias is None else dias
+    corte = (ahora or timezone.now()) - timedelta(days=dias)
+    borrados, _ = RegistroEliminado.objects.filter(eliminado_en__lt=corte).delete()
+    return borrados
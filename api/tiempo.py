@@ -0,0 +1,148 @@
+"""
+Utilidades de hora local de Chile sobre zoneinfo.
+
+Los límites de cada día (inicio/fin en UTC y el offset vigente, incluido el
+cambio de horario) se calculan una vez por fecha y quedan en caché; con eso
+una grilla de slots se convierte a UTC con aritmética entera, sin llamar a
+localize()/astimezone() por cada slot como se hacía con pytz.
+"""
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+CHILE_TZ = ZoneInfo('America/Santiago')
+UTC = dt_timezone.utc
+DIAS = ['Lunes', 'Martes', 'Miercoles', 'Jueves', 'Viernes', 'Sabado', 'Domingo']
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# segmentos: tupla de (minuto_local_desde, offset_en_segundos), ordenada
+LimitesDia = namedtuple('LimitesDia', ['inicio_utc', 'fin_utc', 'segmentos', 'epoch_medianoche'])
+
+
+def _offset(ts):
+    return int(datetime.fromtimestamp(ts, CHILE_TZ).utcoffset().total_seconds())
+
+
+@lru_cache(maxsize=4096)
+def limites_dia(fecha):
+    """Límites UTC [inicio, fin) del día local y sus offsets (1 o 2 segmentos)"""
+    inicio = datetime(fecha.year, fecha.month, fecha.day, tzinfo=CHILE_TZ).astimezone(UTC)
+    siguiente = fecha + timedelta(days=1)
+    fin = datetime(siguiente.year, siguiente.month, siguiente.day, tzinfo=CHILE_TZ).astimezone(UTC)
+    epoch_medianoche = (fecha.toordinal() - _EPOCH_ORDINAL) * 86400
+
+    ts_ini, ts_fin = int(inicio.timestamp()), int(fin.timestamp()) - 60
+    off_ini, off_fin = _offset(ts_ini), _offset(ts_fin)
+    if off_ini == off_fin:
+        segmentos = ((0, off_ini),)
+    else:
+        # Búsqueda binaria (por minuto) del instante de cambio de horario
+        lo, hi = ts_ini // 60, ts_fin // 60
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if _offset(mid * 60) == off_ini:
+                lo = mid
+            else:
+                hi = mid
+        minuto_cambio = (hi * 60 + off_fin - epoch_medianoche) // 60
+        segmentos = ((0, off_ini), (minuto_cambio, off_fin))
+    return LimitesDia(inicio, fin, segmentos, epoch_medianoche)
+
+
+def _offset_en(segmentos, minutos):
+    offset = segmentos[0][1]
+    for desde, off in segmentos:
+        if minutos >= desde:
+            offset = off
+    return offset
+
+
+def local_a_utc_ts(fecha, minutos):
+    """Fecha local + minutos desde medianoche -> timestamp UTC (int)"""
+    lim = limites_dia(fecha)
+    return lim.epoch_medianoche + minutos * 60 - _offset_en(lim.segmentos, minutos)
+
+
+def local_a_utc(fecha, minutos):
+    return datetime.fromtimestamp(local_a_utc_ts(fecha, minutos), UTC)
+
+
+def asegurar_aware(dt):
+    """Datetime naive se asume UTC (la BD guarda UTC)"""
+    if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
+        return dt.replace(tzinfo=UTC)
+    return dt
+
+
+def a_local(dt):
+    return asegurar_aware(dt).astimezone(CHILE_TZ)
+
+
+def dia_y_hora_local(dt):
+    """(nombre del día, time local) para buscar el Horario que contiene dt"""
+    local = a_local(dt)
+    return DIAS[local.weekday()], local.time()
+
+
+def minutos_del_dia(t):
+    return t.hour * 60 + t.minute
+
+
+def grilla_slots(fecha, inicio_min, fin_min, paso=15, duracion=30):
+    """
+    Slots [inicio, inicio+duracion) contenidos en [inicio_min, fin_min) del día
+    local `fecha`. Devuelve tuplas (minuto_local, ts_inicio_utc, ts_fin_utc).
+    """
+    lim = limites_dia(fecha)
+    base, segmentos = lim.epoch_medianoche, lim.segmentos
+    simple = len(segmentos) == 1
+    off = segmentos[0][1]
+    slots = []
+    m = inicio_min
+    while m + duracion <= fin_min:
+        if simple:
+            ts_ini = base + m * 60 - off
+            ts_fin = ts_ini + duracion * 60
+        else:
+            ts_ini = base + m * 60 - _offset_en(segmentos, m)
+            ts_fin = base + (m + duracion) * 60 - _offset_en(segmentos, m + duracion)
+        slots.append((m, ts_ini, ts_fin))
+        m += paso
+    return slots
+
+
+def formato_chile(dt):
+    """'dd-mm-YYYY a las HH:MM (am/pm)' en hora de Chile"""
+    local = a_local(dt)
+    return f"{local.strftime('%d-%m-%Y')} a las {local.strftime('%H:%M')} ({local.strftime('%p').lower()})"
+
+
+def hhmm(minutos):
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+# Slots enteros: minutos desde el inicio de la jornada (08:00 local)
+JORNADA_INICIO = 8 * 60
+JORNADA_FIN = 20 * 60
+DURACION_CITA = 30
+
+
+def slot_de_hora(t):
+    """time local -> minutos desde las 08:00 (puede ser negativo fuera de jornada)"""
+    return minutos_del_dia(t) - JORNADA_INICIO
+
+
+def fecha_y_slot(dt):
+    """datetime (aware o naive UTC) -> (fecha local, slot)"""
+    local = a_local(dt)
+    return local.date(), local.hour * 60 + local.minute - JORNADA_INICIO
+
+
+def slot_a_hhmm(slot):
+    return hhmm(slot + JORNADA_INICIO)
+
+
+def slot_a_utc(fecha, slot):
+    return local_a_utc(fecha, slot + JORNADA_INICIO)
@@ -10,7 +10,10 @@ from .views import (
     registrar_cliente, login, verificar_rut, verificar_o_crear_rut, actualizar_usuario_con_historial,
     UsuarioViewSet, PacienteViewSet, AdministradorViewSet,
     MedicoViewSet, CitaViewSet, NotificacionViewSet, HorarioViewSet,
-    EspecialidadViewSet, MedicoEspecialidadViewSet, BoxViewSet, RecordatorioViewSet
+    EspecialidadViewSet, MedicoEspecialidadViewSet, BoxViewSet, RecordatorioViewSet,
+    ExcepcionHorarioViewSet, ListaEsperaViewSet,
+    estadisticas_citas, eventos_medico, eventos_usuario, sincronizar,
+    login_async, especialidades_async, medicos_especialidad_async, horarios_disponibles_async,
 )
 
 router = DefaultRouter()
@@ -25,6 +28,8 @@ router.register(r'especialidades', EspecialidadViewSet)
 router.register(r'medico-especialidades', MedicoEspecialidadViewSet)
 router.register(r'boxes', BoxViewSet)
 router.register(r'recordatorios', RecordatorioViewSet)
+router.register(r'excepciones-horario', ExcepcionHorarioViewSet)
+router.register(r'lista-espera', ListaEsperaViewSet)
 
 urlpatterns = [
     path('registrar/', registrar_cliente, name='registrar'),
@@ -33,6 +38,14 @@ urlpatterns = [
     path('verificar-rut/', verificar_rut, name='verificar-rut'),
     path('verificar-o-crear-rut/', verificar_o_crear_rut, name='verificar-o-crear-rut'),
     path('actualizar-usuario-historial/', actualizar_usuario_con_historial, name='actualizar-usuario-historial'),
+    path('estadisticas/', estadisticas_citas, name='estadisticas'),
+    path('sync/', sincronizar, name='sync'),
+    path('eventos/medicos/<int:medico_id>/', eventos_medico, name='eventos-medico'),
+    path('eventos/mis-citas/', eventos_usuario, name='eventos-usuario'),
+    path('async/login/', login_async, name='login-async'),
+    path('async/especialidades/', especialidades_async, name='especialidades-async'),
+    path('async/medico-especialidades/', medicos_especialidad_async, name='medico-especialidades-async'),
+    path('async/citas/horarios-disponibles/', horarios_disponibles_async, name='horarios-disponibles-async'),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
@@ -1,25 +1,50 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, action, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.renderers import BrowsableAPIRenderer
 from django.contrib.auth.hashers import make_password, check_password 
 from django.utils import timezone
 from datetime import datetime, timedelta
-import pytz
-from rest_framework_simplejwt.tokens import RefreshToken  
-from django.core.mail import EmailMessage  
-import qrcode  
-import io 
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
 
 from .models import (
     Usuario, Paciente, Administrador, Medico, MedicoEspecialidad,
-    Cita, Notificacion, Horario, Especialidad, Box, Recordatorio
+    Cita, Notificacion, Horario, Especialidad, Box, Recordatorio, ExcepcionHorario, ListaEspera, CitaHistorica
 )
 from .serializers import (
     UsuarioSerializer, PacienteSerializer, AdministradorSerializer,
     MedicoSerializer, MedicoEspecialidadSerializer,
     CitaSerializer, NotificacionSerializer, HorarioSerializer,
-    EspecialidadSerializer, BoxSerializer, RecordatorioSerializer
+    EspecialidadSerializer, BoxSerializer, RecordatorioSerializer, HorarioSemanaSerializer,
+    ExcepcionHorarioSerializer, ListaEsperaSerializer, CitaHistoricaSerializer
+)
+from .excepciones import CalendarioExcepciones, cancelar_citas_afectadas, dia_cerrado
+from .pagination import PaginacionCursorOpcional
+from .renderers import CompactoRenderer, JSONRapidoRenderer
+from .busqueda import buscar_usuarios
+from .normalizacion import normalizar_rut, normalizar_texto
+from .importacion import MAX_PROCESOS_HTTP, ImportadorPacientes, leer_registros
+from .exportacion import FORMATOS as FORMATOS_EXPORTACION, filas_exportacion
+from .proximas_horas import proximas_horas as buscar_proximas_horas
+from .qr import qr_cita
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from asgiref.sync import sync_to_async
+import json
+from django.db import transaction
+from . import (
+    agenda as agenda_medico, calendario, correo, disponibilidad, estadisticas, eventos, lista_espera,
+    notificaciones, reservas, sincronizacion,
+)
+from .tiempo import (
+    DIAS, JORNADA_FIN, JORNADA_INICIO, asegurar_aware,
+    fecha_y_slot, slot_a_hhmm, slot_a_utc,
 )
 
 @api_view(['POST'])
@@ -325,12 +350,125 @@ class UsuarioViewSet(viewsets.ModelViewSet):
     serializer_class = UsuarioSerializer
     permission_classes = [AllowAny]
 
-class PacienteViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'], url_path='buscar', permission_classes=[IsAuthenticated])
+    def buscar(self, request):
+        """
+        Búsqueda rankeada por RUT parcial, nombre/apellido o correo (solo administradores).
+        URL: /api/usuarios/buscar/?q=12.345&limite=20&rol=Paciente
+        """
+        if not es_administrador(request.user):
+            return Response(
+                {'detail': 'No tiene permisos para acceder a este recurso'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        q = request.query_params.get('q', '')
+        rol = request.query_params.get('rol')
+        try:
+            limite = min(max(int(request.query_params.get('limite', 20)), 1), 100)
+        except ValueError:
+            limite = 20
+
+        if len(q.strip()) < 2:
+            return Response(
+                {'error': 'La búsqueda requiere al menos 2 caracteres'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        resultados = buscar_usuarios(q, limite=limite, rol=rol)
+        data = []
+        for usuario, puntaje in resultados:
+            fila = UsuarioSerializer(usuario).data
+            fila['puntaje'] = puntaje
+            data.append(fila)
+        return Response({'resultados': data, 'total': len(data)})
+
+def es_administrador(user):
+    return (getattr(user, 'is_superuser', False) or
+            getattr(user, 'is_staff', False) or
+            getattr(user, 'rol', '') in ('Administrador', 'Admin'))
+
+class BusquedaPorUsuarioMixin:
+    """
+    Listado paginable (cursor opcional) y búsqueda por prefijo sobre el usuario asociado:
+      ?rut=12.345   -> usuario.rut_normalizado empieza con '12345'
+      ?nombre=juan  -> usuario.nombre_busqueda empieza con 'juan' (sin tildes)
+      ?search=...   -> decide RUT o nombre según el texto recibido
+    Solo se usan predicados de prefijo para que el motor pueda usar los índices.
+    """
+    pagination_class = PaginacionCursorOpcional
+
+    def get_queryset(self):
+        qs = super().get_queryset().select_related('usuario')
+        params = self.request.query_params
+        rut = (params.get('rut') or '').strip()
+        nombre = (params.get('nombre') or '').strip()
+        search = (params.get('search') or '').strip()
+
+        if search:
+            if search[0].isdigit():
+                rut = rut or search
+            else:
+                nombre = nombre or search
+        if rut:
+            rut = normalizar_rut(rut)
+            if not rut:
+                # '?rut=abc' no tiene dígitos: un prefijo vacío traería a todos
+                return qs.none()
+            qs = qs.filter(usuario__rut_normalizado__startswith=rut)
+        if nombre:
+            qs = qs.filter(usuario__nombre_busqueda__startswith=normalizar_texto(nombre))
+        return qs
+
+class PacienteViewSet(BusquedaPorUsuarioMixin, viewsets.ModelViewSet):
     queryset = Paciente.objects.all()
     serializer_class = PacienteSerializer
     permission_classes = [AllowAny]
 
-class AdministradorViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='importar',
+            permission_classes=[IsAuthenticated], parser_classes=[MultiPartParser, FormParser])
+    def importar(self, request):
+        """
+        Importación masiva de pacientes (solo administradores).
+        URL: /api/pacientes/importar/  (multipart: archivo=<csv|jsonl>, formato=csv|jsonl)
+        """
+        if not es_administrador(request.user):
+            return Response(
+                {'detail': 'No tiene permisos para acceder a este recurso'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        archivo = request.FILES.get('archivo')
+        if not archivo:
+            return Response({'error': 'Debe adjuntar un archivo'}, status=status.HTTP_400_BAD_REQUEST)
+
+        formato = request.data.get('formato') or (
+            'jsonl' if archivo.name.endswith(('.jsonl', '.ndjson')) else 'csv'
+        )
+        if formato not in ('csv', 'jsonl'):
+            return Response({'error': 'Formato no soportado'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            procesos = int(request.data.get('procesos', MAX_PROCESOS_HTTP))
+        except (TypeError, ValueError):
+            procesos = MAX_PROCESOS_HTTP
+        procesos = max(1, min(procesos, MAX_PROCESOS_HTTP))
+
+        imp = ImportadorPacientes(procesos=procesos)
+        try:
+            with imp:
+                resumen = imp.importar(leer_registros(archivo, formato))
+        except (ValueError, UnicodeDecodeError) as e:
+            # Los lotes anteriores al error ya quedaron guardados: se informan junto al error
+            # para que el cliente sepa desde dónde reintentar (los RUT ya creados se omiten)
+            print(f"⚠️ [importar] Archivo inválido tras {imp.resumen['creados']} pacientes creados: {e}")
+            return Response(dict(imp.resumen, error=f'Archivo inválido: {str(e)}'),
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        print(f"📥 [importar] {resumen['creados']} pacientes creados en {resumen['segundos']}s")
+        return Response(resumen, status=status.HTTP_201_CREATED if resumen['creados'] else status.HTTP_200_OK)
+
+class AdministradorViewSet(BusquedaPorUsuarioMixin, viewsets.ModelViewSet):
     queryset = Administrador.objects.all()
     serializer_class = AdministradorSerializer
     permission_classes = [AllowAny]
@@ -340,6 +478,32 @@ class EspecialidadViewSet(viewsets.ModelViewSet):
     serializer_class = EspecialidadSerializer
     permission_classes = [AllowAny]
 
+    @action(detail=True, methods=['get'], url_path='proximas-horas')
+    def proximas_horas(self, request, pk=None):
+        """
+        Primeras K horas libres de la especialidad entre todos sus médicos.
+        URL: /api/especialidades/<id>/proximas-horas/?desde=<ISO>&k=5&dias=60
+        """
+        especialidad = self.get_object()
+        try:
+            k = min(max(int(request.query_params.get('k', 5)), 1), 50)
+            dias = min(max(int(request.query_params.get('dias', 60)), 1), 180)
+            desde_str = request.query_params.get('desde')
+            desde = datetime.fromisoformat(desde_str.replace('Z', '+00:00')) if desde_str else timezone.now()
+        except ValueError as e:
+            return Response({'error': f'Parámetros inválidos: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        desde = max(asegurar_aware(desde), timezone.now())
+
+        horas = buscar_proximas_horas(
+            especialidad.pk, desde, k=k, dias=dias,
+            excepto_usuario_id=getattr(request.user, 'pk', None)
+        )
+        return Response({
+            'especialidad': especialidad.nombre,
+            'disponibles': horas,
+            'mensaje': f"Se encontraron {len(horas)} horas disponibles"
+        })
+
 class BoxViewSet(viewsets.ModelViewSet):
     queryset = Box.objects.all()
     serializer_class = BoxSerializer
@@ -376,6 +540,144 @@ class HorarioViewSet(viewsets.ModelViewSet):
             qs = qs.filter(medico_especialidad_id=me_id)
         return qs
 
+    @action(detail=False, methods=['put'], url_path='semana', permission_classes=[IsAuthenticated])
+    def semana(self, request):
+        """
+        Reemplaza atómicamente todos los horarios semanales de un médico
+        (solo administradores o el propio médico).
+        URL: /api/horarios/semana/
+        Body: {"medico_id": 1, "horarios": [{"medico_especialidad", "box", "dia", "horaInicio", "horaFin"}, ...]}
+        """
+        serializer = HorarioSemanaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        medico_id = serializer.validated_data['medico_id']
+        if not (es_administrador(request.user)
+                or Medico.objects.filter(pk=medico_id, usuario=request.user).exists()):
+            return Response(
+                {'detail': 'No tiene permisos para modificar los horarios de este médico'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        nuevos = []
+        for datos in serializer.validated_data['horarios']:
+            h = Horario(**datos)
+            h.calcular_slots()
+            nuevos.append(h)
+
+        with transaction.atomic():
+            Horario.objects.filter(medico_especialidad__medico_id=medico_id).delete()
+            Horario.objects.bulk_create(nuevos)
+            # bulk_create no dispara post_save: si el médico no tenía horarios
+            # nadie invalidaría su vista mensual
+            transaction.on_commit(lambda: calendario.invalidar_medico(medico_id))
+
+        horarios = Horario.objects.filter(medico_especialidad__medico_id=medico_id).select_related('box')
+        return Response(HorarioSerializer(horarios, many=True).data)
+
+class ExcepcionHorarioViewSet(viewsets.ModelViewSet):
+    """
+    Feriados de clínica, vacaciones de médicos y cierres de box por rango de fechas.
+    Filtros: ?medico=<id>&box=<id>&desde=YYYY-MM-DD&hasta=YYYY-MM-DD
+    """
+    queryset = ExcepcionHorario.objects.all()
+    serializer_class = ExcepcionHorarioSerializer
+    permission_classes = [IsAuthenticated]
+
+    def check_permissions(self, request):
+        super().check_permissions(request)
+        # Cualquier usuario autenticado puede consultarlas; crearlas o cambiarlas solo administradores
+        if request.method not in SAFE_METHODS and not es_administrador(request.user):
+            self.permission_denied(request, message='No tiene permisos para acceder a este recurso')
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        params = self.request.query_params
+        try:
+            if params.get('medico'):
+                qs = qs.filter(medico_id=int(params['medico']))
+            if params.get('box'):
+                qs = qs.filter(box_id=int(params['box']))
+            if params.get('desde'):
+                qs = qs.filter(fecha_fin__gte=datetime.strptime(params['desde'], '%Y-%m-%d').date())
+            if params.get('hasta'):
+                qs = qs.filter(fecha_inicio__lte=datetime.strptime(params['hasta'], '%Y-%m-%d').date())
+        except ValueError:
+            raise ValidationError({'error': 'Filtros inválidos (medico/box numéricos, fechas YYYY-MM-DD)'})
+        return qs
+
+    @action(detail=True, methods=['post'], url_path='cancelar-citas')
+    def cancelar_citas(self, request, pk=None):
+        """
+        Cancela en lote todas las citas activas afectadas por la excepción (solo administradores).
+        Los pacientes reciben el correo de cancelación al confirmar la transacción.
+        URL: /api/excepciones-horario/<id>/cancelar-citas/
+        """
+        excepcion = self.get_object()
+        ids = cancelar_citas_afectadas(excepcion)
+        print(f"🚫 [cancelar_citas] {len(ids)} citas canceladas por excepción {excepcion.pk}")
+        return Response({'canceladas': len(ids), 'citas': ids})
+
+class ListaEsperaViewSet(viewsets.ModelViewSet):
+    """
+    Inscripción en lista de espera por especialidad (y médico opcional) en un rango de fechas.
+    El paciente ve solo sus entradas; los administradores ven todas (?especialidad=&medico=&estado=).
+    """
+    queryset = ListaEspera.objects.select_related('especialidad')
+    serializer_class = ListaEsperaSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if not es_administrador(self.request.user):
+            qs = qs.filter(usuario=self.request.user)
+        params = self.request.query_params
+        try:
+            if params.get('especialidad'):
+                qs = qs.filter(especialidad_id=int(params['especialidad']))
+            if params.get('medico'):
+                qs = qs.filter(medico_id=int(params['medico']))
+        except ValueError:
+            raise ValidationError({'error': 'Filtros inválidos (especialidad/medico numéricos)'})
+        if params.get('estado'):
+            qs = qs.filter(estado=params['estado'])
+        return qs
+
+    def perform_create(self, serializer):
+        usuario = serializer.validated_data.get('usuario')
+        if not usuario or not es_administrador(self.request.user):
+            usuario = self.request.user
+        serializer.save(usuario=usuario)
+
+    def perform_update(self, serializer):
+        # Solo un administrador puede pasar la entrada a otro paciente
+        if 'usuario' in serializer.validated_data and not es_administrador(self.request.user):
+            serializer.save(usuario=serializer.instance.usuario)
+        else:
+            serializer.save()
+
+    def destroy(self, request, *args, **kwargs):
+        """Salir de la lista: la entrada queda Cancelada y se suelta la oferta vigente"""
+        entrada = self.get_object()
+        if entrada.estado == 'Ofrecida':
+            lista_espera.rechazar_oferta(entrada)
+        ListaEspera.objects.filter(pk=entrada.pk).update(estado='Cancelada')
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=['post'], url_path='rechazar-oferta')
+    def rechazar_oferta(self, request, pk=None):
+        """
+        El paciente no quiere la hora ofrecida: sigue en espera y el slot pasa al siguiente.
+        URL: /api/lista-espera/<id>/rechazar-oferta/
+        """
+        entrada = self.get_object()
+        if entrada.estado != 'Ofrecida':
+            return Response(
+                {'detail': 'La entrada no tiene una oferta vigente'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        siguiente = lista_espera.rechazar_oferta(entrada)
+        return Response({'detail': 'Oferta rechazada', 'reofrecida': bool(siguiente)})
+
 class CitaViewSet(viewsets.ModelViewSet):
     """
     Citas: los resultados se limitan según el usuario autenticado:
@@ -383,10 +685,12 @@ class CitaViewSet(viewsets.ModelViewSet):
                       TODAS las citas para operaciones CRUD individuales
       - Médico: citas donde medico.usuario == request.user
       - Paciente: citas donde usuario == request.user
+    Con ?format=compacto los listados vienen en columnas ({"columnas", "filas"}).
     """
     queryset = Cita.objects.all()
     serializer_class = CitaSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRapidoRenderer, CompactoRenderer, BrowsableAPIRenderer]
 
     def get_queryset(self):
         user = self.request.user
@@ -475,6 +779,73 @@ class CitaViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(qs, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='historial')
+    def historial(self, request):
+        """
+        Citas archivadas (ver archivar_citas), con el mismo alcance por rol que el listado:
+        administrador todas, médico las suyas, paciente las propias.
+        URL: /api/citas/historial/?desde=YYYY-MM-DD&hasta=YYYY-MM-DD (paginable con ?page_size/?cursor)
+        """
+        user = request.user
+        qs = CitaHistorica.objects.select_related(
+            'usuario', 'medico__usuario', 'medico_especialidad__especialidad'
+        ).order_by('-fechaHora', '-id')
+        if not es_administrador(user):
+            medico_obj = Medico.objects.filter(usuario=user).first()
+            qs = qs.filter(medico=medico_obj) if medico_obj else qs.filter(usuario=user)
+        try:
+            if request.query_params.get('desde'):
+                qs = qs.filter(fecha_local__gte=datetime.strptime(request.query_params['desde'], '%Y-%m-%d').date())
+            if request.query_params.get('hasta'):
+                qs = qs.filter(fecha_local__lte=datetime.strptime(request.query_params['hasta'], '%Y-%m-%d').date())
+        except ValueError:
+            return Response({'error': 'Formato de fecha inválido, use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginador = PaginacionCursorOpcional()
+        paginador.ordering = ('-fechaHora', '-id')
+        pagina = paginador.paginate_queryset(qs, request, view=self)
+        if pagina is not None:
+            return paginador.get_paginated_response(CitaHistoricaSerializer(pagina, many=True).data)
+        return Response(CitaHistoricaSerializer(qs, many=True).data)
+
+    @action(detail=False, methods=['get'], url_path='exportar')
+    def exportar(self, request):
+        """
+        Exportación en streaming para reportes (solo administradores).
+        URL: /api/citas/exportar/?formato=csv|ndjson&desde=YYYY-MM-DD&hasta=YYYY-MM-DD&medico=<id>
+        Las fechas son locales (America/Santiago) e inclusivas.
+        """
+        if not es_administrador(request.user):
+            return Response(
+                {'detail': 'No tiene permisos para acceder a este recurso'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS_EXPORTACION:
+            return Response({'error': 'formato debe ser csv o ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            desde = request.query_params.get('desde')
+            hasta = request.query_params.get('hasta')
+            desde = datetime.strptime(desde, '%Y-%m-%d').date() if desde else None
+            hasta = datetime.strptime(hasta, '%Y-%m-%d').date() if hasta else None
+        except ValueError:
+            return Response({'error': 'Las fechas deben tener formato YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        # Validar antes de responder: un error dentro del stream llega como archivo truncado
+        try:
+            medico_id = int(request.query_params['medico']) if request.query_params.get('medico') else None
+        except ValueError:
+            return Response({'error': 'medico debe ser un id numérico'}, status=status.HTTP_400_BAD_REQUEST)
+
+        generador, content_type, extension = FORMATOS_EXPORTACION[formato]
+        response = StreamingHttpResponse(
+            generador(filas_exportacion(desde, hasta, medico_id)),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="citas.{extension}"'
+        return response
+
     def perform_create(self, serializer):
         # Debug detallado al crear cita
         try:
@@ -512,62 +883,45 @@ class CitaViewSet(viewsets.ModelViewSet):
             traceback.print_exc()
             raise
 
+        self._email_cita_agendada(cita)
+        print("===== [CitaViewSet.perform_create] END =====")
+
+    def _email_cita_agendada(self, cita):
         # enviar email (si aplica) - mantener comportamiento previo si existe
         try:
-            asunto = "Hora Agendada - Pendiente de Aceptación"
-            cuerpo = (
-                f"Estimado/a {cita.usuario.nombre},\n\n"
-                f"Su cita ha sido agendada para el {cita.fechaHora.strftime('%d-%m-%Y a las %H:%M')} "
-                f"con el Dr(a). {cita.medico.usuario.nombre}.\n\n"
-                "Su cita está pendiente de confirmación por parte de nuestro personal. "
-                "Recibirá otro correo una vez que sea aceptada.\n\n"
-                "Gracias por preferirnos."
-            )
-            self._send_appointment_email(cita, asunto, cuerpo)
+            self._send_appointment_email(cita, 'agendada')
             print(f" Email enviado / intento realizado para cita.id={getattr(cita,'id',None)}")
         except Exception as e:
             print(f" Error enviando email en perform_create: {e}")
-        print("===== [CitaViewSet.perform_create] END =====")
 
-    def _send_appointment_email(self, cita, subject, body, attach_qr=False):
+    def _rellenar_desde_lista_espera(self, cita, fecha, slot):
+        """Ofrece el slot liberado por la cita a la lista de espera (sin interrumpir la respuesta)"""
+        try:
+            lista_espera.rellenar_slot(
+                cita.medico_id, cita.medico_especialidad_id, fecha, slot,
+                excluir_usuarios=[cita.usuario_id]
+            )
+        except Exception as e:
+            print(f" Error ofreciendo slot a lista de espera: {e}")
+
+    def _send_appointment_email(self, cita, evento, attach_qr=False):
         """
-        Enviar correo de notificación de cita
+        Enviar correo de notificación de cita con la plantilla del evento (api/notificaciones.py)
         """
         try:
             paciente_email = cita.usuario.correo
-            email = EmailMessage(subject, body, None, [paciente_email])
+            email = notificaciones.mensaje_cita(evento, cita)
 
             if attach_qr:
-                qr_data = f"https://gestioncitas.vercel.app/cita/{cita.id}"
-                qr_img = qrcode.make(qr_data)
-                buffer = io.BytesIO()
-                qr_img.save(buffer, format='PNG')
-                buffer.seek(0)
-                email.attach(f'cita_qr_{cita.id}.png', buffer.read(), 'image/png')
-
-            email.send(fail_silently=False)
-            print(f"✅ Correo enviado a {paciente_email} para la cita {cita.id}")
+                # Pre-renderizado al crear la cita; aquí normalmente es un hit de cache
+                datos, content_type, extension = qr_cita(cita.id)
+                email.attach(f'cita_qr_{cita.id}.{extension}', datos, content_type)
+
+            correo.encolar(email)
+            print(f"✅ Correo encolado a {paciente_email} para la cita {cita.id}")
         except Exception as e:
             print(f"❌ Error al enviar correo para la cita {cita.id}: {str(e)}")
 
-    def _format_dt_chile(self, dt):
-        """
-        Devuelve 'dd-mm-YYYY a las HH:MM (am/pm)' convirtiendo desde UTC a America/Santiago.
-        """
-        try:
-            chile_tz = pytz.timezone('America/Santiago')
-            # Si viene naive, asumir UTC (DB guarda UTC)
-            if timezone.is_naive(dt):
-                dt = timezone.make_aware(dt, timezone.utc)
-            dt_cl = dt.astimezone(chile_tz)
-            fecha = dt_cl.strftime('%d-%m-%Y')
-            hora24 = dt_cl.strftime('%H:%M')
-            ampm = dt_cl.strftime('%p').lower()  # am | pm
-            return f"{fecha} a las {hora24} ({ampm})"
-        except Exception:
-            # Fallback simple
-            return dt.strftime('%d-%m-%Y a las %H:%M')
-
     def update(self, request, *args, **kwargs):
         """
         Actualización completa (PUT) + email si cambia a Confirmada
@@ -583,17 +937,7 @@ class CitaViewSet(viewsets.ModelViewSet):
 
             updated_instance = serializer.instance  # <- agregado
             if old_estado != 'Confirmada' and updated_instance.estado == 'Confirmada':
-                asunto = "¡Tu Cita ha sido Confirmada!"
-                
-                fecha_hora_cl = self._format_dt_chile(updated_instance.fechaHora)
-                cuerpo = (
-                    f"Estimado/a {updated_instance.usuario.nombre},\n\n"
-                    f"Nos complace informarle que su cita para el {fecha_hora_cl} "
-                    f"con el Dr(a). {updated_instance.medico.usuario.nombre} ha sido confirmada.\n\n"
-                    "Adjuntamos un código QR que puede presentar en recepción. ¡Le esperamos!\n\n"
-                    "Gracias por su confianza."
-                )
-                self._send_appointment_email(updated_instance, asunto, cuerpo, attach_qr=True)
+                self._send_appointment_email(updated_instance, 'confirmada', attach_qr=True)
 
             return Response(serializer.data)
         except Exception as e:
@@ -630,17 +974,12 @@ class CitaViewSet(viewsets.ModelViewSet):
 
             cita.save()
 
+            if old_estado != 'Cancelada' and cita.estado == 'Cancelada':
+                self._send_appointment_email(cita, 'cancelada')
+                self._rellenar_desde_lista_espera(cita, cita.fecha_local, cita.slot)
+
             if old_estado != 'Confirmada' and cita.estado == 'Confirmada':
-                asunto = "¡Tu Cita ha sido Confirmada!"
-                fecha_hora_cl = self._format_dt_chile(cita.fechaHora)
-                cuerpo = (
-                    f"Estimado/a {cita.usuario.nombre},\n\n"
-                    f"Nos complace informarle que su cita para el {fecha_hora_cl} "
-                    f"con el Dr(a). {cita.medico.usuario.nombre} ha sido confirmada.\n\n"
-                    "Adjuntamos un código QR que puede presentar en recepción. ¡Le esperamos!\n\n"
-                    "Gracias por su confianza."
-                )
-                self._send_appointment_email(cita, asunto, cuerpo, attach_qr=True)
+                self._send_appointment_email(cita, 'confirmada', attach_qr=True)
 
             serializer = self.get_serializer(cita)
             return Response(serializer.data)
@@ -703,34 +1042,43 @@ class CitaViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Validar rango horario (8:00 - 20:00)
-            import pytz
-            chile_tz = pytz.timezone('America/Santiago')
-            if timezone.is_naive(nueva_fecha):
-                nueva_fecha = timezone.make_aware(nueva_fecha, timezone.utc)
-            fecha_chile = nueva_fecha.astimezone(chile_tz)
+            # Validar rango horario (8:00 - 20:00) con el slot entero local
+            nueva_fecha = asegurar_aware(nueva_fecha)
+            fecha_local, slot = fecha_y_slot(nueva_fecha)
             
-            if fecha_chile.hour < 8 or fecha_chile.hour >= 20:
+            if slot < 0 or slot >= JORNADA_FIN - JORNADA_INICIO:
                 return Response(
                     {'detail': 'La cita debe estar entre 8:00 AM y 8:00 PM'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
             # Validar que el médico tenga horario configurado
-            dias = ['Lunes','Martes','Miercoles','Jueves','Viernes','Sabado','Domingo']
-            dia_nombre = dias[fecha_chile.weekday()]
-            hora_chile = fecha_chile.time()
+            dia_nombre = DIAS[fecha_local.weekday()]
             
             horario_disponible = Horario.objects.filter(
                 medico_especialidad=cita.medico_especialidad,
                 dia=dia_nombre,
-                horaInicio__lte=hora_chile,
-                horaFin__gt=hora_chile
+                slot_inicio__lte=slot,
+                slot_fin__gt=slot
             ).exists()
             
             if not horario_disponible:
                 return Response(
-                    {'detail': f'El médico no tiene disponibilidad configurada para {dia_nombre} a las {hora_chile.strftime("%H:%M")}'},
+                    {'detail': f'El médico no tiene disponibilidad configurada para {dia_nombre} a las {slot_a_hhmm(slot)}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # Validar feriados / vacaciones / box cerrado
+            box_horario = Horario.objects.filter(
+                medico_especialidad=cita.medico_especialidad,
+                dia=dia_nombre,
+                slot_inicio__lte=slot,
+                slot_fin__gt=slot
+            ).values_list('box_id', flat=True).first()
+            cerrado, motivo = dia_cerrado(cita.medico_id, fecha_local, box_horario)
+            if cerrado:
+                return Response(
+                    {'detail': f"El médico no atiende el {fecha_local.strftime('%d-%m-%Y')}" + (f": {motivo}" if motivo else "")},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
@@ -751,37 +1099,47 @@ class CitaViewSet(viewsets.ModelViewSet):
             h = Horario.objects.filter(
                 medico_especialidad=cita.medico_especialidad,
                 dia=dia_nombre,
-                horaInicio__lte=hora_chile,
-                horaFin__gt=hora_chile
-            ).select_related('box').first()
+                slot_inicio__lte=slot,
+                slot_fin__gt=slot
+            ).first()
             
             if h and h.box_id:
                 otras_citas = Cita.objects.filter(
                     medico=cita.medico,
-                    fechaHora=nueva_fecha,
+                    fecha_local=fecha_local,
+                    slot=slot,
                     estado__in=['Pendiente', 'Confirmada', 'Reprogramada']
                 ).exclude(pk=cita.pk)
                 
-                for otra in otras_citas:
-                    otra_fecha_chile = otra.fechaHora.astimezone(chile_tz)
-                    dia2 = dias[otra_fecha_chile.weekday()]
-                    hora2 = otra_fecha_chile.time()
-                    h2 = Horario.objects.filter(
-                        medico_especialidad=otra.medico_especialidad,
-                        dia=dia2,
-                        horaInicio__lte=hora2,
-                        horaFin__gt=hora2
-                    ).first()
-                    if h2 and h2.box_id == h.box_id:
+                for me_id, slot2 in otras_citas.values_list('medico_especialidad_id', 'slot'):
+                    if Horario.objects.filter(
+                        medico_especialidad_id=me_id,
+                        dia=dia_nombre,
+                        box_id=h.box_id,
+                        slot_inicio__lte=slot2,
+                        slot_fin__gt=slot2
+                    ).exists():
                         return Response(
                             {'detail': 'Ya existe una cita en este box a esta hora'},
                             status=status.HTTP_400_BAD_REQUEST
                         )
             
+            # Slot retenido temporalmente por otro paciente
+            if reservas.slot_retenido(cita.medico_id, fecha_local, slot, cita.usuario_id):
+                return Response(
+                    {'detail': 'Este horario está reservado temporalmente por otro paciente'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
             # Actualizar la cita
+            fecha_anterior, slot_anterior = cita.fecha_local, cita.slot
             cita.fechaHora = nueva_fecha
             cita.estado = 'Reprogramada'
             cita.save(skip_validation=True)
+            self._send_appointment_email(cita, 'reprogramada')
+            
+            # El slot que dejó libre pasa a la lista de espera
+            self._rellenar_desde_lista_espera(cita, fecha_anterior, slot_anterior)
             
             serializer = self.get_serializer(cita)
             return Response({
@@ -804,10 +1162,6 @@ class CitaViewSet(viewsets.ModelViewSet):
         Devuelve slots de 15 minutos disponibles para un médico-especialidad en una fecha dada
         Las citas duran 30 minutos, por lo que se generan slots cada 15 min para mayor flexibilidad
         """
-        import pytz
-        from datetime import datetime, time, timedelta
-        from django.utils import timezone as django_tz
-        
         medico_id = request.data.get('medico_id')
         medico_especialidad_id = request.data.get('medico_especialidad_id')
         fecha_str = request.data.get('fecha')
@@ -829,125 +1183,47 @@ class CitaViewSet(viewsets.ModelViewSet):
                 }, status=400)
             
             fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-            dias = ['Lunes','Martes','Miercoles','Jueves','Viernes','Sabado','Domingo']
-            dia_nombre = dias[fecha.weekday()]
+            dia_nombre = DIAS[fecha.weekday()]
             
-            horarios = Horario.objects.filter(medico_especialidad=me, dia=dia_nombre).select_related('box')
+            horarios = list(Horario.objects.filter(medico_especialidad=me, dia=dia_nombre).select_related('box'))
             
-            if not horarios.exists():
+            if not horarios:
                 return Response({
                     "disponibles": [],
                     "mensaje": "No hay horarios configurados para este día"
                 })
             
-            #  Usar timezone de Chile
-            chile_tz = pytz.timezone('America/Santiago')
-            
-            #  Calcular rango de fecha en UTC para la consulta
-            inicio_dia_chile = chile_tz.localize(datetime.combine(fecha, time.min))
-            fin_dia_chile = chile_tz.localize(datetime.combine(fecha, time.max))
-            
-            inicio_dia_utc = inicio_dia_chile.astimezone(pytz.UTC)
-            fin_dia_utc = fin_dia_chile.astimezone(pytz.UTC)
-            
-            print(f"🔍 Buscando citas entre {inicio_dia_utc} y {fin_dia_utc}")
-            
-            #  PRIMERO: Obtener todas las citas ocupadas en UTC
-            citas = Cita.objects.filter(
-                medico=medico,
-                fechaHora__gte=inicio_dia_utc,
-                fechaHora__lte=fin_dia_utc,
-                estado__in=['Pendiente', 'Confirmada']
-            )
-            
-            print(f"📋 Citas encontradas: {citas.count()}")
-            
-            #  Crear set de rangos ocupados (inicio y fin de cada cita)
-            rangos_ocupados = []
-            for c in citas:
-                fecha_utc = c.fechaHora
-                if django_tz.is_naive(fecha_utc):
-                    fecha_utc = django_tz.make_aware(fecha_utc, pytz.UTC)
-                
-                # Cada cita dura 30 minutos
-                inicio_cita = fecha_utc
-                fin_cita = fecha_utc + timedelta(minutes=30)
-                
-                rangos_ocupados.append({
-                    'inicio': inicio_cita,
-                    'fin': fin_cita
+            #  Descontar feriados / vacaciones / boxes cerrados
+            calendario = CalendarioExcepciones(medico.pk, fecha, fecha)
+            if calendario.cerrado(fecha):
+                motivo = calendario.motivo(fecha)
+                return Response({
+                    "disponibles": [],
+                    "mensaje": "El médico no atiende este día" + (f": {motivo}" if motivo else "")
                 })
-                
-                # Convertir a Chile para logging
-                fecha_chile = fecha_utc.astimezone(chile_tz)
-                fin_chile = fin_cita.astimezone(chile_tz)
-                print(f"⏰ Cita ocupada - Chile: {fecha_chile.strftime('%H:%M')} a {fin_chile.strftime('%H:%M')}")
-            
-            print(f"🚫 Total rangos ocupados: {len(rangos_ocupados)}")
+            horarios = [h for h in horarios if not calendario.cerrado(fecha, h.box_id)]
             
-            #  SEGUNDO: Generar todos los slots posibles en UTC (cada 15 min)
-            slots_totales = []
-            for h in horarios:
-                inicio = h.horaInicio
-                fin = h.horaFin
-                box_nombre = h.box.nombre if h.box else "Sin box"
-                
-                actual = datetime.combine(fecha, inicio)
-                fin_dt = datetime.combine(fecha, fin)
-                
-                while actual < fin_dt:
-                    # Verificar que haya espacio para una cita completa (30 min)
-                    if (actual + timedelta(minutes=30)) <= fin_dt:
-                        # Crear datetime con timezone de Chile
-                        dt_chile = chile_tz.localize(actual)
-                        dt_utc = dt_chile.astimezone(pytz.UTC)
-                        
-                        # Calcular fin del slot (30 min después)
-                        fin_slot_chile = chile_tz.localize(actual + timedelta(minutes=30))
-                        fin_slot_utc = fin_slot_chile.astimezone(pytz.UTC)
-                        
-                        slots_totales.append({
-                            'horaInicio': actual.time().strftime('%H:%M'),
-                            'horaFin': (actual + timedelta(minutes=30)).strftime('%H:%M'),
-                            'box': box_nombre,
-                            'fechaHora': dt_utc.isoformat(),
-                            'inicio_utc': dt_utc,
-                            'fin_utc': fin_slot_utc
-                        })
-                    
-                    # Avanzar de 15 en 15 min para generar todos los slots posibles
-                    actual += timedelta(minutes=15)
+            #  PRIMERO: slots ocupados del día (enteros, índice medico+fecha_local+slot)
+            ocupados = sorted(Cita.objects.filter(
+                medico=medico,
+                fecha_local=fecha,
+                estado__in=disponibilidad.ESTADOS_OCUPADOS
+            ).values_list('slot', flat=True))
             
-            print(f"📊 Total slots generados: {len(slots_totales)}")
+            print(f"📋 Citas ocupadas: {len(ocupados)}")
             
-            #  TERCERO: Filtrar slots que NO se solapen con citas existentes
-            def hay_solapamiento(slot_inicio, slot_fin, rangos):
-                """
-                Verifica si un slot se solapa con algún rango ocupado
-                Hay solapamiento si:
-                - El inicio del slot está dentro de una cita: slot_inicio < rango_fin AND slot_inicio >= rango_inicio
-                - El fin del slot está dentro de una cita: slot_fin > rango_inicio AND slot_fin <= rango_fin
-                - El slot envuelve completamente una cita: slot_inicio <= rango_inicio AND slot_fin >= rango_fin
-                """
-                for rango in rangos:
-                    # Normalizar para comparación
-                    if (slot_inicio < rango['fin'] and slot_fin > rango['inicio']):
-                        return True
-                return False
+            #  SEGUNDO: grilla de slots (cada 15 min) sin los ocupados
+            candidatos = disponibilidad.candidatos(
+                fecha,
+                [(h.slot_inicio, h.slot_fin, h.box.nombre if h.box else "Sin box") for h in horarios],
+                ocupados
+            )
             
-            slots_disponibles = []
-            for slot in slots_totales:
-                if not hay_solapamiento(slot['inicio_utc'], slot['fin_utc'], rangos_ocupados):
-                    # Remover campos internos antes de devolver
-                    slot_limpio = {
-                        'horaInicio': slot['horaInicio'],
-                        'horaFin': slot['horaFin'],
-                        'box': slot['box'],
-                        'fechaHora': slot['fechaHora']
-                    }
-                    slots_disponibles.append(slot_limpio)
-                else:
-                    print(f"⛔ Descartando slot: {slot['horaInicio']}-{slot['horaFin']} (solapamiento detectado)")
+            #  TERCERO: descontar slots retenidos por otros pacientes (un get_many al cache)
+            retenidas = reservas.celdas_retenidas(
+                medico.pk, fecha, disponibilidad.celdas(candidatos), excepto_usuario_id=request.user.pk
+            )
+            slots_disponibles = disponibilidad.disponibles(candidatos, retenidas)
             
             print(f" Slots disponibles finales: {len(slots_disponibles)}")
             
@@ -965,6 +1241,200 @@ class CitaViewSet(viewsets.ModelViewSet):
             traceback.print_exc()
             return Response({"error": str(e)}, status=500)
 
+    @action(detail=False, methods=['get'], url_path='agenda')
+    def agenda(self, request):
+        """
+        Agenda del médico logueado (o de un box) entre dos fechas locales.
+        URL: /api/citas/agenda/?desde=YYYY-MM-DD&hasta=YYYY-MM-DD[&box_id=<id>][&medico_id=<id> (admin)]
+             [&updated_since=<ISO>] -> solo citas modificadas después (304 si no hay ninguna);
+             las reprogramadas fuera del rango vienen en fuera_de_rango y las borradas o
+             archivadas en eliminados (ver api/agenda.py)
+        Responde ETag; con If-None-Match igual devuelve 304 sin cuerpo.
+        """
+        params = request.query_params
+        hoy = timezone.localdate()
+        try:
+            desde = datetime.strptime(params['desde'], '%Y-%m-%d').date() if params.get('desde') else hoy
+            hasta = datetime.strptime(params['hasta'], '%Y-%m-%d').date() if params.get('hasta') else desde
+            box_id = int(params['box_id']) if params.get('box_id') else None
+            medico_id = int(params['medico_id']) if params.get('medico_id') else None
+            updated_since = params.get('updated_since')
+            if updated_since:
+                updated_since = asegurar_aware(datetime.fromisoformat(updated_since.replace('Z', '+00:00')))
+        except ValueError:
+            return Response({'detail': 'Parámetros inválidos (fechas YYYY-MM-DD, updated_since ISO 8601)'}, status=400)
+        if not agenda_medico.rango_valido(desde, hasta):
+            return Response({'detail': f'Rango inválido (máximo {agenda_medico.MAX_DIAS} días)'}, status=400)
+
+        medico_propio = Medico.objects.filter(usuario=request.user).values_list('pk', flat=True).first()
+        box_medico = Box.objects.filter(pk=box_id).values_list('medico_id', flat=True).first() if box_id else None
+        if box_id and box_medico is None:
+            return Response({'detail': 'Box no encontrado'}, status=404)
+        if es_administrador(request.user):
+            medico_id = box_medico or medico_id or medico_propio
+            if not medico_id:
+                return Response({'detail': 'Indique medico_id o box_id'}, status=400)
+        elif medico_propio:
+            if box_id and box_medico != medico_propio:
+                return Response({'detail': 'El box no pertenece a su agenda'}, status=403)
+            medico_id = medico_propio
+        else:
+            return Response({'detail': 'Solo médicos y administradores'}, status=403)
+
+        filas = agenda_medico.filas_agenda(medico_id, desde, hasta, updated_since)
+        fuera = agenda_medico.fuera_de_rango(medico_id, desde, hasta, updated_since) if updated_since else []
+        borradas = agenda_medico.eliminados(medico_id, updated_since) if updated_since else []
+        etiqueta = agenda_medico.etag(filas, medico_id, desde, hasta, box_id, *fuera, 'eliminados', *borradas)
+        if (updated_since and not filas and not fuera and not borradas) or agenda_medico.coincide(
+                request.headers.get('If-None-Match'), etiqueta):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etiqueta})
+
+        citas = agenda_medico.agenda(medico_id, desde, hasta, box_id, filas=filas)
+        datos = {
+            'medico_id': medico_id,
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            'box_id': box_id,
+            'incremental': bool(updated_since),
+            'cursor': agenda_medico.siguiente_cursor(filas, timezone.now(), updated_since).isoformat(),
+            'citas': citas,
+        }
+        if updated_since:
+            datos['fuera_de_rango'] = fuera
+            datos['eliminados'] = borradas
+        return Response(datos, headers={'ETag': etiqueta, 'Cache-Control': 'private, no-cache'})
+
+    @action(detail=False, methods=['get'], url_path='disponibilidad-mes')
+    def disponibilidad_mes(self, request):
+        """
+        Slots libres por día de un mes para la grilla del calendario.
+        URL: /api/citas/disponibilidad-mes/?mes=YYYY-MM&medico_id=<id>[&medico_especialidad_id=<id>]
+             /api/citas/disponibilidad-mes/?mes=YYYY-MM&especialidad_id=<id>
+        """
+        params = request.query_params
+        medico_id = params.get('medico_id')
+        medico_especialidad_id = params.get('medico_especialidad_id')
+        especialidad_id = params.get('especialidad_id')
+        if not (medico_id or especialidad_id):
+            return Response({"error": "Indique medico_id o especialidad_id"}, status=400)
+        try:
+            mes_str = params.get('mes')
+            inicio = datetime.strptime(mes_str, '%Y-%m').date() if mes_str else timezone.localdate().replace(day=1)
+            medico_id = int(medico_id) if medico_id else None
+            medico_especialidad_id = int(medico_especialidad_id) if medico_especialidad_id else None
+            especialidad_id = int(especialidad_id) if especialidad_id else None
+        except ValueError:
+            return Response({"error": "Parámetros inválidos (mes en formato YYYY-MM, ids numéricos)"}, status=400)
+
+        if medico_especialidad_id and not MedicoEspecialidad.objects.filter(
+            pk=medico_especialidad_id, medico_id=medico_id
+        ).exists():
+            return Response({"error": "Combinación médico-especialidad no válida"}, status=400)
+
+        dias = calendario.disponibilidad_mes(
+            inicio.year, inicio.month,
+            medico_id=medico_id,
+            medico_especialidad_id=medico_especialidad_id,
+            especialidad_id=especialidad_id,
+        )
+        return Response({
+            "mes": inicio.strftime('%Y-%m'),
+            "dias": dias,
+            "total": sum(d['libres'] for d in dias),
+        })
+
+    @action(detail=False, methods=['post'], url_path='reservar-slot')
+    def reservar_slot(self, request):
+        """
+        Retiene un slot por RESERVA_SLOT_TTL segundos mientras el paciente completa la cita.
+        Body: medico, medico_especialidad, fechaHora (ISO), usuario (opcional, por defecto el propio)
+        Respuesta: token para /api/citas/confirmar-reserva/ (409 si otro paciente lo tiene retenido)
+        """
+        datos = {
+            'usuario': request.data.get('usuario') or request.user.pk,
+            'medico': request.data.get('medico'),
+            'medico_especialidad': request.data.get('medico_especialidad'),
+            'fechaHora': request.data.get('fechaHora'),
+        }
+        # Mismas validaciones que al crear la cita (horario, feriados, conflictos, otros holds)
+        serializer = self.get_serializer(data=datos)
+        serializer.is_valid(raise_exception=True)
+        v = serializer.validated_data
+        if not v.get('medico') or not v.get('medico_especialidad') or not v.get('fechaHora'):
+            return Response(
+                {'detail': 'medico, medico_especialidad y fechaHora son requeridos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if v['usuario'].pk != request.user.pk and not es_administrador(request.user):
+            return Response(
+                {'detail': 'No puede reservar horas para otro usuario'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        fecha, slot = fecha_y_slot(asegurar_aware(v['fechaHora']))
+        token = reservas.reservar(v['usuario'].pk, v['medico'].pk, v['medico_especialidad'].pk, fecha, slot)
+        if not token:
+            return Response(
+                {'detail': 'Este horario está reservado temporalmente por otro paciente'},
+                status=status.HTTP_409_CONFLICT
+            )
+        print(f"⏳ [reservar_slot] medico={v['medico'].pk} {fecha} {slot_a_hhmm(slot)} usuario={v['usuario'].pk}")
+        return Response({
+            'token': token,
+            'expira_en': reservas.ttl(),
+            'fechaHora': slot_a_utc(fecha, slot).isoformat(),
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='confirmar-reserva')
+    def confirmar_reserva(self, request):
+        """
+        Convierte un hold vigente en la cita (un solo INSERT) y libera el hold.
+        Body: token, descripcion (opcional), prioridad (opcional)
+        """
+        token = request.data.get('token')
+        hold = reservas.obtener(token)
+        if not hold:
+            return Response(
+                {'detail': 'La reserva no existe o expiró'},
+                status=status.HTTP_410_GONE
+            )
+        if hold['usuario_id'] != request.user.pk and not es_administrador(request.user):
+            return Response(
+                {'detail': 'La reserva pertenece a otro usuario'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        datos = {
+            'usuario': hold['usuario_id'],
+            'medico': hold['medico_id'],
+            'medico_especialidad': hold['medico_especialidad_id'],
+            'fechaHora': slot_a_utc(hold['fecha'], hold['slot']),
+        }
+        for campo in ('descripcion', 'prioridad'):
+            if request.data.get(campo):
+                datos[campo] = request.data[campo]
+
+        serializer = self.get_serializer(data=datos)
+        serializer.is_valid(raise_exception=True)
+        cita = serializer.save()
+        reservas.liberar(token)
+        lista_espera.marcar_asignada(token)
+        print(f"✅ [confirmar_reserva] cita.id={cita.id} desde reserva")
+        self._email_cita_agendada(cita)
+        return Response(self.get_serializer(cita).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='liberar-reserva')
+    def liberar_reserva(self, request):
+        """Suelta un hold antes de que expire (p.ej. el paciente abandonó el formulario)"""
+        token = request.data.get('token')
+        hold = reservas.obtener(token)
+        if hold and hold['usuario_id'] != request.user.pk and not es_administrador(request.user):
+            return Response(
+                {'detail': 'La reserva pertenece a otro usuario'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return Response({'liberada': reservas.liberar(token)})
+
     @action(detail=False, methods=['post'])
     def validar_horario(self, request):
         """
@@ -1098,6 +1568,100 @@ class RecordatorioViewSet(viewsets.ModelViewSet):
     serializer_class = RecordatorioSerializer
     permission_classes = [IsAuthenticated]
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def estadisticas_citas(request):
+    """
+    Estadísticas agregadas para el dashboard (solo administradores), servidas
+    desde los rollups diarios en vez de recorrer todas las citas.
+    URL: /api/estadisticas/?desde=YYYY-MM-DD&hasta=YYYY-MM-DD&agrupar=dia|semana
+         &por=estado,prioridad,medico,especialidad,box&medico=<id>&especialidad=<id>
+    """
+    if not es_administrador(request.user):
+        return Response(
+            {'detail': 'No tiene permisos para acceder a este recurso'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    hoy = timezone.localdate()
+    try:
+        desde = request.query_params.get('desde')
+        hasta = request.query_params.get('hasta')
+        desde = datetime.strptime(desde, '%Y-%m-%d').date() if desde else hoy - timedelta(days=30)
+        hasta = datetime.strptime(hasta, '%Y-%m-%d').date() if hasta else hoy
+    except ValueError:
+        return Response({'error': 'Las fechas deben tener formato YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        medico_id = int(request.query_params['medico']) if request.query_params.get('medico') else None
+        especialidad_id = (
+            int(request.query_params['especialidad']) if request.query_params.get('especialidad') else None
+        )
+    except ValueError:
+        return Response({'error': 'medico y especialidad deben ser ids numéricos'}, status=status.HTTP_400_BAD_REQUEST)
+
+    agrupar = request.query_params.get('agrupar', 'dia')
+    if agrupar not in ('dia', 'semana'):
+        return Response({'error': 'agrupar debe ser dia o semana'}, status=status.HTTP_400_BAD_REQUEST)
+
+    por = [d for d in request.query_params.get('por', 'estado').split(',') if d]
+    invalidas = [d for d in por if d not in estadisticas.DIMENSIONES]
+    if invalidas:
+        return Response(
+            {'error': f"Dimensiones no válidas: {', '.join(invalidas)}",
+             'dimensiones_validas': list(estadisticas.DIMENSIONES)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    filas = estadisticas.consultar(
+        desde, hasta, agrupar=agrupar, por=por,
+        medico_id=medico_id,
+        especialidad_id=especialidad_id,
+    )
+    return Response({
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'agrupar': agrupar,
+        'por': por,
+        'resultados': filas,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sincronizar(request):
+    """
+    Cambios desde la última sincronización para clientes offline.
+    URL: /api/sync/?cursor=<cursor anterior>&modelos=citas,horarios&limite=500
+    Sin cursor entrega todo lo visible para el usuario. Mientras `completo` sea
+    false hay más páginas: repetir con el `cursor` devuelto. 410 = cursor vencido,
+    borrar los datos locales y empezar sin cursor.
+    """
+    params = request.query_params
+    modelos = [m for m in params.get('modelos', '').split(',') if m] or None
+    if modelos and any(m not in sincronizacion.MODELOS for m in modelos):
+        return Response(
+            {'error': 'Modelo no válido', 'modelos_validos': list(sincronizacion.MODELOS)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limite = int(params.get('limite', 500))
+    except ValueError:
+        return Response({'error': 'limite debe ser un entero'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        datos = sincronizacion.cambios(
+            request.user,
+            cursor=params.get('cursor'),
+            modelos=modelos,
+            limite=limite,
+            es_admin=es_administrador(request.user),
+            medico_id=Medico.objects.filter(usuario=request.user).values_list('pk', flat=True).first(),
+        )
+    except sincronizacion.CursorInvalido as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except sincronizacion.CursorVencido as e:
+        return Response({'error': str(e)}, status=status.HTTP_410_GONE)
+    return Response(datos)
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def login(request):
@@ -1209,3 +1773,222 @@ def login_view(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+
+
+# ---------------------------------------------------------------------------
+# Feed de eventos (SSE). Vistas async: requieren servir por ASGI.
+# ---------------------------------------------------------------------------
+
+def _respuesta_sse(canales):
+    response = StreamingHttpResponse(eventos.stream(canales), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _sin_asgi(request):
+    """
+    Bajo WSGI el stream infinito ocuparía un worker sync para siempre (con un
+    solo worker de gunicorn la API dejaría de responder): se rechaza con 501.
+    """
+    if isinstance(request, ASGIRequest):
+        return None
+    return JsonResponse(
+        {'detail': 'El feed de eventos requiere servir la API por ASGI (SERVIDOR=asgi / web_asgi)'},
+        status=501
+    )
+
+
+def _usuario_id_sse(request):
+    """user_id del JWT en ?token= (EventSource no permite enviar headers) o en Authorization, o None"""
+    token = request.GET.get('token') or request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not token:
+        return None
+    try:
+        return AccessToken(token)['user_id']
+    except (TokenError, KeyError):
+        return None
+
+
+async def eventos_medico(request, medico_id):
+    """
+    Slots tomados/liberados y cambios de estado de un médico en una fecha
+    (solo administradores o el propio médico).
+    URL: /api/eventos/medicos/<medico_id>/?fecha=YYYY-MM-DD&token=<access JWT>
+    """
+    rechazo = _sin_asgi(request)
+    if rechazo:
+        return rechazo
+    usuario_id = _usuario_id_sse(request)
+    usuario = await Usuario.objects.filter(pk=usuario_id).afirst() if usuario_id else None
+    if usuario is None:
+        return JsonResponse({'detail': 'Token inválido o expirado'}, status=401)
+    if not es_administrador(usuario) and not await Medico.objects.filter(pk=medico_id, usuario=usuario).aexists():
+        return JsonResponse({'detail': 'No tiene permisos para acceder a este recurso'}, status=403)
+    try:
+        fecha_str = request.GET.get('fecha')
+        fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date() if fecha_str else timezone.localdate()
+    except ValueError:
+        return JsonResponse({'error': 'Formato de fecha inválido, use YYYY-MM-DD'}, status=400)
+    return _respuesta_sse([eventos.canal_medico(medico_id, fecha)])
+
+
+async def eventos_usuario(request):
+    """
+    Cambios de las citas del usuario autenticado.
+    URL: /api/eventos/mis-citas/?token=<access JWT> (EventSource no permite enviar headers)
+    """
+    rechazo = _sin_asgi(request)
+    if rechazo:
+        return rechazo
+    usuario_id = _usuario_id_sse(request)
+    if usuario_id is None:
+        return JsonResponse({'detail': 'Token inválido o expirado'}, status=401)
+    return _respuesta_sse([eventos.canal_usuario(usuario_id)])
+
+
+# ---------------------------------------------------------------------------
+# Versiones async de endpoints de lectura / I/O (servidas por ASGI con uvicorn).
+# Mismo contrato JSON que sus equivalentes DRF; usan el ORM async de Django.
+# ---------------------------------------------------------------------------
+
+def _json_body(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+
+
+def _usuario_id_jwt(request):
+    """user_id del header Authorization: Bearer <access> (sin consultar la BD), o None"""
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not token:
+        return None
+    try:
+        return AccessToken(token)['user_id']
+    except (TokenError, KeyError):
+        return None
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+async def login_async(request):
+    """URL: /api/async/login/ (igual que /api/login/)"""
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    rut = data.get('rut')
+    password = data.get('password')
+    if not rut or not password:
+        return JsonResponse({'error': 'RUT y contraseña requeridos'}, status=400)
+
+    try:
+        usuario = await Usuario.objects.aget(rut=rut)
+    except Usuario.DoesNotExist:
+        return JsonResponse({'error': 'Usuario no encontrado'}, status=404)
+
+    # El hash de la contraseña es CPU: fuera del event loop y sin serializar con otras vistas
+    if not await sync_to_async(check_password, thread_sensitive=False)(password, usuario.password):
+        return JsonResponse({'error': 'Contraseña incorrecta'}, status=401)
+
+    access_token = str(RefreshToken.for_user(usuario).access_token)
+    return JsonResponse({
+        'user': {
+            'id': usuario.id,
+            'nombre': usuario.nombre,
+            'correo': usuario.correo,
+            'rut': usuario.rut,
+            'telefono': usuario.telefono,
+            'rol': usuario.rol
+        },
+        'token': access_token,
+        'message': f'Bienvenido, {usuario.nombre}'
+    })
+
+
+@require_http_methods(['GET'])
+async def especialidades_async(request):
+    """URL: /api/async/especialidades/ (igual que GET /api/especialidades/)"""
+    especialidades = [e async for e in Especialidad.objects.order_by('id').values('id', 'nombre', 'descripcion')]
+    return JsonResponse(especialidades, safe=False)
+
+
+@require_http_methods(['GET'])
+async def medicos_especialidad_async(request):
+    """URL: /api/async/medico-especialidades/?medico=<id>&especialidad=<id> (igual que GET /api/medico-especialidades/)"""
+    qs = MedicoEspecialidad.objects.select_related('medico', 'especialidad').order_by('id')
+    try:
+        if request.GET.get('medico'):
+            qs = qs.filter(medico_id=int(request.GET['medico']))
+        if request.GET.get('especialidad'):
+            qs = qs.filter(especialidad_id=int(request.GET['especialidad']))
+    except ValueError:
+        return JsonResponse({'error': 'Filtros inválidos (medico/especialidad numéricos)'}, status=400)
+    # Con las relaciones ya cargadas el serializer no consulta la base
+    filas = [me async for me in qs]
+    return JsonResponse(MedicoEspecialidadSerializer(filas, many=True).data, safe=False)
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+async def horarios_disponibles_async(request):
+    """URL: /api/async/citas/horarios-disponibles/ (igual que /api/citas/horarios_disponibles/)"""
+    usuario_id = _usuario_id_jwt(request)
+    if usuario_id is None:
+        return JsonResponse({'detail': 'Las credenciales de autenticación no se proveyeron.'}, status=401)
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+
+    medico_id = data.get('medico_id')
+    medico_especialidad_id = data.get('medico_especialidad_id')
+    fecha_str = data.get('fecha')
+    if not all([medico_id, medico_especialidad_id, fecha_str]):
+        return JsonResponse({"error": "Faltan parámetros"}, status=400)
+
+    try:
+        fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({"error": "Formato de fecha inválido, use YYYY-MM-DD"}, status=400)
+
+    try:
+        me = await MedicoEspecialidad.objects.aget(pk=medico_especialidad_id)
+    except MedicoEspecialidad.DoesNotExist:
+        return JsonResponse({"error": "Relación médico-especialidad no encontrada"}, status=404)
+    if str(me.medico_id) != str(medico_id):
+        return JsonResponse({"error": "Combinación médico-especialidad no válida"}, status=400)
+
+    horarios = [h async for h in Horario.objects.filter(
+        medico_especialidad=me, dia=DIAS[fecha.weekday()]
+    ).values_list('slot_inicio', 'slot_fin', 'box_id', 'box__nombre')]
+    if not horarios:
+        return JsonResponse({"disponibles": [], "mensaje": "No hay horarios configurados para este día"})
+
+    filas = [f async for f in CalendarioExcepciones.consulta(me.medico_id, fecha, fecha)]
+    calendario = CalendarioExcepciones(me.medico_id, fecha, fecha, filas=filas)
+    if calendario.cerrado(fecha):
+        motivo = calendario.motivo(fecha)
+        return JsonResponse({
+            "disponibles": [],
+            "mensaje": "El médico no atiende este día" + (f": {motivo}" if motivo else "")
+        })
+
+    ocupados = sorted([o async for o in Cita.objects.filter(
+        medico_id=me.medico_id,
+        fecha_local=fecha,
+        estado__in=disponibilidad.ESTADOS_OCUPADOS
+    ).values_list('slot', flat=True)])
+
+    candidatos = disponibilidad.candidatos(fecha, [
+        (ini, fin, box_nombre or "Sin box")
+        for ini, fin, box_id, box_nombre in horarios
+        if not calendario.cerrado(fecha, box_id)
+    ], ocupados)
+    retenidas = await reservas.aceldas_retenidas(
+        me.medico_id, fecha, disponibilidad.celdas(candidatos), excepto_usuario_id=usuario_id
+    )
+    slots_disponibles = disponibilidad.disponibles(candidatos, retenidas)
+    return JsonResponse({
+        "disponibles": slots_disponibles,
+        "mensaje": f"Se encontraron {len(slots_disponibles)} horarios disponibles"
+    })